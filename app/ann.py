@@ -0,0 +1,453 @@
+"""Vector search engines for the local index: exact, IVF-flat and HNSW.
+
+Every engine stores unit-normalized float32 vectors and returns cosine
+distances (``1 - dot``), matching the scores of the ``match_memories`` RPC.
+Engines round-trip through ``to_arrays``/``load_engine`` so the local index
+can snapshot them with ``numpy.savez``.
+"""
+from __future__ import annotations
+
+import heapq
+import math
+import random
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .quantization import create_store
+
+SearchHits = Tuple[np.ndarray, np.ndarray]
+
+
+class _GrowableMatrix:
+    """Row-appendable float32 matrix with amortized doubling."""
+
+    def __init__(self, dim: int) -> None:
+        self.data = np.empty((0, dim), dtype=np.float32)
+        self.size = 0
+
+    def append(self, rows: np.ndarray) -> int:
+        start = self.size
+        needed = start + len(rows)
+        if needed > len(self.data):
+            grown = np.empty((max(needed, 2 * len(self.data), 64), self.data.shape[1]), dtype=np.float32)
+            grown[:start] = self.data[:start]
+            self.data = grown
+        self.data[start:needed] = rows
+        self.size = needed
+        return start
+
+    def view(self) -> np.ndarray:
+        return self.data[: self.size]
+
+    def reserve(self, capacity: int) -> None:
+        if capacity > len(self.data):
+            grown = np.empty((capacity, self.data.shape[1]), dtype=np.float32)
+            grown[: self.size] = self.data[: self.size]
+            self.data = grown
+
+
+class _GrowableInts:
+    def __init__(self, dtype: type = np.int64) -> None:
+        self.data = np.empty(0, dtype=dtype)
+        self.size = 0
+
+    def append(self, values: np.ndarray) -> None:
+        needed = self.size + len(values)
+        if needed > len(self.data):
+            grown = np.empty(max(needed, 2 * len(self.data), 16), dtype=self.data.dtype)
+            grown[: self.size] = self.data[: self.size]
+            self.data = grown
+        self.data[self.size : needed] = values
+        self.size = needed
+
+    def view(self) -> np.ndarray:
+        return self.data[: self.size]
+
+    def reserve(self, capacity: int) -> None:
+        if capacity > len(self.data):
+            grown = np.empty(capacity, dtype=self.data.dtype)
+            grown[: self.size] = self.data[: self.size]
+            self.data = grown
+
+
+def _top_k(similarities: np.ndarray, k: int) -> np.ndarray:
+    """Positions of the ``k`` largest similarities, best first."""
+
+    if len(similarities) > k:
+        top = np.argpartition(-similarities, k - 1)[:k]
+    else:
+        top = np.arange(len(similarities))
+    return top[np.argsort(-similarities[top], kind="stable")]
+
+
+class FlatEngine:
+    """Brute-force scan; exact results and the baseline for recall checks."""
+
+    kind = "flat"
+
+    def __init__(self, dim: int) -> None:
+        self.dim = dim
+        self._vectors = _GrowableMatrix(dim)
+        self._ids = _GrowableInts()
+
+    def __len__(self) -> int:
+        return self._ids.size
+
+    def add(self, ids: np.ndarray, vectors: np.ndarray) -> None:
+        self._vectors.append(vectors)
+        self._ids.append(ids)
+
+    def reserve(self, capacity: int) -> None:
+        """Pre-allocate room for ``capacity`` rows so appends do not reallocate.
+
+        Used before forking workers: appends then only dirty the tail pages
+        instead of copying the whole shared matrix into each worker.
+        """
+
+        self._vectors.reserve(capacity)
+        self._ids.reserve(capacity)
+
+    def search(self, query: np.ndarray, k: int) -> SearchHits:
+        if not len(self):
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        similarities = self._vectors.view() @ query
+        top = _top_k(similarities, k)
+        return self._ids.view()[top], 1.0 - similarities[top]
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        return {"ids": self._ids.view(), "vectors": self._vectors.view()}
+
+    def _load_arrays(self, arrays: Dict[str, np.ndarray]) -> None:
+        FlatEngine.add(self, arrays["ids"], arrays["vectors"])
+
+
+class IVFFlatEngine(FlatEngine):
+    """Inverted-file index: k-means coarse quantizer plus exact scans of ``nprobe`` lists.
+
+    Until ``min_train_size`` vectors arrive it scans like ``FlatEngine``. The
+    quantizer is retrained once the partition has grown 4x since the last
+    training so list sizes stay balanced under incremental inserts.
+    """
+
+    kind = "ivf"
+
+    def __init__(self, dim: int, *, nlist: int = 0, nprobe: int = 8, min_train_size: int = 1024) -> None:
+        super().__init__(dim)
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.min_train_size = min_train_size
+        self._centroids: Optional[np.ndarray] = None
+        self._lists: List[_GrowableInts] = []
+        self._trained_size = 0
+
+    def add(self, ids: np.ndarray, vectors: np.ndarray) -> None:
+        start = len(self)
+        super().add(ids, vectors)
+        if self._centroids is None:
+            if len(self) >= self.min_train_size:
+                self._train()
+        elif len(self) > 4 * self._trained_size:
+            self._train()
+        else:
+            self._assign(start, self._nearest_centroid(vectors))
+
+    def _nearest_centroid(self, vectors: np.ndarray) -> np.ndarray:
+        assert self._centroids is not None
+        return np.argmax(vectors @ self._centroids.T, axis=1).astype(np.int32)
+
+    def _assign(self, start: int, assignments: np.ndarray) -> None:
+        order = np.argsort(assignments, kind="stable")
+        boundaries = np.searchsorted(assignments[order], np.arange(len(self._lists) + 1))
+        for cell in range(len(self._lists)):
+            members = order[boundaries[cell] : boundaries[cell + 1]]
+            if len(members):
+                self._lists[cell].append(members + start)
+
+    def _train(self, iterations: int = 10) -> None:
+        vectors = self._vectors.view()
+        nlist = self.nlist or max(1, int(math.sqrt(len(vectors))))
+        nlist = min(nlist, len(vectors))
+        rng = np.random.default_rng(0)
+        sample = vectors[rng.choice(len(vectors), size=min(len(vectors), 256 * nlist), replace=False)]
+        centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+        for _ in range(iterations):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            for cell in range(nlist):
+                members = sample[labels == cell]
+                if len(members):
+                    mean = members.sum(axis=0)
+                    norm = np.linalg.norm(mean)
+                    centroids[cell] = mean / norm if norm else centroids[cell]
+        self._set_centroids(centroids)
+        self._assign(0, self._nearest_centroid(vectors))
+
+    def _set_centroids(self, centroids: np.ndarray) -> None:
+        self._centroids = centroids.astype(np.float32)
+        self._lists = [_GrowableInts() for _ in range(len(centroids))]
+        self._trained_size = len(self)
+
+    def search(self, query: np.ndarray, k: int) -> SearchHits:
+        if self._centroids is None:
+            return super().search(query, k)
+        probe = _top_k(self._centroids @ query, self.nprobe)
+        candidates = np.concatenate([self._lists[cell].view() for cell in probe])
+        if not len(candidates):
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        similarities = self._vectors.data[candidates] @ query
+        top = _top_k(similarities, k)
+        return self._ids.data[candidates[top]], 1.0 - similarities[top]
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        arrays = super().to_arrays()
+        if self._centroids is not None:
+            arrays["centroids"] = self._centroids
+            arrays["trained_size"] = np.asarray(self._trained_size)
+        return arrays
+
+    def _load_arrays(self, arrays: Dict[str, np.ndarray]) -> None:
+        super()._load_arrays(arrays)
+        if "centroids" in arrays:
+            self._set_centroids(arrays["centroids"])
+            self._trained_size = int(arrays["trained_size"])
+            self._assign(0, self._nearest_centroid(self._vectors.view()))
+
+
+class HNSWEngine(FlatEngine):
+    """Hierarchical navigable small-world graph (Malkov & Yashunin).
+
+    ``m`` bounds links per node on upper layers (``2 * m`` on layer 0),
+    ``ef_construction`` sets insert-time beam width and ``ef_search`` the
+    query-time beam width; raise ``ef_search`` to trade latency for recall.
+    """
+
+    kind = "hnsw"
+
+    def __init__(self, dim: int, *, m: int = 16, ef_construction: int = 100, ef_search: int = 64) -> None:
+        super().__init__(dim)
+        self.m = m
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        self._level_scale = 1.0 / math.log(max(m, 2))
+        self._rng = random.Random(0)
+        self._levels: List[int] = []
+        self._graph: List[List[List[int]]] = []
+        self._entry: Optional[int] = None
+        self._max_level = -1
+
+    def add(self, ids: np.ndarray, vectors: np.ndarray) -> None:
+        start = len(self)
+        super().add(ids, vectors)
+        for node in range(start, len(self)):
+            self._insert(node)
+
+    def _insert(self, node: int) -> None:
+        level = int(-math.log(1.0 - self._rng.random()) * self._level_scale)
+        self._levels.append(level)
+        self._graph.append([[] for _ in range(level + 1)])
+        if self._entry is None:
+            self._entry, self._max_level = node, level
+            return
+
+        vectors = self._vectors.data
+        query = vectors[node]
+        entry_points = [self._entry]
+        for layer in range(self._max_level, level, -1):
+            entry_points = [self._search_layer(query, entry_points, 1, layer)[0][1]]
+        for layer in range(min(level, self._max_level), -1, -1):
+            found = self._search_layer(query, entry_points, self.ef_construction, layer)
+            neighbours = self._select_neighbours(found, self.m)
+            self._graph[node][layer] = neighbours
+            max_links = 2 * self.m if layer == 0 else self.m
+            for neighbour in neighbours:
+                links = self._graph[neighbour][layer]
+                links.append(node)
+                if len(links) > max_links:
+                    similarities = (vectors[links] @ vectors[neighbour]).tolist()
+                    ranked = sorted(zip(similarities, links), reverse=True)
+                    self._graph[neighbour][layer] = self._select_neighbours(ranked, max_links)
+            entry_points = [candidate for _, candidate in found]
+        if level > self._max_level:
+            self._entry, self._max_level = node, level
+
+    def _select_neighbours(self, ranked: List[Tuple[float, int]], limit: int) -> List[int]:
+        """Diversity heuristic from the HNSW paper, topped up with the closest leftovers.
+
+        A candidate is kept only if it is closer to the base node than to any
+        neighbour already kept, which preserves links between clusters.
+        """
+
+        vectors = self._vectors.data
+        selected: List[int] = []
+        skipped: List[int] = []
+        for similarity, candidate in ranked:
+            if len(selected) >= limit:
+                break
+            if selected and float(np.max(vectors[selected] @ vectors[candidate])) > similarity:
+                skipped.append(candidate)
+            else:
+                selected.append(candidate)
+        selected.extend(skipped[: limit - len(selected)])
+        return selected
+
+    def _search_layer(
+        self, query: np.ndarray, entry_points: List[int], ef: int, layer: int
+    ) -> List[Tuple[float, int]]:
+        """Beam search on one layer; returns ``(similarity, node)`` best first."""
+
+        vectors = self._vectors.data
+        visited = set(entry_points)
+        similarities = (vectors[entry_points] @ query).tolist()
+        candidates = [(-sim, node) for sim, node in zip(similarities, entry_points)]
+        heapq.heapify(candidates)
+        results = [(sim, node) for sim, node in zip(similarities, entry_points)]
+        heapq.heapify(results)
+        while len(results) > ef:
+            heapq.heappop(results)
+
+        while candidates:
+            negative, current = heapq.heappop(candidates)
+            if len(results) >= ef and -negative < results[0][0]:
+                break
+            fresh = [node for node in self._graph[current][layer] if node not in visited]
+            if not fresh:
+                continue
+            visited.update(fresh)
+            for sim, node in zip((vectors[fresh] @ query).tolist(), fresh):
+                if len(results) < ef or sim > results[0][0]:
+                    heapq.heappush(candidates, (-sim, node))
+                    heapq.heappush(results, (sim, node))
+                    if len(results) > ef:
+                        heapq.heappop(results)
+        return sorted(results, reverse=True)
+
+    def search(self, query: np.ndarray, k: int) -> SearchHits:
+        if self._entry is None:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        entry_points = [self._entry]
+        for layer in range(self._max_level, 0, -1):
+            entry_points = [self._search_layer(query, entry_points, 1, layer)[0][1]]
+        found = self._search_layer(query, entry_points, max(self.ef_search, k), 0)[:k]
+        nodes = np.fromiter((node for _, node in found), dtype=np.int64, count=len(found))
+        distances = np.fromiter((1.0 - sim for sim, _ in found), dtype=np.float32, count=len(found))
+        return self._ids.data[nodes], distances
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        arrays = super().to_arrays()
+        arrays["levels"] = np.asarray(self._levels, dtype=np.int16)
+        arrays["entry"] = np.asarray(-1 if self._entry is None else self._entry)
+        for layer in range(self._max_level + 1):
+            degrees = [len(links[layer]) if len(links) > layer else 0 for links in self._graph]
+            flat = [node for links in self._graph if len(links) > layer for node in links[layer]]
+            arrays[f"degrees_{layer}"] = np.asarray(degrees, dtype=np.int32)
+            arrays[f"links_{layer}"] = np.asarray(flat, dtype=np.int32)
+        return arrays
+
+    def _load_arrays(self, arrays: Dict[str, np.ndarray]) -> None:
+        super()._load_arrays(arrays)
+        self._levels = [int(level) for level in arrays["levels"]]
+        self._graph = [[[] for _ in range(level + 1)] for level in self._levels]
+        entry = int(arrays["entry"])
+        self._entry = None if entry < 0 else entry
+        self._max_level = max(self._levels, default=-1)
+        for layer in range(self._max_level + 1):
+            links = arrays[f"links_{layer}"].tolist()
+            offset = 0
+            for node, degree in enumerate(arrays[f"degrees_{layer}"].tolist()):
+                if self._levels[node] >= layer:
+                    self._graph[node][layer] = links[offset : offset + degree]
+                    offset += degree
+
+
+class QuantizedFlatEngine(FlatEngine):
+    """Brute-force scan over compressed codes with full-precision re-ranking.
+
+    The best ``k * rerank_factor`` candidates by approximate score are
+    re-scored against float32 vectors. With ``rerank_factor <= 1`` no float32
+    copy is kept once the codec is trained, which is where the memory saving
+    comes from; re-ranking trades part of it back for recall.
+    """
+
+    kind = "flat"
+
+    def __init__(self, dim: int, *, codec: str, rerank_factor: int = 4, pq_subvectors: int = 16) -> None:
+        super().__init__(dim)
+        self.codec = codec
+        self.rerank_factor = rerank_factor
+        self._store = create_store(codec, dim, pq_subvectors=pq_subvectors)
+
+    @property
+    def _keeps_vectors(self) -> bool:
+        return self.rerank_factor > 1 or not self._store.trained
+
+    @property
+    def nbytes(self) -> int:
+        return self._store.nbytes + self._vectors.size * self.dim * 4
+
+    def add(self, ids: np.ndarray, vectors: np.ndarray) -> None:
+        self._ids.append(ids)
+        if self._store.trained:
+            self._store.append(vectors)
+        if self._keeps_vectors:
+            self._vectors.append(vectors)
+        if not self._store.trained and len(self) >= self._store.min_train_size:
+            self._store.train(self._vectors.view())
+            self._store.append(self._vectors.view())
+            if not self._keeps_vectors:
+                self._vectors = _GrowableMatrix(self.dim)
+
+    def search(self, query: np.ndarray, k: int) -> SearchHits:
+        if not self._store.trained:
+            return super().search(query, k)
+        if not len(self):
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        approximate = self._store.similarities(query)
+        if self.rerank_factor <= 1:
+            top = _top_k(approximate, k)
+            return self._ids.data[top], 1.0 - approximate[top]
+        candidates = _top_k(approximate, k * self.rerank_factor)
+        exact = self._vectors.data[candidates] @ query
+        top = _top_k(exact, k)
+        return self._ids.data[candidates[top]], 1.0 - exact[top]
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        arrays = {"ids": self._ids.view(), "trained": np.asarray(self._store.trained)}
+        if self._vectors.size:
+            arrays["vectors"] = self._vectors.view()
+        if self._store.trained:
+            arrays.update({f"codec_{name}": array for name, array in self._store.to_arrays().items()})
+        return arrays
+
+    def _load_arrays(self, arrays: Dict[str, np.ndarray]) -> None:
+        self._ids.append(arrays["ids"])
+        if "vectors" in arrays:
+            self._vectors.append(arrays["vectors"])
+        if bool(arrays["trained"]):
+            self._store.load_arrays(
+                {name[len("codec_") :]: array for name, array in arrays.items() if name.startswith("codec_")}
+            )
+
+
+def create_engine(kind: str, dim: int, **params: Any) -> FlatEngine:
+    """Build an engine by name, ignoring parameters it does not take."""
+
+    if kind == "ivf":
+        return IVFFlatEngine(dim, **{key: params[key] for key in ("nlist", "nprobe") if key in params})
+    if kind == "hnsw":
+        return HNSWEngine(
+            dim, **{key: params[key] for key in ("m", "ef_construction", "ef_search") if key in params}
+        )
+    if kind == "flat":
+        codec = params.get("codec", "none")
+        if codec != "none":
+            return QuantizedFlatEngine(
+                dim, codec=codec, **{key: params[key] for key in ("rerank_factor", "pq_subvectors") if key in params}
+            )
+        return FlatEngine(dim)
+    raise ValueError(f"unknown vector engine {kind!r}")
+
+
+def load_engine(kind: str, dim: int, arrays: Dict[str, np.ndarray], **params: Any) -> FlatEngine:
+    engine = create_engine(kind, dim, **params)
+    engine._load_arrays(arrays)
+    return engine
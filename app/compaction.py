@@ -0,0 +1,86 @@
+"""Collapse near-duplicate memories already stored in ``kb``.
+
+Scans the table, clusters rows per channel with the same MinHash + cosine
+rules as the deduplicating upsert, keeps the newest row of each cluster
+(filling in a missing ``source_url`` from the others) and deletes the rest.
+Without ``--apply`` it only reports what it would reclaim.
+
+    python -m app.compaction            # dry run
+    python -m app.compaction --apply
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+from typing import Any, Dict, List, Optional
+
+from loguru import logger
+import numpy as np
+
+from .config import settings
+from .dedup import cluster_duplicates, pick_survivor
+from .deps import shutdown_dependencies
+from .supa import delete_memories, iter_memory_pages, update_memory
+from .vector_index import normalize_rows
+
+_DELETE_BATCH = 200
+
+
+async def compact(*, apply: bool, min_cosine: float, min_jaccard: float) -> Dict[str, Any]:
+    """Find (and with ``apply``, remove) duplicate rows; returns a report."""
+
+    rows_by_channel: Dict[Optional[str], List[Dict[str, Any]]] = {}
+    vectors_by_channel: Dict[Optional[str], List[np.ndarray]] = {}
+    scanned = 0
+    async for page in iter_memory_pages():
+        for row in page:
+            channel = row.get("channel")
+            vectors_by_channel.setdefault(channel, []).append(np.asarray(row.pop("embedding"), dtype=np.float32))
+            rows_by_channel.setdefault(channel, []).append(row)
+        scanned += len(page)
+
+    report: Dict[str, Any] = {
+        "apply": apply,
+        "rows_scanned": scanned,
+        "clusters": 0,
+        "rows_reclaimed": 0,
+        "channels": {},
+    }
+    for channel, rows in rows_by_channel.items():
+        vectors = normalize_rows(np.stack(vectors_by_channel.pop(channel)))
+        clusters = cluster_duplicates(rows, vectors, min_cosine=min_cosine, min_jaccard=min_jaccard)
+        if not clusters:
+            continue
+        doomed: List[int] = []
+        for members in clusters:
+            cluster = [rows[position] for position in members]
+            survivor = pick_survivor(cluster)
+            doomed.extend(int(row["id"]) for row in cluster if row is not survivor)
+            if apply and not survivor.get("source_url"):
+                source_url = next((row["source_url"] for row in cluster if row.get("source_url")), None)
+                if source_url:
+                    await update_memory(int(survivor["id"]), channel, {"source_url": source_url})
+        if apply:
+            for start in range(0, len(doomed), _DELETE_BATCH):
+                await delete_memories(doomed[start : start + _DELETE_BATCH], [channel])
+        report["clusters"] += len(clusters)
+        report["rows_reclaimed"] += len(doomed)
+        report["channels"][channel or ""] = {"rows": len(rows), "clusters": len(clusters), "reclaimed": len(doomed)}
+        logger.info("channel {}: {} clusters, {} duplicate rows", channel, len(clusters), len(doomed))
+    return report
+
+
+async def main(args: argparse.Namespace) -> Dict[str, Any]:
+    try:
+        return await compact(apply=args.apply, min_cosine=args.min_cosine, min_jaccard=args.min_jaccard)
+    finally:
+        await shutdown_dependencies()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--apply", action="store_true", help="delete duplicates instead of only reporting them")
+    parser.add_argument("--min-cosine", type=float, default=settings.dedup_min_cosine)
+    parser.add_argument("--min-jaccard", type=float, default=settings.dedup_min_jaccard)
+    print(json.dumps(asyncio.run(main(parser.parse_args())), indent=2))
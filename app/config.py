@@ -3,6 +3,7 @@ from __future__ import annotations
 
 from functools import lru_cache
 import os
+from typing import Any, Dict, Literal, Optional
 from pydantic import BaseModel, ConfigDict, Field, HttpUrl
 from dotenv import load_dotenv
 
@@ -15,16 +16,84 @@ def _get_bool(value: str | None, default: bool = False) -> bool:
     return value.strip().lower() in {"1", "true", "yes", "on"}
 
 
+def worker_index() -> Optional[int]:
+    """Index of this process under ``python -m app.serve``; ``None`` when run standalone."""
+
+    value = os.getenv("APP_WORKER_INDEX")
+    return int(value) if value else None
+
+
+def worker_scoped_path(path: str) -> str:
+    """Give each worker its own copy of a file that only one process may write."""
+
+    index = worker_index()
+    if index is None:
+        return path
+    root, ext = os.path.splitext(path)
+    return f"{root}.worker{index}{ext}"
+
+
 class AppConfig(BaseModel):
     """Typed configuration for the service."""
 
     model_config = ConfigDict(frozen=True)
 
     port: int = Field(default=8080, ge=1, le=65535)
+    web_concurrency: int = Field(default=1, ge=1)
+    http_connection_budget: int = Field(default=100, ge=1)
+    http_retry_budget_ratio: float = Field(default=0.2, ge=0)
+    http_warmup_connections: int = Field(default=2, ge=0)
+    fast_startup: bool = Field(default=False)
+    breaker_failure_threshold: int = Field(default=5, ge=1)
+    breaker_reset_seconds: float = Field(default=30.0, gt=0)
+    dependency_queue_timeout_ms: float = Field(default=250.0, ge=0)
+    shed_latency_target_ms: float = Field(default=5000.0, ge=0)
+    embedding_http_pool_share: float = Field(default=0.3, gt=0, le=1)
+    embedding_http_timeout_seconds: float = Field(default=20.0, gt=0)
+    embedding_http_retries: int = Field(default=3, ge=0)
+    embedding_http2: bool = Field(default=True)
+    embedding_latency_target_ms: float = Field(default=2000.0, gt=0)
+    supabase_http_pool_share: float = Field(default=0.5, gt=0, le=1)
+    supabase_http_timeout_seconds: float = Field(default=20.0, gt=0)
+    supabase_http_retries: int = Field(default=3, ge=0)
+    supabase_http2: bool = Field(default=True)
+    supabase_latency_target_ms: float = Field(default=1000.0, gt=0)
+    slack_http_pool_share: float = Field(default=0.2, gt=0, le=1)
+    slack_http_timeout_seconds: float = Field(default=10.0, gt=0)
+    slack_http_retries: int = Field(default=3, ge=0)
+    slack_http2: bool = Field(default=True)
+    slack_latency_target_ms: float = Field(default=2000.0, gt=0)
     log_level: str = Field(default="INFO")
+    log_format: Literal["json", "text"] = Field(default="json")
+    log_queue_size: int = Field(default=10000, ge=1)
+    log_batch_size: int = Field(default=256, ge=1)
+    log_flush_interval_ms: float = Field(default=100.0, gt=0)
+    log_sample_burst: int = Field(default=5, ge=0)
+    log_sample_window_seconds: float = Field(default=60.0, gt=0)
+    admin_token: str | None = None
+
+    trace_sample_rate: float = Field(default=0.01, ge=0, le=1)
+    trace_slow_request_ms: float = Field(default=1000.0, ge=0)
+    trace_buffer_size: int = Field(default=256, ge=1)
+    trace_export_path: str | None = None
 
     slack_bot_token: str = Field(min_length=1)
     slack_post_as_user: bool = Field(default=False)
+    slack_api_url: str = Field(default="https://slack.com/api", min_length=1)
+    slack_signing_secret: str | None = None
+    slack_events_workers: int = Field(default=4, ge=1)
+    slack_events_queue_size: int = Field(default=1000, ge=1)
+    slack_events_drop_policy: Literal["drop_newest", "drop_oldest"] = Field(default="drop_newest")
+    slack_events_dedup_seconds: float = Field(default=600.0, gt=0)
+    slack_outbox_path: str | None = None
+    slack_outbox_max_depth: int = Field(default=10000, ge=1)
+    slack_outbox_max_attempts: int = Field(default=8, ge=1)
+    slack_outbox_concurrency: int = Field(default=8, ge=1)
+    slack_channel_rate_per_second: float = Field(default=1.0, gt=0)
+    slack_channel_burst: float = Field(default=3.0, ge=1)
+    slack_method_rate_per_minute: float = Field(default=300.0, gt=0)
+    slack_reply_format: Literal["text", "blocks"] = Field(default="text")
+    slack_feedback_hits: int = Field(default=3, ge=0)
 
     supabase_url: HttpUrl
     supabase_anon_key: str | None = None
@@ -32,10 +101,83 @@ class AppConfig(BaseModel):
     supabase_schema: str = Field(default="public", min_length=1)
     supabase_table: str = Field(default="kb", min_length=1)
     supabase_search_function: str = Field(default="match_memories", min_length=1)
+    supabase_insert_concurrency: int = Field(default=4, ge=1)
+    dedup_enabled: bool = Field(default=False)
+    dedup_neighbours: int = Field(default=3, ge=1, le=20)
+    dedup_min_cosine: float = Field(default=0.95, gt=0, le=1)
+    dedup_min_jaccard: float = Field(default=0.6, ge=0, le=1)
+    supabase_archive_table: str = Field(default="kb_archive", min_length=1)
+    supabase_archive_search_function: str = Field(default="match_archived_memories", min_length=1)
+    supabase_usage_function: str = Field(default="record_memory_hits", min_length=1)
+    supabase_reindex_function: str = Field(default="reindex_memories", min_length=1)
+    supabase_shards: str = Field(default="")
+    shard_routes: str = Field(default="")
+    retention_max_age_days: float = Field(default=0.0, ge=0)
+    retention_channel_max_age_days: str = Field(default="")
+    retention_idle_days: float = Field(default=90.0, ge=0)
+    retention_min_hits: int = Field(default=3, ge=0)
+    retention_reindex_min_fraction: float = Field(default=0.1, ge=0, le=1)
+    usage_flush_interval_seconds: float = Field(default=0.0, ge=0)
+    ranking_decay_half_life_days: float = Field(default=0.0, ge=0)
+    ranking_usage_weight: float = Field(default=0.0, ge=0)
+    ranking_candidate_factor: int = Field(default=2, ge=1)
+
+    local_index_enabled: bool = Field(default=False)
+    local_index_sync_interval_seconds: float = Field(default=30.0, gt=0)
+    local_index_max_staleness_seconds: float = Field(default=120.0, gt=0)
+    hybrid_search_enabled: bool = Field(default=False)
+    hybrid_rrf_k: int = Field(default=60, ge=1)
+    hybrid_candidate_factor: int = Field(default=4, ge=1)
+    local_index_engine: Literal["flat", "ivf", "hnsw"] = Field(default="flat")
+    local_index_snapshot_path: str | None = None
+    ann_nlist: int = Field(default=0, ge=0)
+    ann_nprobe: int = Field(default=8, ge=1)
+    ann_hnsw_m: int = Field(default=16, ge=2)
+    ann_ef_construction: int = Field(default=100, ge=1)
+    ann_ef_search: int = Field(default=64, ge=1)
+    local_index_codec: Literal["none", "float16", "int8", "pq"] = Field(default="none")
+    local_index_rerank_factor: int = Field(default=4, ge=0)
+    pq_subvectors: int = Field(default=16, ge=1)
+    rpc_vector_digits: int = Field(default=0, ge=0, le=17)
+
+    @property
+    def retention_max_age_overrides(self) -> Dict[str, float]:
+        """``RETENTION_CHANNEL_MAX_AGE_DAYS`` (``C1=730,C2=0``) as a channel -> days map."""
+
+        overrides: Dict[str, float] = {}
+        for item in self.retention_channel_max_age_days.split(","):
+            channel, _, days = item.partition("=")
+            if channel.strip() and days.strip():
+                overrides[channel.strip()] = float(days)
+        return overrides
+
+    @property
+    def ann_params(self) -> Dict[str, Any]:
+        return {
+            "codec": self.local_index_codec,
+            "rerank_factor": self.local_index_rerank_factor,
+            "pq_subvectors": self.pq_subvectors,
+            "nlist": self.ann_nlist,
+            "nprobe": self.ann_nprobe,
+            "m": self.ann_hnsw_m,
+            "ef_construction": self.ann_ef_construction,
+            "ef_search": self.ann_ef_search,
+        }
 
     embedding_api_url: HttpUrl
     embedding_api_key: str = Field(min_length=1)
     embedding_dim: int = Field(default=1536, gt=0)
+    embedding_cache_size: int = Field(default=2048, ge=0)
+    embedding_cache_ttl_seconds: float = Field(default=86400.0, ge=0)
+    embedding_cache_path: str | None = None
+    embedding_api_batch: bool = Field(default=False)
+    embedding_batch_window_ms: float = Field(default=5.0, ge=0)
+    embedding_batch_max_size: int = Field(default=32, ge=1)
+    embedding_concurrency: int = Field(default=32, ge=1)
+
+    semantic_cache_size: int = Field(default=1024, ge=0)
+    semantic_cache_ttl_seconds: float = Field(default=600.0, ge=0)
+    semantic_cache_min_similarity: float = Field(default=0.97, gt=0, le=1)
 
 
 @lru_cache(maxsize=1)
@@ -44,18 +186,115 @@ def get_settings() -> AppConfig:
 
     data = {
         "port": int(os.getenv("PORT", "8080")),
+        "web_concurrency": int(os.getenv("WEB_CONCURRENCY", "1")),
+        "http_connection_budget": int(os.getenv("HTTP_CONNECTION_BUDGET", "100")),
+        "http_retry_budget_ratio": float(os.getenv("HTTP_RETRY_BUDGET_RATIO", "0.2")),
+        "http_warmup_connections": int(os.getenv("HTTP_WARMUP_CONNECTIONS", "2")),
+        "fast_startup": _get_bool(os.getenv("FAST_STARTUP"), False),
+        "breaker_failure_threshold": int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5")),
+        "breaker_reset_seconds": float(os.getenv("BREAKER_RESET_SECONDS", "30")),
+        "dependency_queue_timeout_ms": float(os.getenv("DEPENDENCY_QUEUE_TIMEOUT_MS", "250")),
+        "shed_latency_target_ms": float(os.getenv("SHED_LATENCY_TARGET_MS", "5000")),
+        "embedding_http_pool_share": float(os.getenv("EMBEDDING_HTTP_POOL_SHARE", "0.3")),
+        "embedding_http_timeout_seconds": float(os.getenv("EMBEDDING_HTTP_TIMEOUT_SECONDS", "20")),
+        "embedding_http_retries": int(os.getenv("EMBEDDING_HTTP_RETRIES", "3")),
+        "embedding_http2": _get_bool(os.getenv("EMBEDDING_HTTP2"), True),
+        "embedding_latency_target_ms": float(os.getenv("EMBEDDING_LATENCY_TARGET_MS", "2000")),
+        "supabase_http_pool_share": float(os.getenv("SUPABASE_HTTP_POOL_SHARE", "0.5")),
+        "supabase_http_timeout_seconds": float(os.getenv("SUPABASE_HTTP_TIMEOUT_SECONDS", "20")),
+        "supabase_http_retries": int(os.getenv("SUPABASE_HTTP_RETRIES", "3")),
+        "supabase_http2": _get_bool(os.getenv("SUPABASE_HTTP2"), True),
+        "supabase_latency_target_ms": float(os.getenv("SUPABASE_LATENCY_TARGET_MS", "1000")),
+        "slack_http_pool_share": float(os.getenv("SLACK_HTTP_POOL_SHARE", "0.2")),
+        "slack_http_timeout_seconds": float(os.getenv("SLACK_HTTP_TIMEOUT_SECONDS", "10")),
+        "slack_http_retries": int(os.getenv("SLACK_HTTP_RETRIES", "3")),
+        "slack_http2": _get_bool(os.getenv("SLACK_HTTP2"), True),
+        "slack_latency_target_ms": float(os.getenv("SLACK_LATENCY_TARGET_MS", "2000")),
         "log_level": os.getenv("LOG_LEVEL", "INFO").upper(),
+        "log_format": os.getenv("LOG_FORMAT", "json").lower(),
+        "log_queue_size": int(os.getenv("LOG_QUEUE_SIZE", "10000")),
+        "log_batch_size": int(os.getenv("LOG_BATCH_SIZE", "256")),
+        "log_flush_interval_ms": float(os.getenv("LOG_FLUSH_INTERVAL_MS", "100")),
+        "log_sample_burst": int(os.getenv("LOG_SAMPLE_BURST", "5")),
+        "log_sample_window_seconds": float(os.getenv("LOG_SAMPLE_WINDOW_SECONDS", "60")),
+        "admin_token": os.getenv("ADMIN_TOKEN") or None,
+        "trace_sample_rate": float(os.getenv("TRACE_SAMPLE_RATE", "0.01")),
+        "trace_slow_request_ms": float(os.getenv("TRACE_SLOW_REQUEST_MS", "1000")),
+        "trace_buffer_size": int(os.getenv("TRACE_BUFFER_SIZE", "256")),
+        "trace_export_path": os.getenv("TRACE_EXPORT_PATH") or None,
         "slack_bot_token": os.getenv("SLACK_BOT_TOKEN"),
         "slack_post_as_user": _get_bool(os.getenv("SLACK_POST_AS_USER"), False),
+        "slack_api_url": os.getenv("SLACK_API_URL", "https://slack.com/api").rstrip("/"),
+        "slack_signing_secret": os.getenv("SLACK_SIGNING_SECRET") or None,
+        "slack_events_workers": int(os.getenv("SLACK_EVENTS_WORKERS", "4")),
+        "slack_events_queue_size": int(os.getenv("SLACK_EVENTS_QUEUE_SIZE", "1000")),
+        "slack_events_drop_policy": os.getenv("SLACK_EVENTS_DROP_POLICY", "drop_newest").lower(),
+        "slack_events_dedup_seconds": float(os.getenv("SLACK_EVENTS_DEDUP_SECONDS", "600")),
+        "slack_outbox_path": os.getenv("SLACK_OUTBOX_PATH") or None,
+        "slack_outbox_max_depth": int(os.getenv("SLACK_OUTBOX_MAX_DEPTH", "10000")),
+        "slack_outbox_max_attempts": int(os.getenv("SLACK_OUTBOX_MAX_ATTEMPTS", "8")),
+        "slack_outbox_concurrency": int(os.getenv("SLACK_OUTBOX_CONCURRENCY", "8")),
+        "slack_channel_rate_per_second": float(os.getenv("SLACK_CHANNEL_RATE_PER_SECOND", "1")),
+        "slack_channel_burst": float(os.getenv("SLACK_CHANNEL_BURST", "3")),
+        "slack_method_rate_per_minute": float(os.getenv("SLACK_METHOD_RATE_PER_MINUTE", "300")),
+        "slack_reply_format": os.getenv("SLACK_REPLY_FORMAT", "text").lower(),
+        "slack_feedback_hits": int(os.getenv("SLACK_FEEDBACK_HITS", "3")),
         "supabase_url": os.getenv("SUPABASE_URL"),
         "supabase_anon_key": os.getenv("SUPABASE_ANON_KEY"),
         "supabase_service_role_key": os.getenv("SUPABASE_SERVICE_ROLE_KEY"),
         "supabase_schema": os.getenv("SUPABASE_SCHEMA", "public"),
         "supabase_table": os.getenv("SUPABASE_TABLE", "kb"),
         "supabase_search_function": os.getenv("SUPABASE_SEARCH_FUNCTION", "match_memories"),
+        "supabase_insert_concurrency": int(os.getenv("SUPABASE_INSERT_CONCURRENCY", "4")),
+        "dedup_enabled": _get_bool(os.getenv("DEDUP_ENABLED"), False),
+        "dedup_neighbours": int(os.getenv("DEDUP_NEIGHBOURS", "3")),
+        "dedup_min_cosine": float(os.getenv("DEDUP_MIN_COSINE", "0.95")),
+        "dedup_min_jaccard": float(os.getenv("DEDUP_MIN_JACCARD", "0.6")),
+        "supabase_archive_table": os.getenv("SUPABASE_ARCHIVE_TABLE", "kb_archive"),
+        "supabase_archive_search_function": os.getenv("SUPABASE_ARCHIVE_SEARCH_FUNCTION", "match_archived_memories"),
+        "supabase_usage_function": os.getenv("SUPABASE_USAGE_FUNCTION", "record_memory_hits"),
+        "supabase_reindex_function": os.getenv("SUPABASE_REINDEX_FUNCTION", "reindex_memories"),
+        "supabase_shards": os.getenv("SUPABASE_SHARDS", ""),
+        "shard_routes": os.getenv("SHARD_ROUTES", ""),
+        "retention_max_age_days": float(os.getenv("RETENTION_MAX_AGE_DAYS", "0")),
+        "retention_channel_max_age_days": os.getenv("RETENTION_CHANNEL_MAX_AGE_DAYS", ""),
+        "retention_idle_days": float(os.getenv("RETENTION_IDLE_DAYS", "90")),
+        "retention_min_hits": int(os.getenv("RETENTION_MIN_HITS", "3")),
+        "retention_reindex_min_fraction": float(os.getenv("RETENTION_REINDEX_MIN_FRACTION", "0.1")),
+        "usage_flush_interval_seconds": float(os.getenv("USAGE_FLUSH_INTERVAL_SECONDS", "0")),
+        "ranking_decay_half_life_days": float(os.getenv("RANKING_DECAY_HALF_LIFE_DAYS", "0")),
+        "ranking_usage_weight": float(os.getenv("RANKING_USAGE_WEIGHT", "0")),
+        "ranking_candidate_factor": int(os.getenv("RANKING_CANDIDATE_FACTOR", "2")),
+        "local_index_enabled": _get_bool(os.getenv("LOCAL_INDEX_ENABLED"), False),
+        "local_index_sync_interval_seconds": float(os.getenv("LOCAL_INDEX_SYNC_INTERVAL_SECONDS", "30")),
+        "local_index_max_staleness_seconds": float(os.getenv("LOCAL_INDEX_MAX_STALENESS_SECONDS", "120")),
+        "hybrid_search_enabled": _get_bool(os.getenv("HYBRID_SEARCH_ENABLED"), False),
+        "hybrid_rrf_k": int(os.getenv("HYBRID_RRF_K", "60")),
+        "hybrid_candidate_factor": int(os.getenv("HYBRID_CANDIDATE_FACTOR", "4")),
+        "local_index_engine": os.getenv("LOCAL_INDEX_ENGINE", "flat").lower(),
+        "local_index_snapshot_path": os.getenv("LOCAL_INDEX_SNAPSHOT_PATH") or None,
+        "ann_nlist": int(os.getenv("ANN_NLIST", "0")),
+        "ann_nprobe": int(os.getenv("ANN_NPROBE", "8")),
+        "ann_hnsw_m": int(os.getenv("ANN_HNSW_M", "16")),
+        "ann_ef_construction": int(os.getenv("ANN_EF_CONSTRUCTION", "100")),
+        "ann_ef_search": int(os.getenv("ANN_EF_SEARCH", "64")),
+        "local_index_codec": os.getenv("LOCAL_INDEX_CODEC", "none").lower(),
+        "local_index_rerank_factor": int(os.getenv("LOCAL_INDEX_RERANK_FACTOR", "4")),
+        "pq_subvectors": int(os.getenv("PQ_SUBVECTORS", "16")),
+        "rpc_vector_digits": int(os.getenv("RPC_VECTOR_DIGITS", "0")),
         "embedding_api_url": os.getenv("EMBEDDING_API_URL"),
         "embedding_api_key": os.getenv("EMBEDDING_API_KEY"),
         "embedding_dim": int(os.getenv("EMBEDDING_DIM", "1536")),
+        "embedding_cache_size": int(os.getenv("EMBEDDING_CACHE_SIZE", "2048")),
+        "embedding_cache_ttl_seconds": float(os.getenv("EMBEDDING_CACHE_TTL_SECONDS", "86400")),
+        "embedding_cache_path": os.getenv("EMBEDDING_CACHE_PATH") or None,
+        "embedding_api_batch": _get_bool(os.getenv("EMBEDDING_API_BATCH"), False),
+        "embedding_batch_window_ms": float(os.getenv("EMBEDDING_BATCH_WINDOW_MS", "5")),
+        "embedding_batch_max_size": int(os.getenv("EMBEDDING_BATCH_MAX_SIZE", "32")),
+        "embedding_concurrency": int(os.getenv("EMBEDDING_CONCURRENCY", "32")),
+        "semantic_cache_size": int(os.getenv("SEMANTIC_CACHE_SIZE", "1024")),
+        "semantic_cache_ttl_seconds": float(os.getenv("SEMANTIC_CACHE_TTL_SECONDS", "600")),
+        "semantic_cache_min_similarity": float(os.getenv("SEMANTIC_CACHE_MIN_SIMILARITY", "0.97")),
     }
     return AppConfig(**data)
 
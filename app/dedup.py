@@ -0,0 +1,210 @@
+"""Near-duplicate detection for memories: MinHash over ``q_text`` plus a cosine check."""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from functools import lru_cache
+import re
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Sequence, Tuple
+import zlib
+
+from .ranking import parse_timestamp
+
+# numpy is imported on first use: the upsert path only needs it once dedup is enabled.
+if TYPE_CHECKING:
+    import numpy as np
+
+NUM_PERM = 64
+LSH_BANDS = 16
+_SHINGLE = 4
+_PRIME = 4294967311  # smallest prime above 2**32
+_NON_WORD = re.compile(r"[^0-9a-z]+")
+
+
+@lru_cache(maxsize=1)
+def _permutations() -> Tuple["np.ndarray", "np.ndarray"]:
+    import numpy as np
+
+    rng = np.random.default_rng(0x6B62)
+    return (
+        rng.integers(1, 2**31, size=NUM_PERM, dtype=np.uint64),
+        rng.integers(0, 2**31, size=NUM_PERM, dtype=np.uint64),
+    )
+
+
+def normalize_text(text: str) -> str:
+    return _NON_WORD.sub(" ", text.lower()).strip()
+
+
+def minhash(text: str) -> np.ndarray:
+    """``NUM_PERM`` MinHash values over character shingles of the normalized text."""
+
+    normalized = normalize_text(text)
+    if len(normalized) <= _SHINGLE:
+        shingles = {normalized}
+    else:
+        shingles = {normalized[i : i + _SHINGLE] for i in range(len(normalized) - _SHINGLE + 1)}
+    import numpy as np
+
+    a, b = _permutations()
+    hashes = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64, count=len(shingles))
+    # a * h + b stays below 2**64 because a, b < 2**31 and h < 2**32.
+    return ((np.outer(hashes, a) + b) % np.uint64(_PRIME)).min(axis=0)
+
+
+def jaccard(left: np.ndarray, right: np.ndarray) -> float:
+    """Estimated Jaccard similarity of two MinHash signatures."""
+
+    return float((left == right).sum()) / len(left)
+
+
+def lsh_keys(signature: np.ndarray, bands: int = LSH_BANDS) -> List[bytes]:
+    """Band keys for locality-sensitive bucketing; similar signatures share at least one."""
+
+    rows = len(signature) // bands
+    return [bytes([band]) + signature[band * rows : (band + 1) * rows].tobytes() for band in range(bands)]
+
+
+def _is_older(row: Dict[str, Any], existing: Dict[str, Any]) -> bool:
+    new_ts, old_ts = parse_timestamp(row.get("ts")), parse_timestamp(existing.get("ts"))
+    if new_ts is None or old_ts is None or (new_ts.tzinfo is None) != (old_ts.tzinfo is None):
+        return False
+    return new_ts < old_ts
+
+
+@dataclass
+class DedupDecision:
+    """What to do with an incoming row: ``insert``, or ``merge``/``update``/``skip`` into ``memory_id``."""
+
+    action: str
+    memory_id: Optional[int] = None
+    changes: Dict[str, Any] = field(default_factory=dict)
+
+
+def decide(
+    row: Dict[str, Any],
+    neighbours: Sequence[Dict[str, Any]],
+    *,
+    min_cosine: float,
+    min_jaccard: float,
+) -> DedupDecision:
+    """Compare ``row`` with its nearest neighbours (``search_memory`` rows, ``score`` = distance).
+
+    A neighbour is a duplicate when both the embedding cosine and the MinHash
+    Jaccard of the questions clear their thresholds. The same answer fills in
+    missing ``source_url``/``ts`` (``merge``) or is dropped (``skip``); a
+    different answer replaces the stored one (``update``) unless the incoming
+    row is older.
+    """
+
+    signature = minhash(row["q_text"])
+    for neighbour in sorted(neighbours, key=lambda item: item["score"]):
+        if 1.0 - float(neighbour["score"]) < min_cosine:
+            break
+        if jaccard(signature, minhash(neighbour["q_text"])) < min_jaccard:
+            continue
+        memory_id = int(neighbour["id"])
+        if _is_older(row, neighbour):
+            return DedupDecision("skip", memory_id)
+        if normalize_text(row["a_text"]) != normalize_text(neighbour["a_text"]):
+            changes = {"a_text": row["a_text"]}
+            changes.update((key, row[key]) for key in ("source_url", "ts") if row.get(key))
+            return DedupDecision("update", memory_id, changes)
+        changes = {key: row[key] for key in ("source_url", "ts") if row.get(key) and not neighbour.get(key)}
+        return DedupDecision("merge" if changes else "skip", memory_id, changes)
+    return DedupDecision("insert")
+
+
+def fold_duplicates(
+    rows: Sequence[Dict[str, Any]], *, min_cosine: float, min_jaccard: float
+) -> List[DedupDecision]:
+    """Dedupe rows (with ``embedding``) against each other before they are inserted.
+
+    Returns one decision per row. Kept rows get ``insert``; the others point
+    ``memory_id`` at the position of the kept row they fold into, whose dict
+    has already been updated with ``changes``.
+    """
+
+    if not rows:
+        return []
+    import numpy as np
+
+    vectors = np.asarray([row["embedding"] for row in rows], dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    vectors /= norms
+    kept: List[int] = []
+    decisions: List[DedupDecision] = []
+    for position, row in enumerate(rows):
+        neighbours = []
+        if kept:
+            similarities = vectors[kept] @ vectors[position]
+            neighbours = [
+                {**rows[kept[i]], "id": kept[i], "score": 1.0 - float(similarities[i])}
+                for i in np.flatnonzero(similarities >= min_cosine)
+            ]
+        decision = decide(row, neighbours, min_cosine=min_cosine, min_jaccard=min_jaccard)
+        if decision.action == "insert":
+            kept.append(position)
+        else:
+            rows[decision.memory_id].update(decision.changes)  # type: ignore[index]
+        decisions.append(decision)
+    return decisions
+
+
+def cluster_duplicates(
+    rows: Sequence[Dict[str, Any]],
+    vectors: np.ndarray,
+    *,
+    min_cosine: float,
+    min_jaccard: float,
+) -> List[List[int]]:
+    """Group positions of near-duplicate rows (one channel) into clusters of two or more.
+
+    Candidate pairs come from MinHash LSH buckets and are confirmed with the
+    same cosine and Jaccard thresholds as the upsert path; ``vectors`` must be
+    unit-normalized.
+    """
+
+    signatures = [minhash(row["q_text"]) for row in rows]
+    parent = list(range(len(rows)))
+
+    def _find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    buckets: Dict[bytes, List[int]] = {}
+    for position, signature in enumerate(signatures):
+        for key in lsh_keys(signature):
+            buckets.setdefault(key, []).append(position)
+
+    checked = set()
+    for members in buckets.values():
+        for i, left in enumerate(members):
+            for right in members[i + 1 :]:
+                if (left, right) in checked:
+                    continue
+                checked.add((left, right))
+                if _find(left) == _find(right):
+                    continue
+                if float(vectors[left] @ vectors[right]) < min_cosine:
+                    continue
+                if jaccard(signatures[left], signatures[right]) < min_jaccard:
+                    continue
+                parent[_find(right)] = _find(left)
+
+    clusters: Dict[int, List[int]] = {}
+    for position in range(len(rows)):
+        clusters.setdefault(_find(position), []).append(position)
+    return [members for members in clusters.values() if len(members) > 1]
+
+
+def pick_survivor(rows: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """The newest row of a cluster (by ``ts``, then ``id``) is kept."""
+
+    def _key(row: Dict[str, Any]) -> tuple:
+        ts = parse_timestamp(row.get("ts"))
+        return (ts.timestamp() if ts is not None and ts.tzinfo is not None else float("-inf"), int(row["id"]))
+
+    return max(rows, key=_key)
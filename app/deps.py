@@ -1,26 +1,251 @@
-"""Application-wide dependency singletons."""
+"""Application-wide dependency singletons.
+
+Singletons backed by heavy modules (supabase-py, numpy via the vector
+index and semantic cache) import them on first use, so importing the app
+stays fast; ``initialize_dependencies`` builds them ahead of traffic.
+"""
 from __future__ import annotations
 
-from typing import Optional
+import asyncio
+import os
+import time
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Dict, List, Literal, Optional
 
 import httpx
-from supabase import Client, create_client
+from loguru import logger
 
 from .config import settings
+from .embedding_cache import EmbeddingCache
+from .instrumentation import InstrumentedTransport, record_dependency_guard, record_pool_usage
+from .lexical_index import LexicalIndex
+from .metrics import REGISTRY
+from .outbound import DependencyStatus, RetryBudget, RetryingTransport, warm_up
+from .ranking import UsageTracker
+from .resilience import AIMDLimiter, CircuitBreaker, GuardedTransport, LoadShedder
+
+if TYPE_CHECKING:
+    from supabase import Client
+
+    from .semantic_cache import SemanticCache
+    from .vector_index import LocalVectorIndex
+
+Destination = Literal["embedding", "supabase", "slack"]
+DESTINATIONS: tuple[Destination, ...] = ("embedding", "supabase", "slack")
+
+try:
+    import h2  # noqa: F401
+
+    _HTTP2_AVAILABLE = True
+except ImportError:  # pragma: no cover - h2 ships with httpx[http2]
+    _HTTP2_AVAILABLE = False
+
+
+def _destination_setting(destination: Destination, name: str):
+    return getattr(settings, f"{destination}_{name}")
+
+
+def http_limits(destination: Destination) -> httpx.Limits:
+    """``destination``'s pool share of this worker's part of ``HTTP_CONNECTION_BUDGET``."""
+
+    per_worker = settings.http_connection_budget / settings.web_concurrency
+    connections = max(1, int(per_worker * _destination_setting(destination, "http_pool_share")))
+    return httpx.Limits(max_connections=connections, max_keepalive_connections=min(20, connections))
 
-_http_client: Optional[httpx.AsyncClient] = None
+
+def _http2_enabled(destination: Destination) -> bool:
+    return bool(_destination_setting(destination, "http2")) and _HTTP2_AVAILABLE
+
+
+_http_clients: Dict[str, httpx.AsyncClient] = {}
+_dependency_status: Dict[str, DependencyStatus] = {}
+_limiters: Dict[str, AIMDLimiter] = {}
+_breakers: Dict[str, CircuitBreaker] = {}
+_load_shedder: Optional[LoadShedder] = None
 _supabase_client: Optional[Client] = None
+_embedding_cache: Optional[EmbeddingCache] = None
+_local_index: Optional[LocalVectorIndex] = None
+_semantic_cache: Optional[SemanticCache] = None
+_lexical_index: Optional[LexicalIndex] = None
+_usage_tracker: Optional[UsageTracker] = None
+# Non-default shards get their own semantic cache namespace and hit counts.
+_shard_semantic_caches: Dict[str, SemanticCache] = {}
+_shard_usage_trackers: Dict[str, UsageTracker] = {}
+_startup: Optional[StartupProgress] = None
+
+
+def _client_key(destination: Destination, shard: Optional[str]) -> str:
+    return destination if shard is None else f"{destination}:{shard}"
+
+
+def _shard_keys() -> List[str]:
+    from .sharding import all_shards
+
+    return [_client_key("supabase", shard.client_key) for shard in all_shards().values() if shard.client_key]
+
+
+def get_http_client(destination: Destination, shard: Optional[str] = None) -> httpx.AsyncClient:
+    """Return the shared AsyncClient for one outbound dependency.
+
+    Each destination has its own pool, timeout and retry budget, so a slow
+    embedding provider cannot hold connections Supabase or Slack need. Calls
+    go through the destination's circuit breaker and adaptive concurrency
+    limit before they are retried or queued for a connection. Supabase
+    shards other than the default (``shard``) each get a client, breaker
+    and limit of their own, sized like the default one.
+    """
+
+    key = _client_key(destination, shard)
+    client = _http_clients.get(key)
+    if client is None:
+        timeout = httpx.Timeout(
+            _destination_setting(destination, "http_timeout_seconds"), connect=5.0, write=5.0, pool=5.0
+        )
+        transport = GuardedTransport(
+            RetryingTransport(
+                InstrumentedTransport(
+                    httpx.AsyncHTTPTransport(limits=http_limits(destination), http2=_http2_enabled(destination))
+                ),
+                retries=_destination_setting(destination, "http_retries"),
+                budget=RetryBudget(ratio=settings.http_retry_budget_ratio),
+                name=key,
+            ),
+            name=key,
+            limiter=get_dependency_limiter(destination, shard),
+            breaker=get_circuit_breaker(destination, shard),
+        )
+        status = dependency_status().get(key) or _dependency_status.setdefault(
+            key, DependencyStatus(http_limits(destination).max_connections, _http2_enabled(destination))
+        )
+        client = _http_clients[key] = httpx.AsyncClient(
+            timeout=timeout,
+            transport=transport,
+            event_hooks={"response": [status.record_response]},
+        )
+    return client
+
+
+def get_dependency_limiter(destination: Destination, shard: Optional[str] = None) -> AIMDLimiter:
+    """Return ``destination``'s adaptive concurrency limit, capped at its pool size."""
+
+    key = _client_key(destination, shard)
+    limiter = _limiters.get(key)
+    if limiter is None:
+        limiter = _limiters[key] = AIMDLimiter(
+            max_limit=http_limits(destination).max_connections,
+            latency_target=_destination_setting(destination, "latency_target_ms") / 1000,
+            max_wait=settings.dependency_queue_timeout_ms / 1000,
+        )
+    return limiter
+
+
+def get_circuit_breaker(destination: Destination, shard: Optional[str] = None) -> CircuitBreaker:
+    """Return ``destination``'s circuit breaker."""
+
+    key = _client_key(destination, shard)
+    breaker = _breakers.get(key)
+    if breaker is None:
+        breaker = _breakers[key] = CircuitBreaker(
+            failure_threshold=settings.breaker_failure_threshold,
+            reset_seconds=settings.breaker_reset_seconds,
+        )
+    return breaker
+
+
+def get_load_shedder() -> LoadShedder:
+    """Return the process-wide load shedder for inbound requests."""
+
+    global _load_shedder
+    if _load_shedder is None:
+        _load_shedder = LoadShedder(target=settings.shed_latency_target_ms / 1000)
+    return _load_shedder
+
+
+def resilience_stats() -> Dict[str, object]:
+    return {
+        "dependencies": {
+            **{
+                destination: {
+                    "limiter": get_dependency_limiter(destination).stats(),
+                    "breaker": get_circuit_breaker(destination).stats(),
+                }
+                for destination in DESTINATIONS
+            },
+            **{
+                key: {"limiter": _limiters[key].stats(), "breaker": _breakers[key].stats()}
+                for key in _shard_keys()
+                if key in _limiters
+            },
+        },
+        "load_shedding": get_load_shedder().stats(),
+    }
+
+
+def _dependency_url(destination: Destination) -> str:
+    if destination == "embedding":
+        return str(settings.embedding_api_url)
+    if destination == "supabase":
+        return str(settings.supabase_url)
+    return settings.slack_api_url
+
+
+def dependency_status() -> Dict[str, DependencyStatus]:
+    for destination in DESTINATIONS:
+        if destination not in _dependency_status:
+            _dependency_status[destination] = DependencyStatus(
+                http_limits(destination).max_connections, _http2_enabled(destination)
+            )
+    return _dependency_status
+
+
+async def warm_up_http_clients() -> None:
+    """Pre-open keep-alive connections to every dependency and shard; failures only mark it not warm."""
+
+    from .sharding import all_shards
+
+    if not settings.http_warmup_connections:
+        return
+    targets = [(destination, None, _dependency_url(destination)) for destination in DESTINATIONS]
+    targets.extend(("supabase", shard.client_key, shard.url) for shard in all_shards().values() if shard.client_key)
+    statuses = dependency_status()
+    await asyncio.gather(
+        *(
+            warm_up(
+                get_http_client(destination, shard),
+                url,
+                statuses[_client_key(destination, shard)],
+                min(settings.http_warmup_connections, http_limits(destination).max_keepalive_connections),
+            )
+            for destination, shard, url in targets
+        )
+    )
+
+
+def _collect_http_pool() -> None:
+    for key in [*DESTINATIONS, *(key for key in _http_clients if key not in DESTINATIONS)]:
+        destination: Destination = key.partition(":")[0]  # type: ignore[assignment]
+        client = _http_clients.get(key)
+        transport = getattr(client, "_transport", None)
+        inner = getattr(transport, "inner", None)
+        record_pool_usage(
+            key,
+            inner if isinstance(inner, InstrumentedTransport) else None,
+            http_limits(destination).max_connections if client is not None else None,
+        )
 
 
-def get_http_client() -> httpx.AsyncClient:
-    """Return a shared AsyncClient with sane defaults."""
+def _collect_resilience() -> None:
+    for key in [*DESTINATIONS, *(key for key in _limiters if key not in DESTINATIONS)]:
+        limiter = _limiters.get(key)
+        breaker = _breakers.get(key)
+        record_dependency_guard(
+            key,
+            limiter.limit if limiter is not None else None,
+            breaker.state if breaker is not None else None,
+        )
 
-    global _http_client
-    if _http_client is None:
-        timeout = httpx.Timeout(connect=5.0, read=20.0, write=5.0, pool=5.0)
-        transport = httpx.AsyncHTTPTransport(retries=3)
-        _http_client = httpx.AsyncClient(timeout=timeout, transport=transport)
-    return _http_client
+
+REGISTRY.add_collector(_collect_http_pool)
+REGISTRY.add_collector(_collect_resilience)
 
 
 def get_supabase_client() -> Client:
@@ -28,14 +253,204 @@ def get_supabase_client() -> Client:
 
     global _supabase_client
     if _supabase_client is None:
+        from supabase import create_client
+
         _supabase_client = create_client(str(settings.supabase_url), settings.supabase_service_role_key)
     return _supabase_client
 
 
+def get_embedding_cache() -> EmbeddingCache:
+    """Return the process-wide embedding cache."""
+
+    global _embedding_cache
+    if _embedding_cache is None:
+        _embedding_cache = EmbeddingCache(
+            max_entries=settings.embedding_cache_size,
+            ttl_seconds=settings.embedding_cache_ttl_seconds,
+            path=settings.embedding_cache_path,
+        )
+    return _embedding_cache
+
+
+def get_semantic_cache(shard: Optional[str] = None) -> SemanticCache:
+    """Return the semantic search cache of the default shard, or of ``shard``."""
+
+    global _semantic_cache
+    cache = _semantic_cache if shard is None else _shard_semantic_caches.get(shard)
+    if cache is None:
+        from .semantic_cache import SemanticCache
+
+        cache = SemanticCache(
+            max_entries=settings.semantic_cache_size,
+            ttl_seconds=settings.semantic_cache_ttl_seconds,
+            min_similarity=settings.semantic_cache_min_similarity,
+        )
+        if shard is None:
+            _semantic_cache = cache
+        else:
+            _shard_semantic_caches[shard] = cache
+    return cache
+
+
+def get_local_index() -> Optional[LocalVectorIndex]:
+    """Return the local read replica, or ``None`` when it is disabled."""
+
+    global _local_index
+    if not settings.local_index_enabled:
+        return None
+    if _local_index is None:
+        from .vector_index import LocalVectorIndex
+
+        _local_index = _load_local_index_snapshot() or LocalVectorIndex(
+            dim=settings.embedding_dim,
+            max_staleness_seconds=settings.local_index_max_staleness_seconds,
+            engine=settings.local_index_engine,
+            engine_params=settings.ann_params,
+        )
+    return _local_index
+
+
+def get_lexical_index() -> Optional[LexicalIndex]:
+    """Return the BM25 index for hybrid search, or ``None`` when it is disabled."""
+
+    global _lexical_index
+    if not settings.hybrid_search_enabled:
+        return None
+    if _lexical_index is None:
+        _lexical_index = LexicalIndex(max_staleness_seconds=settings.local_index_max_staleness_seconds)
+    return _lexical_index
+
+
+def get_usage_tracker(shard: Optional[str] = None) -> UsageTracker:
+    """Return the counter of memories returned by searches, for the default shard or ``shard``."""
+
+    global _usage_tracker
+    if shard is not None:
+        return _shard_usage_trackers.setdefault(shard, UsageTracker())
+    if _usage_tracker is None:
+        _usage_tracker = UsageTracker()
+    return _usage_tracker
+
+
+def usage_trackers() -> Dict[Optional[str], UsageTracker]:
+    """Every shard's usage counter, keyed like ``get_usage_tracker``'s ``shard``."""
+
+    return {None: get_usage_tracker(), **_shard_usage_trackers}
+
+
+class StartupProgress:
+    """How long each startup step took, which ones failed, and whether all of them ran."""
+
+    def __init__(self) -> None:
+        self.started = time.perf_counter()
+        self.durations_ms: Dict[str, float] = {}
+        self.errors: Dict[str, str] = {}
+        self.total_ms: Optional[float] = None
+
+    @property
+    def complete(self) -> bool:
+        return self.total_ms is not None
+
+    async def step(self, name: str, work: Awaitable[Any]) -> None:
+        """Await ``work``; a failure is logged and recorded, the process still starts."""
+
+        started = time.perf_counter()
+        try:
+            await work
+        except Exception as exc:
+            self.errors[name] = str(exc) or type(exc).__name__
+            logger.warning("startup step {} failed: {}", name, exc)
+        finally:
+            self.durations_ms[name] = round((time.perf_counter() - started) * 1000, 2)
+
+    def finish(self) -> None:
+        self.total_ms = round((time.perf_counter() - self.started) * 1000, 2)
+        logger.info("startup finished in {}ms: {}", self.total_ms, self.durations_ms)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "complete": self.complete,
+            "total_ms": self.total_ms,
+            "steps_ms": dict(self.durations_ms),
+            "errors": dict(self.errors),
+        }
+
+
+def get_startup_progress() -> StartupProgress:
+    global _startup
+    if _startup is None:
+        _startup = StartupProgress()
+    return _startup
+
+
+def dependencies_ready() -> bool:
+    """Startup has finished and every dependency has answered at least once."""
+
+    statuses = dependency_status()
+    warm = not settings.http_warmup_connections or all(status.warm for status in statuses.values())
+    return get_startup_progress().complete and warm
+
+
+async def initialize_dependencies(warmup_timeout: float, *extra: tuple[str, Callable[[], Awaitable[Any]]]) -> None:
+    """Build every singleton concurrently, then mark startup complete.
+
+    Snapshot loading and the SQLite-backed caches block, so they run in
+    threads alongside the connection warm-up; ``extra`` adds named steps.
+    """
+
+    progress = get_startup_progress()
+    steps = {
+        "http_warmup": asyncio.wait_for(warm_up_http_clients(), timeout=warmup_timeout),
+        "local_index": asyncio.to_thread(get_local_index),
+        "lexical_index": asyncio.to_thread(get_lexical_index),
+        "semantic_cache": asyncio.to_thread(get_semantic_cache),
+        "embedding_cache": asyncio.to_thread(get_embedding_cache),
+        **{name: factory() for name, factory in extra},
+    }
+    await asyncio.gather(*(progress.step(name, work) for name, work in steps.items()))
+    progress.finish()
+
+
+def _load_local_index_snapshot() -> Optional[LocalVectorIndex]:
+    from .vector_index import LocalVectorIndex
+
+    path = settings.local_index_snapshot_path
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        index = LocalVectorIndex.load(
+            path,
+            max_staleness_seconds=settings.local_index_max_staleness_seconds,
+            engine_params=settings.ann_params,
+        )
+    except (OSError, ValueError, KeyError) as exc:
+        logger.warning("ignoring unreadable local index snapshot {}: {}", path, exc)
+        return None
+    if index.engine != settings.local_index_engine or index.dim != settings.embedding_dim:
+        logger.info("local index snapshot does not match the configured engine; rebuilding")
+        return None
+    logger.info("loaded local index snapshot with {} rows", len(index))
+    return index
+
+
 async def shutdown_dependencies() -> None:
     """Clean up network clients on application shutdown."""
 
-    global _http_client
-    if _http_client is not None:
-        await _http_client.aclose()
-        _http_client = None
+    # Imported here because these modules depend on this one.
+    from .embeddings import shutdown_embedding_dispatcher
+    from .slack_outbox import shutdown_slack_outbox
+
+    global _embedding_cache, _startup
+    await shutdown_embedding_dispatcher()
+    await shutdown_slack_outbox()
+    clients = list(_http_clients.values())
+    _http_clients.clear()
+    _dependency_status.clear()
+    _limiters.clear()
+    _breakers.clear()
+    for client in clients:
+        await client.aclose()
+    if _embedding_cache is not None:
+        await _embedding_cache.close()
+        _embedding_cache = None
+    _startup = None
@@ -2,7 +2,7 @@
 from __future__ import annotations
 
 from datetime import datetime
-from typing import Literal, Optional
+from typing import Dict, Literal, Optional
 
 from pydantic import BaseModel, ConfigDict, Field
 
@@ -23,18 +23,37 @@ class UpsertRequest(BaseModel):
     a_text: str = Field(min_length=1)
     source_url: Optional[str] = None
     ts: Optional[datetime] = None
+    # Slack team ID; with the channel, picks the shard (``SHARD_ROUTES``).
+    workspace: Optional[str] = None
+
+
+DedupAction = Literal["merged", "updated", "skipped"]
 
 
 class UpsertResponse(BaseModel):
     id: int
+    # Set when the row was folded into an existing near-duplicate ``id``.
+    action: Optional[DedupAction] = None
+    # Shard holding ``id`` when it is not the default one.
+    shard: Optional[str] = None
+
+
+class BatchUpsertResult(BaseModel):
+    line: int
+    id: Optional[int] = None
+    action: Optional[DedupAction] = None
+    error: Optional[str] = None
+    shard: Optional[str] = None
 
 
 class SearchRequest(BaseModel):
     model_config = ConfigDict(extra="forbid")
 
     channel: Optional[str] = None
+    workspace: Optional[str] = None
     query: str = Field(min_length=1)
     k: int = Field(default=5, ge=1, le=20)
+    include_archive: bool = False
 
 
 class Match(BaseModel):
@@ -44,6 +63,8 @@ class Match(BaseModel):
     a_text: str
     source_url: Optional[str] = None
     ts: Optional[datetime] = None
+    # Ids are unique per shard; set for matches from a shard other than the default.
+    shard: Optional[str] = None
 
 
 class SearchResponse(BaseModel):
@@ -53,6 +74,9 @@ class SearchResponse(BaseModel):
 class Reference(BaseModel):
     title: str = Field(min_length=1)
     url: str = Field(min_length=1)
+    # The memory the source came from; lets a click on its button count as a hit.
+    memory_id: Optional[int] = None
+    shard: Optional[str] = None
 
 
 class SlackReplyRequest(BaseModel):
@@ -64,8 +88,36 @@ class SlackReplyRequest(BaseModel):
     references: list[Reference] = Field(default_factory=list)
     mode: Literal["answer", "followup"]
     confidence: float = Field(ge=0.0, le=1.0)
+    # The memory the answer came from; Block Kit replies carry it on their feedback buttons.
+    memory_id: Optional[int] = None
+    shard: Optional[str] = None
 
 
 class SlackReplyResponse(BaseModel):
     ok: bool
     ts: str
+
+
+class SlackReplyQueuedResponse(BaseModel):
+    ok: bool
+    queued: bool = True
+    message_id: int
+
+
+class AnswerRequest(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    channel: str = Field(min_length=1)
+    thread_ts: str = Field(min_length=1)
+    query: str = Field(min_length=1)
+    k: int = Field(default=5, ge=1, le=20)
+    workspace: Optional[str] = None
+
+
+class AnswerResponse(BaseModel):
+    ok: bool
+    ts: str
+    mode: Literal["answer", "followup"]
+    confidence: float
+    match_id: Optional[int] = None
+    timings_ms: Dict[str, float]
@@ -0,0 +1,143 @@
+"""Micro-batching dispatcher that coalesces concurrent embedding requests."""
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from .embedding_cache import normalize_text
+from .metrics import LATENCY_BUCKETS_SECONDS, SIZE_BUCKETS, Histogram
+
+FetchOne = Callable[[str], Awaitable[List[float]]]
+FetchMany = Callable[[List[str]], Awaitable[List[List[float]]]]
+
+
+class EmbeddingDispatcher:
+    """Gather concurrent ``submit`` calls and send them as provider batches.
+
+    Identical in-flight texts share one future. When ``fetch_many`` is
+    ``None`` the provider only accepts single texts, so requests are sent
+    immediately (still deduplicated) instead of waiting for a window.
+    """
+
+    def __init__(
+        self,
+        *,
+        fetch_one: FetchOne,
+        fetch_many: Optional[FetchMany],
+        window_seconds: float,
+        max_batch_size: int,
+    ) -> None:
+        self._fetch_one = fetch_one
+        self._fetch_many = fetch_many
+        self.window_seconds = window_seconds
+        self.max_batch_size = max(1, max_batch_size)
+        self.batch_size_histogram = Histogram(SIZE_BUCKETS)
+        self.queue_wait_histogram = Histogram(LATENCY_BUCKETS_SECONDS)
+        self._inflight: Dict[str, asyncio.Future[List[float]]] = {}
+        self._pending: List[Tuple[str, str]] = []
+        self._waiters: Dict[str, List[float]] = {}
+        self._timer: Optional[asyncio.Handle] = None
+        self._tasks: set[asyncio.Task[None]] = set()
+
+    async def submit(self, text: str) -> List[float]:
+        key = normalize_text(text)
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            self._inflight[key] = future
+            self._waiters[key] = [time.perf_counter()]
+            self._pending.append((key, text))
+            self._schedule()
+        elif key in self._waiters:
+            self._waiters[key].append(time.perf_counter())
+        else:
+            # Joined a batch that is already on the wire; no queueing involved.
+            self.queue_wait_histogram.observe(0.0)
+        return list(await asyncio.shield(future))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "batch_size": self.batch_size_histogram.snapshot(),
+            "queue_wait_seconds": self.queue_wait_histogram.snapshot(),
+            "inflight": len(self._inflight),
+            "pending": len(self._pending),
+        }
+
+    def _schedule(self) -> None:
+        if self._fetch_many is None or len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            loop = asyncio.get_running_loop()
+            if self.window_seconds > 0:
+                self._timer = loop.call_later(self.window_seconds, self._flush)
+            else:
+                self._timer = loop.call_soon(self._flush)
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        while self._pending:
+            batch = self._pending[: self.max_batch_size]
+            del self._pending[: self.max_batch_size]
+            now = time.perf_counter()
+            for key, _ in batch:
+                for enqueued in self._waiters.pop(key, ()):
+                    self.queue_wait_histogram.observe(now - enqueued)
+            self.batch_size_histogram.observe(len(batch))
+            task = asyncio.get_running_loop().create_task(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: List[Tuple[str, str]]) -> None:
+        keys = [key for key, _ in batch]
+        texts = [text for _, text in batch]
+        try:
+            if self._fetch_many is not None and len(batch) > 1:
+                try:
+                    vectors = await self._fetch_many(texts)
+                except Exception as exc:
+                    for key in keys:
+                        self._resolve(key, exc=exc)
+                    return
+                for key, vector in zip(keys, vectors):
+                    self._resolve(key, vector=vector)
+                return
+
+            results = await asyncio.gather(*(self._fetch_one(text) for text in texts), return_exceptions=True)
+            for key, result in zip(keys, results):
+                if isinstance(result, BaseException):
+                    self._resolve(key, exc=result)
+                else:
+                    self._resolve(key, vector=result)
+        finally:
+            # Cancellation or a short provider response must not strand waiters.
+            for key in keys:
+                self._resolve(key, exc=RuntimeError("embedding batch did not return a vector"))
+
+    async def aclose(self) -> None:
+        """Cancel queued and running batches, failing every waiter."""
+
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        for key, _ in self._pending:
+            self._waiters.pop(key, None)
+            self._resolve(key, exc=RuntimeError("embedding dispatcher closed"))
+        self._pending.clear()
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _resolve(
+        self, key: str, *, vector: Optional[List[float]] = None, exc: Optional[BaseException] = None
+    ) -> None:
+        future = self._inflight.pop(key, None)
+        if future is None or future.done():
+            return
+        if exc is not None:
+            future.set_exception(exc)
+        else:
+            future.set_result(vector or [])
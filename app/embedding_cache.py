@@ -0,0 +1,184 @@
+"""Content-addressed cache for embedding vectors."""
+from __future__ import annotations
+
+from array import array
+import asyncio
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+import hashlib
+import threading
+import time
+import unicodedata
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    import sqlite3
+
+
+def normalize_text(text: str) -> str:
+    """Normalize text so trivially different inputs share a cache entry."""
+
+    return " ".join(unicodedata.normalize("NFKC", text).split())
+
+
+def make_cache_key(text: str, *, dim: int, provider: str) -> str:
+    """Hash the normalized text together with the provider identity."""
+
+    digest = hashlib.sha256()
+    digest.update(provider.encode("utf-8"))
+    digest.update(b"\x00")
+    digest.update(str(dim).encode("ascii"))
+    digest.update(b"\x00")
+    digest.update(normalize_text(text).encode("utf-8"))
+    return digest.hexdigest()
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    disk_hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    expirations: int = 0
+
+    def as_dict(self) -> Dict[str, int]:
+        return asdict(self)
+
+
+class EmbeddingCache:
+    """Two-tier cache: an in-process LRU backed by an optional SQLite file.
+
+    The memory tier is bounded by ``max_entries`` and ``ttl_seconds`` and is
+    only touched from the event loop. When a ``path`` is given, vectors are
+    also persisted as packed float32 blobs so a restarted process starts warm.
+    Disk reads run in a worker thread and disk writes are buffered and
+    committed in batches by a write-behind task, so SQLite never blocks the
+    event loop.
+    """
+
+    def __init__(self, *, max_entries: int, ttl_seconds: float, path: Optional[str] = None) -> None:
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.stats = CacheStats()
+        self._entries: "OrderedDict[str, Tuple[float, Tuple[float, ...]]]" = OrderedDict()
+        self._db_lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._pending_writes: Dict[str, Tuple[float, bytes]] = {}
+        self._writer: Optional[asyncio.Task[None]] = None
+        if path:
+            import sqlite3  # only needed with a configured file
+
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            # Reads go through a shared mapping, so workers on one host share hot pages.
+            self._db.execute("PRAGMA mmap_size=268435456")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, created REAL NOT NULL, vector BLOB NOT NULL)"
+            )
+            self._db.commit()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 or self._db is not None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _expired(self, created: float, now: float) -> bool:
+        return self.ttl_seconds > 0 and now - created > self.ttl_seconds
+
+    async def get(self, key: str) -> Optional[List[float]]:
+        """Return a cached vector or ``None`` on a miss."""
+
+        now = time.time()
+        entry = self._entries.get(key)
+        if entry is not None:
+            created, vector = entry
+            if not self._expired(created, now):
+                self._entries.move_to_end(key)
+                self.stats.hits += 1
+                return list(vector)
+            del self._entries[key]
+            self.stats.expirations += 1
+
+        if self._db is not None:
+            pending = self._pending_writes.get(key)
+            row = pending if pending is not None else await asyncio.to_thread(self._disk_get, key)
+            if row is not None:
+                created, blob = row
+                if self._expired(created, now):
+                    self.stats.expirations += 1
+                else:
+                    packed = array("f")
+                    packed.frombytes(blob)
+                    vector = tuple(packed)
+                    # Keep the original timestamp so a disk hit does not extend its TTL.
+                    self._remember(key, vector, created)
+                    self.stats.disk_hits += 1
+                    return list(vector)
+
+        self.stats.misses += 1
+        return None
+
+    def put(self, key: str, vector: List[float]) -> None:
+        """Store a vector in memory and queue it for the disk tier."""
+
+        now = time.time()
+        self._remember(key, tuple(vector), now)
+        if self._db is not None:
+            self._pending_writes[key] = (now, array("f", vector).tobytes())
+            if self._writer is None or self._writer.done():
+                self._writer = asyncio.get_running_loop().create_task(self._write_behind())
+
+    def _remember(self, key: str, vector: Tuple[float, ...], created: float) -> None:
+        if self.max_entries <= 0:
+            return
+        self._entries[key] = (created, vector)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats.evictions += 1
+
+    async def _write_behind(self) -> None:
+        # Writes that arrive while a batch is committing are picked up by the next pass.
+        while self._pending_writes:
+            batch, self._pending_writes = self._pending_writes, {}
+            await asyncio.to_thread(self._disk_put_many, batch)
+
+    def _disk_get(self, key: str) -> Optional[Tuple[float, bytes]]:
+        with self._db_lock:
+            if self._db is None:
+                return None
+            row = self._db.execute("SELECT created, vector FROM embeddings WHERE key = ?", (key,)).fetchone()
+            if row is not None and self._expired(row[0], time.time()):
+                self._db.execute("DELETE FROM embeddings WHERE key = ?", (key,))
+                self._db.commit()
+            return row
+
+    def _disk_put_many(self, batch: Dict[str, Tuple[float, bytes]]) -> None:
+        with self._db_lock:
+            if self._db is None:
+                return
+            self._db.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, created, vector) VALUES (?, ?, ?)",
+                [(key, created, blob) for key, (created, blob) in batch.items()],
+            )
+            self._db.commit()
+
+    def clear(self) -> None:
+        """Drop the memory tier; persisted vectors are left untouched."""
+
+        self._entries.clear()
+
+    async def close(self) -> None:
+        """Flush buffered disk writes and close the SQLite connection."""
+
+        if self._writer is not None:
+            await self._writer
+            self._writer = None
+        if self._pending_writes:
+            await self._write_behind()
+        with self._db_lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
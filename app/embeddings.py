@@ -1,33 +1,26 @@
 """Utility for fetching embeddings from the configured provider."""
 from __future__ import annotations
 
-from typing import List
+import asyncio
+from typing import Any, List, Optional
 
 import httpx
 
+from . import fastjson
 from .config import settings
-from .deps import get_http_client
+from .deps import get_embedding_cache, get_http_client
+from .embedding_batcher import EmbeddingDispatcher
+from .embedding_cache import make_cache_key
+from .tracing import set_span_attribute, traced
+
+_dispatcher: Optional[EmbeddingDispatcher] = None
 
 
 class EmbeddingError(RuntimeError):
     """Raised when the embedding provider response is invalid."""
 
 
-async def embed(text: str, *, client: httpx.AsyncClient | None = None) -> List[float]:
-    """Generate an embedding for the provided text."""
-
-    if not text:
-        raise EmbeddingError("text must be non-empty")
-
-    http_client = client or get_http_client()
-    response = await http_client.post(
-        str(settings.embedding_api_url),
-        json={"text": text},
-        headers={"Authorization": f"Bearer {settings.embedding_api_key}"},
-    )
-    response.raise_for_status()
-    payload = response.json()
-    embedding = payload.get("embedding")
+def _validate_vector(embedding: Any) -> List[float]:
     if not isinstance(embedding, list):
         raise EmbeddingError("embedding payload missing or invalid")
     if len(embedding) != settings.embedding_dim:
@@ -35,7 +28,90 @@ async def embed(text: str, *, client: httpx.AsyncClient | None = None) -> List[f
             f"embedding dimension mismatch (expected {settings.embedding_dim}, got {len(embedding)})"
         )
     try:
-        vector = [float(value) for value in embedding]
+        return [float(value) for value in embedding]
     except (TypeError, ValueError) as exc:
         raise EmbeddingError("embedding values must be numeric") from exc
+
+
+async def _request_embedding(text: str, client: httpx.AsyncClient | None = None) -> List[float]:
+    http_client = client or get_http_client("embedding")
+    response = await http_client.post(
+        str(settings.embedding_api_url),
+        json={"text": text},
+        headers={"Authorization": f"Bearer {settings.embedding_api_key}"},
+    )
+    response.raise_for_status()
+    payload = fastjson.loads(response.content)
+    return _validate_vector(payload.get("embedding"))
+
+
+async def _request_embeddings(texts: List[str]) -> List[List[float]]:
+    """Send one batched provider call: ``{"texts": [...]}`` -> ``{"embeddings": [[...], ...]}``."""
+
+    response = await get_http_client("embedding").post(
+        str(settings.embedding_api_url),
+        json={"texts": texts},
+        headers={"Authorization": f"Bearer {settings.embedding_api_key}"},
+    )
+    response.raise_for_status()
+    payload = fastjson.loads(response.content)
+    embeddings = payload.get("embeddings")
+    if not isinstance(embeddings, list) or len(embeddings) != len(texts):
+        raise EmbeddingError("batch embedding payload missing or invalid")
+    return [_validate_vector(embedding) for embedding in embeddings]
+
+
+def get_embedding_dispatcher() -> EmbeddingDispatcher:
+    """Return the shared dispatcher that coalesces concurrent embed calls."""
+
+    global _dispatcher
+    if _dispatcher is None:
+        _dispatcher = EmbeddingDispatcher(
+            fetch_one=_request_embedding,
+            fetch_many=_request_embeddings if settings.embedding_api_batch else None,
+            window_seconds=settings.embedding_batch_window_ms / 1000.0,
+            max_batch_size=settings.embedding_batch_max_size,
+        )
+    return _dispatcher
+
+
+async def shutdown_embedding_dispatcher() -> None:
+    """Close the dispatcher so the next event loop starts with a fresh one."""
+
+    global _dispatcher
+    if _dispatcher is not None:
+        await _dispatcher.aclose()
+        _dispatcher = None
+
+
+@traced("embed")
+async def embed(text: str, *, client: httpx.AsyncClient | None = None) -> List[float]:
+    """Generate an embedding for the provided text."""
+
+    if not text:
+        raise EmbeddingError("text must be non-empty")
+
+    cache = get_embedding_cache()
+    cache_key = None
+    if cache.enabled:
+        cache_key = make_cache_key(
+            text, dim=settings.embedding_dim, provider=str(settings.embedding_api_url)
+        )
+        cached = await cache.get(cache_key)
+        set_span_attribute("embedding.cache_hit", cached is not None)
+        if cached is not None:
+            return cached
+
+    if client is not None:
+        vector = await _request_embedding(text, client)
+    else:
+        vector = await get_embedding_dispatcher().submit(text)
+    if cache_key is not None:
+        cache.put(cache_key, vector)
     return vector
+
+
+async def embed_many(texts: List[str]) -> List[List[float]]:
+    """Embed several texts concurrently so the dispatcher can batch them."""
+
+    return list(await asyncio.gather(*(embed(text) for text in texts)))
@@ -0,0 +1,43 @@
+"""JSON on the hot paths: ``orjson`` when it is installed, the standard library otherwise."""
+from __future__ import annotations
+
+from datetime import datetime
+import json
+from typing import Any
+
+from starlette.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is in requirements.txt
+    orjson = None  # type: ignore[assignment]
+
+
+def loads(data: bytes | str) -> Any:
+    """Parse a response body without the detour through ``str`` that ``httpx.Response.json`` takes."""
+
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _default(value: Any) -> str:
+    if isinstance(value, datetime):
+        text = value.isoformat()
+        return text[:-6] + "Z" if text.endswith("+00:00") else text
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def dumps(value: Any) -> bytes:
+    """Compact UTF-8 JSON; UTC datetimes end in ``Z`` like pydantic renders them."""
+
+    if orjson is not None:
+        return orjson.dumps(value, option=orjson.OPT_UTC_Z)
+    return json.dumps(value, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """``JSONResponse`` for content that is already plain, correctly typed data."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,138 @@
+"""Request and outbound-call instrumentation feeding ``app.metrics.REGISTRY``."""
+from __future__ import annotations
+
+import time
+from typing import Optional
+from urllib.parse import urlsplit
+
+import httpx
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .config import settings
+from .metrics import (
+    CIRCUIT_BREAKER_STATE,
+    DEPENDENCY_CONCURRENCY_LIMIT,
+    ERRORS,
+    HTTP_POOL_CONNECTIONS,
+    HTTP_REQUEST_SECONDS,
+    HTTP_REQUESTS_IN_FLIGHT,
+    OUTBOUND_IN_FLIGHT,
+    OUTBOUND_REQUEST_SECONDS,
+)
+from .tracing import SPAN_KIND_CLIENT, start_span
+
+_EMBEDDING_HOST = urlsplit(str(settings.embedding_api_url)).netloc
+_SUPABASE_HOST = urlsplit(str(settings.supabase_url)).netloc
+_SLACK_HOST = urlsplit(settings.slack_api_url).netloc
+
+
+def classify_dependency(request: httpx.Request) -> str:
+    """Name the dependency an outbound request belongs to."""
+
+    host = request.url.netloc.decode("ascii")
+    if host == _EMBEDDING_HOST:
+        return "embedding"
+    # Shards may be other Supabase projects; the PostgREST path gives them away.
+    if host == _SUPABASE_HOST or request.url.path.startswith("/rest/v1/"):
+        if request.url.path.startswith("/rest/v1/rpc/"):
+            return "postgrest_rpc"
+        return "supabase_insert" if request.method == "POST" else "supabase_read"
+    if host == _SLACK_HOST:
+        return "slack"
+    return "other"
+
+
+class InstrumentedTransport(httpx.AsyncBaseTransport):
+    """Times each outbound call until response headers arrive, per dependency."""
+
+    def __init__(self, inner: httpx.AsyncHTTPTransport) -> None:
+        self.inner = inner
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        dependency = classify_dependency(request)
+        OUTBOUND_IN_FLIGHT.inc(dependency)
+        started = time.perf_counter()
+        with start_span(f"HTTP {request.method} {dependency}", kind=SPAN_KIND_CLIENT, child_only=True) as span:
+            if span is not None:
+                request.headers["traceparent"] = span.traceparent
+            try:
+                response = await self.inner.handle_async_request(request)
+            except Exception as exc:
+                ERRORS.inc(dependency, type(exc).__name__)
+                OUTBOUND_REQUEST_SECONDS.observe(dependency, "error", value=time.perf_counter() - started)
+                raise
+            finally:
+                OUTBOUND_IN_FLIGHT.dec(dependency)
+            if span is not None:
+                span.set_attribute("http.status_code", response.status_code)
+        if response.status_code >= 400:
+            ERRORS.inc(dependency, f"http_{response.status_code}")
+        OUTBOUND_REQUEST_SECONDS.observe(dependency, str(response.status_code), value=time.perf_counter() - started)
+        return response
+
+    async def aclose(self) -> None:
+        await self.inner.aclose()
+
+    def pool_connections(self) -> tuple[int, int]:
+        """Return ``(active, idle)`` connection counts of the underlying pool."""
+
+        pool = getattr(self.inner, "_pool", None)
+        connections = list(getattr(pool, "connections", []))
+        idle = sum(1 for connection in connections if connection.is_idle())
+        return len(connections) - idle, idle
+
+
+def record_pool_usage(
+    destination: str, transport: Optional[InstrumentedTransport], max_connections: Optional[int]
+) -> None:
+    active, idle = transport.pool_connections() if transport is not None else (0, 0)
+    HTTP_POOL_CONNECTIONS.set(destination, "active", value=active)
+    HTTP_POOL_CONNECTIONS.set(destination, "idle", value=idle)
+    if max_connections is not None:
+        HTTP_POOL_CONNECTIONS.set(destination, "max", value=max_connections)
+
+
+_BREAKER_STATES = {"closed": 0, "half_open": 1, "open": 2}
+
+
+def record_dependency_guard(dependency: str, limit: Optional[float], breaker_state: Optional[str]) -> None:
+    if limit is not None:
+        DEPENDENCY_CONCURRENCY_LIMIT.set(dependency, value=limit)
+    if breaker_state is not None:
+        CIRCUIT_BREAKER_STATE.set(dependency, value=_BREAKER_STATES[breaker_state])
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware recording latency per route template and unhandled errors."""
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        HTTP_REQUESTS_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception as exc:
+            ERRORS.inc("request", type(exc).__name__)
+            raise
+        finally:
+            HTTP_REQUESTS_IN_FLIGHT.dec()
+            route = scope.get("route")
+            # Route templates keep label cardinality bounded; unmatched paths share one series.
+            path = getattr(route, "path", "unmatched")
+            HTTP_REQUEST_SECONDS.observe(
+                scope["method"], path, str(status_code), value=time.perf_counter() - started
+            )
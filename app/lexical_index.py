@@ -0,0 +1,217 @@
+"""In-process BM25 inverted index over ``q_text``/``a_text`` and rank fusion."""
+from __future__ import annotations
+
+from array import array
+import math
+import re
+import time
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+_TOKEN = re.compile(r"[0-9a-z]+(?:[._:/#-][0-9a-z]+)*")
+_SEPARATORS = re.compile(r"[._:/#-]")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase terms; compound tokens such as ``db-01.prod`` also yield their parts."""
+
+    terms: List[str] = []
+    for token in _TOKEN.findall(text.lower()):
+        terms.append(token)
+        if _SEPARATORS.search(token):
+            terms.extend(part for part in _SEPARATORS.split(token) if part)
+    return terms
+
+
+def identifier_terms(query: str) -> List[str]:
+    """Terms that look like codes, ticket ids or hostnames rather than words."""
+
+    return [
+        token
+        for token in _TOKEN.findall(query.lower())
+        if any(ch.isdigit() for ch in token) or _SEPARATORS.search(token)
+    ]
+
+
+def lexical_identifiers(query: str, *, max_terms: int = 4) -> List[str]:
+    """Identifier terms of a short query; empty when the query reads as prose.
+
+    ``ORA-00942``, ``INC0012345 status`` or ``db-01.prod down`` qualify;
+    ``how do I reset the db-01 password`` does not.
+    """
+
+    if len(_TOKEN.findall(query.lower())) > max_terms:
+        return []
+    return identifier_terms(query)
+
+
+class _Postings:
+    """Append-only postings for one term: document ordinals and term frequencies."""
+
+    __slots__ = ("docs", "tfs")
+
+    def __init__(self) -> None:
+        self.docs = array("I")
+        self.tfs = array("H")
+
+
+class _Partition:
+    def __init__(self) -> None:
+        self.terms: Dict[str, _Postings] = {}
+        self.doc_ids = array("q")
+        self.doc_lens = array("I")
+        self.total_len = 0
+        self.retired: set[int] = set()
+
+    def add(self, memory_id: int, terms: Sequence[str]) -> int:
+        ordinal = len(self.doc_ids)
+        self.doc_ids.append(memory_id)
+        self.doc_lens.append(len(terms))
+        self.total_len += len(terms)
+        counts: Dict[str, int] = {}
+        for term in terms:
+            counts[term] = counts.get(term, 0) + 1
+        for term, count in counts.items():
+            postings = self.terms.get(term)
+            if postings is None:
+                postings = self.terms[term] = _Postings()
+            postings.docs.append(ordinal)
+            postings.tfs.append(min(count, 65535))
+        return ordinal
+
+    def retire(self, ordinal: int) -> None:
+        self.retired.add(ordinal)
+
+    def search(self, terms: Sequence[str], k: int, k1: float, b: float) -> List[Tuple[int, float]]:
+        n_docs = len(self.doc_ids)
+        if not n_docs:
+            return []
+        # Imported here so the query helpers the routers use do not pull numpy in at startup.
+        import numpy as np
+
+        doc_lens = np.frombuffer(self.doc_lens, dtype=np.uint32).astype(np.float32)
+        norm = k1 * (1 - b + b * doc_lens / (self.total_len / n_docs))
+        scores = np.zeros(n_docs, dtype=np.float32)
+        for term in set(terms):
+            postings = self.terms.get(term)
+            if postings is None:
+                continue
+            docs = np.frombuffer(postings.docs, dtype=np.uint32)
+            tfs = np.frombuffer(postings.tfs, dtype=np.uint16).astype(np.float32)
+            idf = math.log(1 + (n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+            scores[docs] += idf * tfs * (k1 + 1) / (tfs + norm[docs])
+        if self.retired:
+            scores[list(self.retired)] = 0.0
+        hits = np.flatnonzero(scores)
+        if len(hits) > k:
+            hits = hits[np.argpartition(-scores[hits], k - 1)[:k]]
+        hits = hits[np.argsort(-scores[hits], kind="stable")]
+        return [(int(self.doc_ids[i]), float(scores[i])) for i in hits]
+
+
+class LexicalIndex:
+    """BM25 over each channel's memories, kept in step with ``kb`` like the vector replica.
+
+    Postings are compact ``array`` buffers scored with NumPy without copying.
+    Rows carry the same fields as ``search_memory`` results so keyword-only
+    queries can be answered without an embedding or an RPC.
+    """
+
+    def __init__(self, *, max_staleness_seconds: float, k1: float = 1.2, b: float = 0.75) -> None:
+        self.max_staleness_seconds = max_staleness_seconds
+        self.k1 = k1
+        self.b = b
+        self.sync_cursor = 0
+        self.last_synced: Optional[float] = None
+        self._partitions: Dict[Optional[str], _Partition] = {}
+        self._rows: Dict[int, Dict[str, Any]] = {}
+        self._ordinals: Dict[int, Tuple[Optional[str], int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    @property
+    def is_fresh(self) -> bool:
+        if self.last_synced is None:
+            return False
+        return time.monotonic() - self.last_synced <= self.max_staleness_seconds
+
+    def mark_synced(self, cursor: int) -> None:
+        self.sync_cursor = max(self.sync_cursor, cursor)
+        self.last_synced = time.monotonic()
+
+    def add(self, rows: Iterable[Dict[str, Any]]) -> int:
+        """Index rows carrying ``id``, ``channel``, ``q_text`` and ``a_text``; returns how many were new."""
+
+        added = 0
+        for row in rows:
+            memory_id = int(row["id"])
+            if memory_id in self._rows:
+                continue
+            self._rows[memory_id] = {
+                "id": memory_id,
+                "q_text": row["q_text"],
+                "a_text": row["a_text"],
+                "source_url": row.get("source_url"),
+                "ts": row.get("ts"),
+            }
+            channel = row.get("channel")
+            partition = self._partitions.get(channel)
+            if partition is None:
+                partition = self._partitions[channel] = _Partition()
+            ordinal = partition.add(memory_id, tokenize(f"{row['q_text']} {row['a_text']}"))
+            self._ordinals[memory_id] = (channel, ordinal)
+            added += 1
+        return added
+
+    def update(self, memory_id: int, changes: Dict[str, Any]) -> None:
+        """Re-index a row with column changes applied (postings are append-only)."""
+
+        row = self._rows.get(memory_id)
+        if row is None:
+            return
+        channel = self._ordinals[memory_id][0]
+        self.remove([memory_id])
+        self.add([{**row, **changes, "channel": channel}])
+
+    def remove(self, ids: Iterable[int]) -> int:
+        removed = 0
+        for memory_id in ids:
+            if self._rows.pop(int(memory_id), None) is None:
+                continue
+            channel, ordinal = self._ordinals.pop(int(memory_id))
+            self._partitions[channel].retire(ordinal)
+            removed += 1
+        return removed
+
+    def contains_all(self, channel: Optional[str], terms: Sequence[str]) -> bool:
+        """Whether every term occurs in the channel (any channel when ``None``)."""
+
+        partitions = self._channel_partitions(channel)
+        return bool(terms) and all(any(term in p.terms for p in partitions) for term in terms)
+
+    def _channel_partitions(self, channel: Optional[str]) -> List[_Partition]:
+        if channel:
+            return [self._partitions[channel]] if channel in self._partitions else []
+        return list(self._partitions.values())
+
+    def search(self, *, channel: Optional[str], query: str, k: int) -> List[Dict[str, Any]]:
+        """Return up to ``k`` rows by descending BM25 score (as ``bm25``)."""
+
+        terms = tokenize(query)
+        if k <= 0 or not terms:
+            return []
+        hits: List[Tuple[int, float]] = []
+        for partition in self._channel_partitions(channel):
+            hits.extend(partition.search(terms, k, self.k1, self.b))
+        hits.sort(key=lambda hit: -hit[1])
+        return [{**self._rows[memory_id], "bm25": score} for memory_id, score in hits[:k]]
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[int]], *, k: int = 60) -> List[Tuple[int, float]]:
+    """Fuse ranked id lists: each id scores ``sum(1 / (k + rank))`` over the lists it appears in."""
+
+    scores: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, memory_id in enumerate(ranking, start=1):
+            scores[memory_id] = scores.get(memory_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: -item[1])
@@ -1,24 +1,333 @@
-"""Logging helpers using loguru."""
+"""Logging setup: structured JSON lines written in batches, with repeated errors sampled.
+
+With ``LOG_FORMAT=json`` (the default) a log call only checks the sampler
+and appends the record to a bounded queue; a writer thread renders the
+queue to JSON lines and writes them in batches every
+``LOG_FLUSH_INTERVAL_MS`` (sooner once ``LOG_BATCH_SIZE`` records wait).
+A full queue drops new records and counts them rather than blocking the
+caller. Warnings and errors are sampled per call site (or per bound
+``log_key``): ``LOG_SAMPLE_BURST`` records per ``LOG_SAMPLE_WINDOW_SECONDS``
+get through, only the first of them with its traceback, and the rest are
+reported as one "suppressed" line when the window ends. Every record
+carries the request's correlation ID and trace ID when there is one.
+``LOG_FORMAT=text`` keeps loguru's plain, enqueued stdout output.
+"""
 from __future__ import annotations
 
+import atexit
+from collections import deque
+from contextvars import ContextVar
+from datetime import datetime, timezone
+import os
+import re
 import sys
+import threading
+import time
+import traceback
+from typing import Any, Callable, Deque, Dict, List, Optional, TextIO, Tuple
+import uuid
+
 from loguru import logger
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
+from . import fastjson
 from .config import settings
+from .tracing import current_span
+
+_WARNING_NO = 30
+_CORRELATION_KEYS = ("request_id", "trace_id")
+_REQUEST_ID_HEADER = b"x-request-id"
+_VALID_REQUEST_ID = re.compile(r"[0-9A-Za-z._:-]{1,128}")
+
+_request_id: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+
+def current_request_id() -> Optional[str]:
+    return _request_id.get()
+
+
+class ErrorSampler:
+    """Lets ``burst`` records per key through each window and counts the rest."""
+
+    def __init__(self, burst: int, window_seconds: float, clock: Callable[[], float] = time.monotonic) -> None:
+        self.burst = burst
+        self.window_seconds = window_seconds
+        self._clock = clock
+        self._lock = threading.Lock()
+        # key -> [window start, records seen, records suppressed]
+        self._windows: Dict[str, List[float]] = {}
+        self._finished: List[Tuple[str, int]] = []
+        self.suppressed = 0
+
+    def admit(self, key: str) -> Tuple[bool, bool]:
+        """``(emit, with_traceback)``: only the first record of a window keeps its traceback."""
+
+        now = self._clock()
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None or now - window[0] >= self.window_seconds:
+                if window is not None and window[2]:
+                    self._finished.append((key, int(window[2])))
+                window = self._windows[key] = [now, 0, 0]
+            window[1] += 1
+            if window[1] <= self.burst:
+                return True, window[1] == 1
+            window[2] += 1
+            self.suppressed += 1
+            return False, False
+
+    def expired(self) -> List[Tuple[str, int]]:
+        """``(key, suppressed)`` for every window that ended with records suppressed."""
+
+        now = self._clock()
+        with self._lock:
+            finished, self._finished = self._finished, []
+            for key, window in list(self._windows.items()):
+                if now - window[0] >= self.window_seconds:
+                    del self._windows[key]
+                    if window[2]:
+                        finished.append((key, int(window[2])))
+        return finished
+
+
+def _plain(value: Any) -> Any:
+    return value if isinstance(value, (str, int, float, bool, type(None))) else repr(value)
+
+
+def render_record(record: Dict[str, Any], with_traceback: bool = True) -> bytes:
+    """One JSON line for a loguru record."""
+
+    extra = record["extra"]
+    entry: Dict[str, Any] = {
+        "ts": record["time"].isoformat(),
+        "level": record["level"].name,
+        "logger": record["name"],
+        "function": record["function"],
+        "line": record["line"],
+        "message": record["message"],
+    }
+    for key in _CORRELATION_KEYS:
+        if extra.get(key):
+            entry[key] = extra[key]
+    fields = {key: _plain(value) for key, value in extra.items() if key not in _CORRELATION_KEYS}
+    if fields:
+        entry["extra"] = fields
+    exception = record["exception"]
+    if exception is not None and exception.type is not None:
+        entry["exception"] = {"type": exception.type.__name__, "message": str(exception.value)}
+        if with_traceback:
+            entry["exception"]["traceback"] = "".join(
+                traceback.format_exception(exception.type, exception.value, exception.traceback)
+            )
+    return fastjson.dumps(entry) + b"\n"
+
+
+def _summary_line(key: str, suppressed: int, window_seconds: float) -> bytes:
+    entry = {
+        "ts": datetime.now(timezone.utc).isoformat(),
+        "level": "WARNING",
+        "logger": __name__,
+        "message": f"suppressed {suppressed} similar records in the last {window_seconds:g}s",
+        "log_key": key,
+        "suppressed": suppressed,
+    }
+    return fastjson.dumps(entry) + b"\n"
+
+
+class BatchingJsonSink:
+    """loguru sink: callers enqueue records, a writer thread renders and writes them in batches."""
+
+    def __init__(
+        self,
+        stream: TextIO,
+        *,
+        max_queue: int,
+        batch_size: int,
+        flush_interval_seconds: float,
+        sampler: Optional[ErrorSampler] = None,
+    ) -> None:
+        self.stream = stream
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval_seconds = flush_interval_seconds
+        self.sampler = sampler
+        self.written = 0
+        self.dropped = 0
+        self.batches = 0
+        self._start()
+
+    def _start(self) -> None:
+        self._cond = threading.Condition()
+        self._queue: Deque[Tuple[Dict[str, Any], bool]] = deque()
+        self._in_flight = 0
+        self._closing = False
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self._thread.start()
+
+    def write(self, message: Any) -> None:
+        record = message.record
+        with_traceback = True
+        if self.sampler is not None and record["level"].no >= _WARNING_NO:
+            key = record["extra"].get("log_key") or f"{record['name']}:{record['function']}:{record['line']}"
+            emit, with_traceback = self.sampler.admit(key)
+            if not emit:
+                return
+        with self._cond:
+            if len(self._queue) >= self.max_queue:
+                self.dropped += 1
+                return
+            self._queue.append((record, with_traceback))
+            if len(self._queue) >= self.batch_size:
+                self._cond.notify_all()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                if len(self._queue) < self.batch_size and not self._closing:
+                    self._cond.wait(self.flush_interval_seconds)
+                batch = list(self._queue)
+                self._queue.clear()
+                self._in_flight = len(batch)
+                closing = self._closing
+            lines = [render_record(record, with_traceback) for record, with_traceback in batch]
+            if self.sampler is not None:
+                window = self.sampler.window_seconds
+                lines.extend(_summary_line(key, count, window) for key, count in self.sampler.expired())
+            if lines:
+                try:
+                    self.stream.write(b"".join(lines).decode("utf-8"))
+                    self.stream.flush()
+                except (OSError, ValueError):  # closed stream at interpreter exit
+                    pass
+            with self._cond:
+                self.written += len(lines)
+                self.batches += bool(lines)
+                self._in_flight = 0
+                self._cond.notify_all()
+            if closing and not self._queue:
+                return
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Wait until every queued record has been written; ``False`` on timeout."""
+
+        with self._cond:
+            self._cond.notify_all()
+            return self._cond.wait_for(lambda: not self._queue and not self._in_flight, timeout)
+
+    def close(self, timeout: float = 5.0) -> None:
+        with self._cond:
+            self._closing = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "format": "json",
+            "queued": len(self._queue),
+            "written": self.written,
+            "batches": self.batches,
+            "dropped": self.dropped,
+            "suppressed": self.sampler.suppressed if self.sampler is not None else 0,
+        }
+
+
+def _add_correlation(record: Dict[str, Any]) -> None:
+    extra = record["extra"]
+    request_id = _request_id.get()
+    if request_id is not None:
+        extra.setdefault("request_id", request_id)
+    span = current_span()
+    if span is not None:
+        extra.setdefault("trace_id", span.trace_id)
+
+
+_sink: Optional[BatchingJsonSink] = None
+
+
+def _restart_writer() -> None:
+    if _sink is not None:
+        _sink._start()
+
+
+# serve.py forks workers after importing the app, and threads do not survive a fork.
+os.register_at_fork(after_in_child=_restart_writer)
 
 
 def configure_logging() -> None:
     """Configure loguru once for the entire app."""
 
+    global _sink
     logger.remove()
-    logger.add(
+    if _sink is not None:
+        _sink.close()
+        _sink = None
+    logger.configure(patcher=_add_correlation)
+    if settings.log_format == "text":
+        logger.add(
+            sys.stdout,
+            level=settings.log_level,
+            enqueue=True,
+            colorize=False,
+            backtrace=False,
+            diagnose=False,
+        )
+        return
+    sampler = (
+        ErrorSampler(settings.log_sample_burst, settings.log_sample_window_seconds)
+        if settings.log_sample_burst
+        else None
+    )
+    _sink = BatchingJsonSink(
         sys.stdout,
-        level=settings.log_level,
-        enqueue=True,
-        colorize=False,
-        backtrace=False,
-        diagnose=False,
+        max_queue=settings.log_queue_size,
+        batch_size=settings.log_batch_size,
+        flush_interval_seconds=settings.log_flush_interval_ms / 1000,
+        sampler=sampler,
     )
+    # A format function keeps loguru from formatting tracebacks in the caller;
+    # the writer thread renders them, and only for records that keep one.
+    logger.add(_sink.write, level=settings.log_level, format=lambda _: "", backtrace=False, diagnose=False)
+    atexit.register(_sink.close)
+
+
+def flush_logging(timeout: float = 5.0) -> None:
+    if _sink is not None:
+        _sink.flush(timeout)
+
+
+def logging_stats() -> Dict[str, Any]:
+    if _sink is None:
+        return {"format": settings.log_format}
+    return _sink.stats()
+
+
+class RequestIdMiddleware:
+    """Pure ASGI middleware giving each request a correlation ID.
+
+    A well-formed incoming ``X-Request-ID`` is kept, otherwise one is
+    generated; it is echoed on the response and attached to every log record
+    written while the request (or a task it spawned) runs.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        incoming = dict(scope.get("headers") or []).get(_REQUEST_ID_HEADER, b"").decode("latin-1")
+        request_id = incoming if _VALID_REQUEST_ID.fullmatch(incoming) else uuid.uuid4().hex
+        header = (_REQUEST_ID_HEADER, request_id.encode("latin-1"))
 
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                message = {**message, "headers": [*message.get("headers", []), header]}
+            await send(message)
 
-configure_logging()
+        token = _request_id.set(request_id)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _request_id.reset(token)
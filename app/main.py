@@ -1,7 +1,9 @@
 """FastAPI application bootstrap."""
 from __future__ import annotations
 
+import asyncio
 from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING, List, Union
 
 from fastapi import FastAPI, Request, status
 from fastapi.exceptions import RequestValidationError
@@ -9,18 +11,112 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from loguru import logger
 
-from .config import settings
-from .deps import shutdown_dependencies
+from .config import settings, worker_index
+from .deps import (
+    get_lexical_index,
+    get_load_shedder,
+    get_local_index,
+    get_startup_progress,
+    initialize_dependencies,
+    shutdown_dependencies,
+    usage_trackers,
+)
 from .domain.schemas import ProblemDetails
-from .routers import health, memory, slack
+from .instrumentation import MetricsMiddleware
+from .logging import RequestIdMiddleware, configure_logging, flush_logging
+from .resilience import DependencyUnavailable, LoadSheddingMiddleware, retry_after_header
+from .routers import debug, health, memory, slack, slack_events
+from .sharding import all_shards, get_shard, using_shard
+from .slack_outbox import get_slack_outbox
+from .supa import record_memory_hits, sync_local_index
+from .tracing import TracingMiddleware, get_tracer
+
+if TYPE_CHECKING:
+    from .lexical_index import LexicalIndex
+    from .vector_index import LocalVectorIndex
+
+# Before anything else logs; cheap, it only starts the writer thread.
+configure_logging()
+
+
+async def _keep_local_index_synced(index: Union[LocalVectorIndex, LexicalIndex], name: str) -> None:
+    while True:
+        try:
+            added = await sync_local_index(index)
+            if added:
+                logger.info("{} synced {} rows ({} total)", name, added, len(index))
+        except Exception as exc:
+            logger.warning("{} sync failed: {}", name, exc)
+        await asyncio.sleep(settings.local_index_sync_interval_seconds)
+
+
+async def _flush_usage() -> None:
+    for shard, tracker in usage_trackers().items():
+        counts = tracker.drain()
+        try:
+            with using_shard(get_shard(shard)):
+                await record_memory_hits(counts)
+        except Exception as exc:
+            tracker.restore(counts)
+            logger.warning("usage flush of {} rows on shard {} failed: {}", len(counts), shard or "default", exc)
+        else:
+            tracker.mark_flushed(counts)
+
+
+async def _keep_usage_flushed() -> None:
+    while True:
+        await asyncio.sleep(settings.usage_flush_interval_seconds)
+        await _flush_usage()
+
+
+_WARMUP_TIMEOUT_SECONDS = 10.0
+
+
+async def _initialize(background_tasks: List[asyncio.Task]) -> None:
+    """Warm connections and build indexes and caches concurrently, then start the sync loops."""
+
+    extra = []
+    if settings.slack_outbox_path:
+        # Resume delivery of replies journaled before the last shutdown.
+        extra.append(("slack_outbox", lambda: get_slack_outbox().start()))
+    await initialize_dependencies(_WARMUP_TIMEOUT_SECONDS, *extra)
+    background_tasks.extend(
+        asyncio.create_task(_keep_local_index_synced(replica, name))
+        for replica, name in ((get_local_index(), "local index"), (get_lexical_index(), "lexical index"))
+        if replica is not None
+    )
+    if settings.usage_flush_interval_seconds:
+        background_tasks.append(asyncio.create_task(_keep_usage_flushed()))
 
 
 @asynccontextmanager
 async def lifespan(_: FastAPI):
+    all_shards()  # a malformed SUPABASE_SHARDS or SHARD_ROUTES fails startup, not the first request
+    background_tasks: List[asyncio.Task] = []
+    if settings.fast_startup:
+        # Accept connections right away; /health/ready turns 200 once this finishes.
+        background_tasks.append(asyncio.create_task(_initialize(background_tasks)))
+    else:
+        await _initialize(background_tasks)
     try:
         yield
     finally:
+        for task in background_tasks:
+            task.cancel()
+        if settings.usage_flush_interval_seconds:
+            await _flush_usage()
+        # A replica that startup never got to build has nothing worth saving.
+        index = get_local_index() if get_startup_progress().complete else None
+        # Workers share one snapshot file, so only the first one writes it.
+        if index is not None and settings.local_index_snapshot_path and not worker_index():
+            try:
+                await asyncio.to_thread(index.save, settings.local_index_snapshot_path)
+            except OSError as exc:
+                logger.warning("could not save local index snapshot: {}", exc)
+        await slack_events.shutdown_slack_event_pool()
         await shutdown_dependencies()
+        await get_tracer().flush()
+        await asyncio.to_thread(flush_logging)
 
 
 app = FastAPI(title="Slack Q&A Agent", version="0.1.0", lifespan=lifespan)
@@ -38,9 +134,18 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Innermost, so shed requests still show up in traces and metrics.
+app.add_middleware(LoadSheddingMiddleware, shedder=get_load_shedder(), prefixes=("/memory", "/slack/reply"))
+app.add_middleware(TracingMiddleware)
+app.add_middleware(MetricsMiddleware)
+# Outermost, so every log record written for the request carries its ID.
+app.add_middleware(RequestIdMiddleware)
+
 app.include_router(health.router)
 app.include_router(memory.router)
 app.include_router(slack.router)
+app.include_router(slack_events.router)
+app.include_router(debug.router)
 
 
 @app.exception_handler(RequestValidationError)
@@ -54,6 +159,21 @@ async def validation_exception_handler(_: Request, exc: RequestValidationError):
     return JSONResponse(status_code=detail.status, content=detail.model_dump())
 
 
+@app.exception_handler(DependencyUnavailable)
+async def dependency_unavailable_handler(_: Request, exc: DependencyUnavailable):
+    logger.warning("rejected call to {}: {}", exc.dependency, exc.reason)
+    detail = ProblemDetails(
+        title="Dependency Unavailable",
+        detail=f"{exc.dependency} is unavailable ({exc.reason}); retry later",
+        status=status.HTTP_503_SERVICE_UNAVAILABLE,
+    )
+    return JSONResponse(
+        status_code=detail.status,
+        content=detail.model_dump(),
+        headers={"Retry-After": retry_after_header(exc.retry_after)},
+    )
+
+
 @app.get("/")
 async def root() -> dict[str, str]:
     return {"service": "slack-agent", "status": "ok"}
@@ -0,0 +1,177 @@
+"""Lightweight in-process metric primitives."""
+from __future__ import annotations
+
+from bisect import bisect_left
+from typing import Any, Callable, Dict, Iterator, List, Sequence, Tuple, Union
+
+LATENCY_BUCKETS_SECONDS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+
+class Histogram:
+    """Fixed-bucket histogram; ``observe`` is a bisect plus two additions."""
+
+    def __init__(self, buckets: Sequence[float]) -> None:
+        self.buckets = tuple(sorted(buckets))
+        self.counts: List[int] = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        cumulative: Dict[str, int] = {}
+        running = 0
+        for bound, count in zip(self.buckets, self.counts):
+            running += count
+            cumulative[str(bound)] = running
+        cumulative["+Inf"] = self.count
+        return {"buckets": cumulative, "sum": self.sum, "count": self.count}
+
+
+LabelValues = Tuple[str, ...]
+
+
+class Counter:
+    """Monotonic counter keyed by label values.
+
+    Everything runs on the event loop thread, so a dict increment needs no lock.
+    """
+
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str]) -> None:
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self.values: Dict[LabelValues, float] = {}
+
+    def inc(self, *label_values: str, amount: float = 1.0) -> None:
+        self.values[label_values] = self.values.get(label_values, 0.0) + amount
+
+    def render(self) -> Iterator[str]:
+        for label_values, value in self.values.items():
+            yield f"{self.name}{_labels(self.labels, label_values)} {_number(value)}"
+
+
+class Gauge(Counter):
+    """Value that can go up and down, keyed by label values."""
+
+    kind = "gauge"
+
+    def dec(self, *label_values: str, amount: float = 1.0) -> None:
+        self.inc(*label_values, amount=-amount)
+
+    def set(self, *label_values: str, value: float) -> None:
+        self.values[label_values] = value
+
+
+class LabeledHistogram:
+    """One pre-bucketed ``Histogram`` per label combination."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str], buckets: Sequence[float]) -> None:
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self.values: Dict[LabelValues, Histogram] = {}
+
+    def observe(self, *label_values: str, value: float) -> None:
+        histogram = self.values.get(label_values)
+        if histogram is None:
+            histogram = self.values[label_values] = Histogram(self.buckets)
+        histogram.observe(value)
+
+    def render(self) -> Iterator[str]:
+        for label_values, histogram in self.values.items():
+            running = 0
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                running += count
+                labels = _labels(self.labels + ("le",), label_values + (_number(bound),))
+                yield f"{self.name}_bucket{labels} {running}"
+            labels = _labels(self.labels + ("le",), label_values + ("+Inf",))
+            yield f"{self.name}_bucket{labels} {histogram.count}"
+            yield f"{self.name}_sum{_labels(self.labels, label_values)} {_number(histogram.sum)}"
+            yield f"{self.name}_count{_labels(self.labels, label_values)} {histogram.count}"
+
+
+class Registry:
+    """Named metrics plus callbacks that refresh gauges right before a scrape."""
+
+    def __init__(self) -> None:
+        self._metrics: Dict[str, Union[Counter, LabeledHistogram]] = {}
+        self._collectors: List[Callable[[], None]] = []
+
+    def counter(self, name: str, help_text: str, labels: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, help_text, labels))
+
+    def gauge(self, name: str, help_text: str, labels: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, help_text, labels))
+
+    def histogram(
+        self, name: str, help_text: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS_SECONDS
+    ) -> LabeledHistogram:
+        return self._register(LabeledHistogram(name, help_text, labels, buckets))
+
+    def _register(self, metric: Any) -> Any:
+        if metric.name in self._metrics:
+            raise ValueError(f"metric {metric.name!r} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def add_collector(self, collector: Callable[[], None]) -> None:
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        """Return the Prometheus text exposition format (version 0.0.4)."""
+
+        for collector in self._collectors:
+            collector()
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help_text}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+def _labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+REGISTRY = Registry()
+
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    "http_request_duration_seconds", "Request latency by route template.", ("method", "route", "status")
+)
+HTTP_REQUESTS_IN_FLIGHT = REGISTRY.gauge("http_requests_in_flight", "Requests being served.")
+OUTBOUND_REQUEST_SECONDS = REGISTRY.histogram(
+    "outbound_request_duration_seconds", "Outbound HTTP latency by dependency.", ("dependency", "status")
+)
+OUTBOUND_IN_FLIGHT = REGISTRY.gauge("outbound_requests_in_flight", "Outbound HTTP calls in flight.", ("dependency",))
+ERRORS = REGISTRY.counter("errors_total", "Unhandled and outbound errors by where and type.", ("source", "type"))
+HTTP_POOL_CONNECTIONS = REGISTRY.gauge(
+    "httpx_pool_connections", "Connections in each destination's httpx pool by state.", ("destination", "state")
+)
+DEPENDENCY_CONCURRENCY_LIMIT = REGISTRY.gauge(
+    "dependency_concurrency_limit", "Current adaptive concurrency limit per dependency.", ("dependency",)
+)
+CIRCUIT_BREAKER_STATE = REGISTRY.gauge(
+    "circuit_breaker_state", "Circuit breaker state per dependency (0 closed, 1 half-open, 2 open).", ("dependency",)
+)
@@ -0,0 +1,125 @@
+"""Per-destination outbound HTTP: retry budgets, connection warm-up and readiness."""
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import Any, Dict, Optional
+
+import httpx
+from loguru import logger
+
+from .metrics import ERRORS
+
+_RETRYABLE = (httpx.ConnectError, httpx.ConnectTimeout)
+
+
+class RetryBudget:
+    """Caps retries at a fraction of recent requests.
+
+    Every request deposits ``ratio`` tokens and every retry spends one, with
+    ``min_per_second`` tokens always available so a quiet client can still
+    retry. A failing dependency therefore sees at most ``1 + ratio`` times
+    its normal load instead of ``1 + retries`` times.
+    """
+
+    def __init__(self, *, ratio: float, min_per_second: float = 1.0, capacity: float = 10.0) -> None:
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.min_per_second)
+        self._updated = now
+
+    def deposit(self) -> None:
+        self._refill()
+        self._tokens = min(self.capacity, self._tokens + self.ratio)
+
+    def try_withdraw(self) -> bool:
+        self._refill()
+        if self._tokens < 1.0:
+            return False
+        self._tokens -= 1.0
+        return True
+
+
+class RetryingTransport(httpx.AsyncBaseTransport):
+    """Retries requests that never reached the server, within a ``RetryBudget``.
+
+    Only connection failures are retried, so non-idempotent POSTs are never
+    sent twice.
+    """
+
+    def __init__(
+        self, inner: httpx.AsyncBaseTransport, *, retries: int, budget: RetryBudget, name: str
+    ) -> None:
+        self.inner = inner
+        self.retries = retries
+        self.budget = budget
+        self.name = name
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        self.budget.deposit()
+        attempt = 0
+        while True:
+            try:
+                return await self.inner.handle_async_request(request)
+            except _RETRYABLE:
+                if attempt >= self.retries:
+                    raise
+                if not self.budget.try_withdraw():
+                    ERRORS.inc(self.name, "retry_budget_exhausted")
+                    raise
+            attempt += 1
+            await asyncio.sleep(min(0.05 * 2**attempt, 1.0))
+
+    async def aclose(self) -> None:
+        await self.inner.aclose()
+
+
+class DependencyStatus:
+    """Whether a destination has answered yet, and over which HTTP version.
+
+    Set by the startup warm-up and by every later response, so a dependency
+    that was down at startup becomes ready once it answers.
+    """
+
+    def __init__(self, max_connections: int, http2: bool) -> None:
+        self.max_connections = max_connections
+        self.http2 = http2
+        self.warm = False
+        self.http_version: Optional[str] = None
+        self.error: Optional[str] = None
+
+    async def record_response(self, response: httpx.Response) -> None:
+        self.warm = True
+        self.http_version = response.http_version
+        self.error = None
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "warm": self.warm,
+            "http_version": self.http_version,
+            "http2_enabled": self.http2,
+            "max_connections": self.max_connections,
+            "error": self.error,
+        }
+
+
+async def warm_up(client: httpx.AsyncClient, url: str, status: DependencyStatus, connections: int) -> None:
+    """Open up to ``connections`` connections to ``url``'s origin with concurrent ``HEAD`` requests.
+
+    Any HTTP response counts: the point is the TCP and TLS handshake, which
+    later requests then skip by reusing the keep-alive connection.
+    """
+
+    origin = httpx.URL(url).copy_with(path="/", query=None, fragment=None)
+    results = await asyncio.gather(
+        *(client.head(origin) for _ in range(max(1, connections))), return_exceptions=True
+    )
+    if not any(isinstance(result, httpx.Response) for result in results):
+        status.error = type(results[0]).__name__
+        logger.warning("warm-up of {} failed: {}", origin, results[0])
@@ -0,0 +1,128 @@
+"""Time-decayed, usage-boosted re-ranking of search results, and the hit counts behind it."""
+from __future__ import annotations
+
+from datetime import datetime, timezone
+import math
+from typing import Any, Dict, Iterable, List, Mapping, Optional
+
+
+def parse_timestamp(value: Any) -> Optional[datetime]:
+    if isinstance(value, datetime):
+        return value
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+
+
+def age_days(value: Any, now: datetime) -> Optional[float]:
+    """Days between ``value`` (a ``ts`` column) and ``now``; naive timestamps are taken as UTC."""
+
+    ts = parse_timestamp(value)
+    if ts is None:
+        return None
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    return max(0.0, (now - ts).total_seconds() / 86400)
+
+
+def ranking_weight(
+    row: Mapping[str, Any], now: datetime, *, half_life_days: float, usage_weight: float, extra_hits: int = 0
+) -> float:
+    """``0.5 ** (age / half_life)`` times ``1 + usage_weight * ln(1 + hits)``; either factor is off at ``0``.
+
+    Negative feedback can take ``hits`` below zero; it then counts as zero.
+    """
+
+    weight = 1.0
+    if half_life_days:
+        age = age_days(row.get("ts"), now)
+        if age is not None:
+            weight *= 0.5 ** (age / half_life_days)
+    if usage_weight:
+        weight *= 1.0 + usage_weight * math.log1p(max(0, int(row.get("hits") or 0) + extra_hits))
+    return weight
+
+
+def rerank(
+    rows: List[Dict[str, Any]],
+    k: int,
+    *,
+    half_life_days: float,
+    usage_weight: float,
+    pending_hits: Mapping[int, int] = {},
+    now: Optional[datetime] = None,
+) -> List[Dict[str, Any]]:
+    """Top ``k`` rows by cosine similarity (``1 - score``) times their weight.
+
+    Rows keep their ``score`` (the distance), so callers and clients still
+    see how close each match was; only the order changes.
+    """
+
+    if not half_life_days and not usage_weight:
+        return rows[:k]
+    now = now or datetime.now(timezone.utc)
+
+    def adjusted(row: Dict[str, Any]) -> float:
+        similarity = max(0.0, 1.0 - float(row["score"]))
+        return similarity * ranking_weight(
+            row,
+            now,
+            half_life_days=half_life_days,
+            usage_weight=usage_weight,
+            extra_hits=pending_hits.get(row["id"], 0),
+        )
+
+    return sorted(rows, key=adjusted, reverse=True)[:k]
+
+
+class UsageTracker:
+    """Counts how often each memory is returned, plus Slack feedback, until the counts are flushed to ``kb.hits``."""
+
+    def __init__(self) -> None:
+        self._pending: Dict[int, int] = {}
+        self.recorded = 0
+        self.feedback = 0
+        self.flushed = 0
+
+    @property
+    def pending(self) -> Mapping[int, int]:
+        return self._pending
+
+    def record(self, ids: Iterable[int]) -> None:
+        for memory_id in ids:
+            self._pending[memory_id] = self._pending.get(memory_id, 0) + 1
+            self.recorded += 1
+
+    def add_feedback(self, memory_id: int, hits: int) -> None:
+        """Add ``hits`` (negative for "not helpful") to ``memory_id``'s pending count."""
+
+        total = self._pending.get(memory_id, 0) + hits
+        if total:
+            self._pending[memory_id] = total
+        else:
+            self._pending.pop(memory_id, None)
+        self.feedback += 1
+
+    def drain(self) -> Dict[int, int]:
+        pending, self._pending = self._pending, {}
+        return pending
+
+    def restore(self, counts: Mapping[int, int]) -> None:
+        """Put back counts whose flush failed, so the next flush sends them."""
+
+        for memory_id, count in counts.items():
+            self._pending[memory_id] = self._pending.get(memory_id, 0) + count
+
+    def mark_flushed(self, counts: Mapping[int, int]) -> None:
+        self.flushed += sum(abs(count) for count in counts.values())
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "recorded": self.recorded,
+            "feedback": self.feedback,
+            "flushed": self.flushed,
+            "pending_rows": len(self._pending),
+        }
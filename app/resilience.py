@@ -0,0 +1,267 @@
+"""Overload protection: adaptive concurrency limits, circuit breakers and load shedding."""
+from __future__ import annotations
+
+import asyncio
+from collections import deque
+import math
+import time
+from typing import Any, Deque, Dict, Optional
+
+import httpx
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from .domain.schemas import ProblemDetails
+from .metrics import ERRORS
+
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+
+
+class DependencyUnavailable(httpx.TransportError):
+    """Raised without calling a dependency whose breaker is open or whose limit is full."""
+
+    def __init__(self, dependency: str, reason: str, retry_after: float, request: httpx.Request) -> None:
+        super().__init__(f"{dependency} unavailable: {reason}", request=request)
+        self.dependency = dependency
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AIMDLimiter:
+    """Concurrency limit with additive increase and multiplicative decrease.
+
+    Each call that finishes under ``latency_target`` raises the limit by
+    ``1 / limit`` (about one per round of calls). A slow or failed call
+    multiplies it by ``backoff``. Callers over the limit wait up to
+    ``max_wait`` seconds for a slot and are then rejected.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_limit: int,
+        latency_target: float,
+        min_limit: int = 1,
+        backoff: float = 0.9,
+        max_wait: float = 0.25,
+    ) -> None:
+        self.max_limit = max_limit
+        self.min_limit = min(min_limit, max_limit)
+        self.latency_target = latency_target
+        self.backoff = backoff
+        self.max_wait = max_wait
+        self.limit = float(max_limit)
+        self.in_flight = 0
+        self.rejected = 0
+        self._waiters: Deque[asyncio.Future[None]] = deque()
+
+    async def acquire(self) -> bool:
+        """Take a slot; ``False`` when none freed up within ``max_wait``."""
+
+        if self.in_flight < int(self.limit) and not self._waiters:
+            self.in_flight += 1
+            return True
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout=self.max_wait)
+            return True
+        except asyncio.TimeoutError:
+            if waiter.done() and not waiter.cancelled():
+                return True  # granted just as the wait ran out
+            waiter.cancel()
+            self.rejected += 1
+            return False
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+
+    def release(self, latency: float, *, overloaded: bool) -> None:
+        self.in_flight -= 1
+        if overloaded or latency > self.latency_target:
+            self.limit = max(float(self.min_limit), self.limit * self.backoff)
+        else:
+            self.limit = min(float(self.max_limit), self.limit + 1.0 / self.limit)
+        while self._waiters and self.in_flight < int(self.limit):
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "limit": round(self.limit, 2),
+            "in_flight": self.in_flight,
+            "waiting": len(self._waiters),
+            "rejected": self.rejected,
+        }
+
+
+class CircuitBreaker:
+    """Opens after ``failure_threshold`` consecutive failures and fails fast for ``reset_seconds``.
+
+    Once the timeout has passed, a single probe call is let through
+    (half-open). Its success closes the breaker; its failure opens it again.
+    """
+
+    def __init__(self, *, failure_threshold: int, reset_seconds: float) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened = 0
+        self._opened_at = 0.0
+        self._probing = False
+
+    def retry_after(self) -> float:
+        return max(0.0, self._opened_at + self.reset_seconds - time.monotonic())
+
+    def allow(self) -> bool:
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN and self.retry_after() > 0:
+            return False
+        if self._probing:
+            return False
+        self.state = HALF_OPEN
+        self._probing = True
+        return True
+
+    def cancel_probe(self) -> None:
+        self._probing = False
+
+    def record(self, success: bool) -> None:
+        self._probing = False
+        if success:
+            self.state = CLOSED
+            self.consecutive_failures = 0
+            return
+        self.consecutive_failures += 1
+        if self.state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            if self.state != OPEN:
+                self.opened += 1
+            self.state = OPEN
+            self._opened_at = time.monotonic()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "opened": self.opened,
+            "retry_after_seconds": round(self.retry_after(), 3) if self.state == OPEN else 0.0,
+        }
+
+
+class GuardedTransport(httpx.AsyncBaseTransport):
+    """Puts a dependency's calls behind its breaker and concurrency limiter.
+
+    Timeouts, connection errors and 5xx responses count as failures; 429
+    responses only shrink the limit.
+    """
+
+    def __init__(
+        self, inner: httpx.AsyncBaseTransport, *, name: str, limiter: AIMDLimiter, breaker: CircuitBreaker
+    ) -> None:
+        self.inner = inner
+        self.name = name
+        self.limiter = limiter
+        self.breaker = breaker
+
+    def _reject(self, request: httpx.Request, reason: str, retry_after: float) -> DependencyUnavailable:
+        ERRORS.inc(self.name, reason)
+        return DependencyUnavailable(self.name, reason, retry_after, request)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        if not self.breaker.allow():
+            raise self._reject(request, "circuit_open", self.breaker.retry_after())
+        if not await self.limiter.acquire():
+            self.breaker.cancel_probe()
+            raise self._reject(request, "concurrency_limited", 1.0)
+        started = time.monotonic()
+        failed = True
+        overloaded = True
+        try:
+            response = await self.inner.handle_async_request(request)
+            failed = response.status_code >= 500
+            overloaded = failed or response.status_code == 429
+            return response
+        finally:
+            self.limiter.release(time.monotonic() - started, overloaded=overloaded)
+            self.breaker.record(not failed)
+
+    async def aclose(self) -> None:
+        await self.inner.aclose()
+
+
+class LoadShedder:
+    """CoDel-style detector of a standing queue in front of the handlers.
+
+    If even the fastest request finishing in an ``interval`` took longer
+    than ``target``, requests are queueing rather than just slow ones
+    passing through. New requests are then shed for the next interval, or
+    until one finishes under target, and the check repeats.
+    """
+
+    def __init__(self, *, target: float, interval: float = 1.0) -> None:
+        self.target = target
+        self.interval = interval
+        self.shed = 0
+        self._shed_until = 0.0
+        self._window_start = time.monotonic()
+        self._window_min = math.inf
+
+    @property
+    def enabled(self) -> bool:
+        return self.target > 0
+
+    @property
+    def shedding(self) -> bool:
+        return time.monotonic() < self._shed_until
+
+    def observe(self, latency: float) -> None:
+        now = time.monotonic()
+        self._window_min = min(self._window_min, latency)
+        if latency <= self.target:
+            self._shed_until = 0.0
+        if now - self._window_start >= self.interval:
+            if self._window_min > self.target:
+                self._shed_until = now + self.interval
+            self._window_start = now
+            self._window_min = math.inf
+
+    def stats(self) -> Dict[str, Any]:
+        return {"enabled": self.enabled, "shedding": self.shedding, "shed": self.shed, "target_ms": self.target * 1000}
+
+
+class LoadSheddingMiddleware:
+    """Answers 503 on guarded paths while the ``LoadShedder`` reports a standing queue."""
+
+    def __init__(self, app: ASGIApp, *, shedder: LoadShedder, prefixes: tuple[str, ...]) -> None:
+        self.app = app
+        self.shedder = shedder
+        self.prefixes = prefixes
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self.shedder.enabled or not scope["path"].startswith(self.prefixes):
+            await self.app(scope, receive, send)
+            return
+        if self.shedder.shedding:
+            self.shedder.shed += 1
+            ERRORS.inc("request", "load_shed")
+            detail = ProblemDetails(title="Overloaded", detail="Server is shedding load", status=503)
+            response = JSONResponse(
+                detail.model_dump(),
+                status_code=503,
+                headers={"Retry-After": "1"},
+            )
+            await response(scope, receive, send)
+            return
+        started = time.monotonic()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.shedder.observe(time.monotonic() - started)
+
+
+def retry_after_header(seconds: Optional[float]) -> str:
+    return str(max(1, math.ceil(seconds or 0)))
@@ -0,0 +1,155 @@
+"""Move cold memories from ``kb`` to the archive table and keep the vector index tight.
+
+A row is cold once it is older than its channel's maximum age
+(``RETENTION_MAX_AGE_DAYS``, per channel ``RETENTION_CHANNEL_MAX_AGE_DAYS``)
+and has neither been returned within ``RETENTION_IDLE_DAYS`` nor
+``RETENTION_MIN_HITS`` times overall. Cold rows are copied to the archive
+table, where ``/memory/search`` with ``include_archive`` still finds them,
+and deleted from ``kb``. When a run removes at least
+``RETENTION_REINDEX_MIN_FRACTION`` of the table (or with ``--reindex``) the
+vector index is rebuilt. Search RPC latency is probed before and after.
+Without ``--apply`` it only reports what it would archive. Each run covers
+one shard (``--shard``, the default one unless given).
+
+    python -m app.retention            # dry run
+    python -m app.retention --apply
+    python -m app.retention --apply --shard acme
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+from dataclasses import dataclass
+from datetime import datetime, timezone
+import json
+import random
+import statistics
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from loguru import logger
+
+from .config import settings
+from .deps import shutdown_dependencies
+from .ranking import age_days
+from .sharding import get_shard, using_shard
+from .supa import RETENTION_COLUMNS, archive_memories, iter_memory_pages, reindex_memories, search_memory
+
+
+@dataclass(frozen=True)
+class RetentionPolicy:
+    max_age_days: float
+    idle_days: float
+    min_hits: int
+
+    def is_cold(self, row: Dict[str, Any], now: datetime) -> bool:
+        if not self.max_age_days:
+            return False
+        age = age_days(row.get("ts"), now)
+        if age is None or age <= self.max_age_days:
+            return False
+        if self.min_hits and int(row.get("hits") or 0) >= self.min_hits:
+            return False
+        idle = age_days(row.get("last_hit_at"), now)
+        return idle is None or idle > self.idle_days
+
+
+def policy_for(channel: Optional[str]) -> RetentionPolicy:
+    """The configured policy, with the channel's maximum age override applied."""
+
+    return RetentionPolicy(
+        max_age_days=settings.retention_max_age_overrides.get(channel or "", settings.retention_max_age_days),
+        idle_days=settings.retention_idle_days,
+        min_hits=settings.retention_min_hits,
+    )
+
+
+async def probe_search_latency(samples: List[Tuple[Optional[str], List[float]]], k: int) -> Dict[str, Any]:
+    """Time one search RPC per ``(channel, embedding)`` sample, one at a time."""
+
+    timings: List[float] = []
+    errors = 0
+    for channel, vector in samples:
+        started = time.perf_counter()
+        try:
+            await search_memory(channel=channel, query_embedding=vector, k=k)
+        except Exception as exc:
+            errors += 1
+            logger.debug("latency probe failed: {}", exc)
+            continue
+        timings.append((time.perf_counter() - started) * 1000)
+    if not timings:
+        return {"probes": len(samples), "errors": errors}
+    timings.sort()
+    return {
+        "probes": len(samples),
+        "errors": errors,
+        "p50_ms": round(statistics.median(timings), 2),
+        "p95_ms": round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 2),
+        "mean_ms": round(statistics.fmean(timings), 2),
+    }
+
+
+async def apply_retention(
+    *, apply: bool, reindex: bool = False, probes: int = 20, k: int = 5, now: Optional[datetime] = None
+) -> Dict[str, Any]:
+    """Find (and with ``apply``, archive) cold rows page by page; returns a report."""
+
+    now = now or datetime.now(timezone.utc)
+    report: Dict[str, Any] = {
+        "apply": apply,
+        "rows_scanned": 0,
+        "rows_cold": 0,
+        "rows_archived": 0,
+        "reindexed": False,
+        "channels": {},
+    }
+    samples: List[Tuple[Optional[str], List[float]]] = []
+    async for page in iter_memory_pages(columns=RETENTION_COLUMNS):
+        if not report["rows_scanned"] and probes:
+            # Probe with stored embeddings as queries, before anything moves.
+            picked = random.Random(0).sample(page, min(probes, len(page)))
+            samples = [(row.get("channel"), row["embedding"]) for row in picked]
+            report["latency_before"] = await probe_search_latency(samples, k)
+        cold = [row for row in page if policy_for(row.get("channel")).is_cold(row, now)]
+        report["rows_scanned"] += len(page)
+        report["rows_cold"] += len(cold)
+        for row in page:
+            counts = report["channels"].setdefault(row.get("channel") or "", {"rows": 0, "cold": 0})
+            counts["rows"] += 1
+        for row in cold:
+            report["channels"][row.get("channel") or ""]["cold"] += 1
+        if apply and cold:
+            report["rows_archived"] += await archive_memories(cold)
+
+    archived_fraction = report["rows_archived"] / report["rows_scanned"] if report["rows_scanned"] else 0.0
+    report["archived_fraction"] = round(archived_fraction, 4)
+    if apply and (reindex or (report["rows_archived"] and archived_fraction >= settings.retention_reindex_min_fraction)):
+        started = time.perf_counter()
+        await reindex_memories()
+        report["reindexed"] = True
+        report["reindex_seconds"] = round(time.perf_counter() - started, 3)
+    if apply and samples:
+        report["latency_after"] = await probe_search_latency(samples, k)
+    logger.info(
+        "retention: {} of {} rows cold, {} archived", report["rows_cold"], report["rows_scanned"], report["rows_archived"]
+    )
+    return report
+
+
+async def main(args: argparse.Namespace) -> Dict[str, Any]:
+    try:
+        with using_shard(get_shard(args.shard)):
+            return await apply_retention(apply=args.apply, reindex=args.reindex, probes=args.probes, k=args.k)
+    finally:
+        await shutdown_dependencies()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--apply", action="store_true", help="archive cold rows instead of only reporting them")
+    parser.add_argument("--reindex", action="store_true", help="rebuild the vector index even after few deletions")
+    parser.add_argument("--probes", type=int, default=20, help="search RPC calls timed before and after (0 skips)")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--shard", help="shard name from SUPABASE_SHARDS (default: the default shard)")
+    print(json.dumps(asyncio.run(main(parser.parse_args())), indent=2))
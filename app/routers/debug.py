@@ -0,0 +1,57 @@
+"""Admin-only diagnostics: recent traces and live sampling profiles."""
+from __future__ import annotations
+
+import asyncio
+import hmac
+import threading
+from typing import Any, Dict, Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, status
+from fastapi.responses import PlainTextResponse
+
+from ..config import settings
+from ..profiler import render_collapsed, sample_thread
+from ..tracing import get_tracer
+
+
+def require_admin(authorization: Optional[str] = Header(default=None)) -> None:
+    if not settings.admin_token:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    expected = f"Bearer {settings.admin_token}"
+    if authorization is None or not hmac.compare_digest(authorization, expected):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Admin token required")
+
+
+router = APIRouter(prefix="/debug", tags=["debug"], dependencies=[Depends(require_admin)])
+
+_profile_lock = asyncio.Lock()
+
+
+@router.get("/traces")
+def recent_traces(limit: int = Query(default=20, ge=1, le=1000)) -> Dict[str, Any]:
+    """Most recent kept traces, newest first, as OTLP/JSON ``resourceSpans`` documents."""
+
+    traces = list(get_tracer().traces)[-limit:]
+    return {"traces": traces[::-1]}
+
+
+@router.post("/profile", response_class=PlainTextResponse)
+async def profile(
+    seconds: float = Query(default=10.0, gt=0, le=60),
+    interval_ms: float = Query(default=5.0, ge=1, le=1000),
+) -> PlainTextResponse:
+    """Sample the event loop thread for ``seconds`` and return collapsed stacks.
+
+    Pipe the output into ``flamegraph.pl`` or load it in speedscope.
+    """
+
+    if _profile_lock.locked():
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="A profile is already running")
+    async with _profile_lock:
+        counts = await asyncio.to_thread(
+            sample_thread,
+            threading.get_ident(),
+            duration_seconds=seconds,
+            interval_seconds=interval_ms / 1000.0,
+        )
+    return PlainTextResponse(render_collapsed(counts))
@@ -1,11 +1,68 @@
-"""Health check endpoint."""
+"""Health check and metrics endpoints."""
 from __future__ import annotations
 
-from fastapi import APIRouter
+from typing import Any
+
+from fastapi import APIRouter, status
+from fastapi.responses import JSONResponse, PlainTextResponse
+
+from ..deps import (
+    dependencies_ready,
+    dependency_status,
+    get_embedding_cache,
+    get_semantic_cache,
+    get_startup_progress,
+    get_usage_tracker,
+    resilience_stats,
+)
+from ..embeddings import get_embedding_dispatcher
+from ..logging import logging_stats
+from ..metrics import REGISTRY
+from ..slack_outbox import get_slack_outbox
+from .slack_events import get_slack_event_pool
 
 router = APIRouter(tags=["health"])
 
 
 @router.get("/health")
-def health() -> dict[str, bool]:
-    return {"ok": True}
+def health() -> dict[str, Any]:
+    """Liveness (``ok``) plus readiness, dependency status and the startup breakdown."""
+
+    return {
+        "ok": True,
+        "ready": dependencies_ready(),
+        "startup": get_startup_progress().as_dict(),
+        "dependencies": {name: dep.as_dict() for name, dep in dependency_status().items()},
+    }
+
+
+@router.get("/health/ready")
+def health_ready() -> JSONResponse:
+    """Readiness gate: 200 once startup has finished and every dependency has answered, 503 before."""
+
+    ready = dependencies_ready()
+    return JSONResponse(
+        status_code=status.HTTP_200_OK if ready else status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"ready": ready, "startup": get_startup_progress().as_dict()},
+    )
+
+
+@router.get("/health/stats")
+def health_stats() -> dict[str, Any]:
+    return {
+        "embedding_cache": get_embedding_cache().stats.as_dict(),
+        "embedding_dispatcher": get_embedding_dispatcher().stats(),
+        "semantic_cache": get_semantic_cache().stats.as_dict(),
+        "slack_outbox": get_slack_outbox().stats(),
+        "slack_events": get_slack_event_pool().stats(),
+        "resilience": resilience_stats(),
+        "usage": get_usage_tracker().stats(),
+        "logging": logging_stats(),
+    }
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def metrics() -> PlainTextResponse:
+    """Prometheus text exposition of request, dependency and pool metrics."""
+
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
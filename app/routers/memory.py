@@ -1,26 +1,74 @@
 """Memory management endpoints."""
 from __future__ import annotations
 
+import asyncio
+from datetime import datetime
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
 from loguru import logger
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
 import httpx
+from pydantic import ValidationError
+from starlette.types import Receive, Scope, Send
 
+from .. import fastjson
+from ..config import settings
+from ..dedup import DedupDecision, decide, fold_duplicates
+from ..deps import get_lexical_index, get_semantic_cache, get_usage_tracker
 from ..embeddings import EmbeddingError, embed
-from ..domain.schemas import Match, SearchRequest, SearchResponse, UpsertRequest, UpsertResponse
-from ..supa import insert_memory, search_memory
+from ..fastjson import FastJSONResponse
+from ..domain import policy
+from ..domain.schemas import (
+    AnswerRequest,
+    AnswerResponse,
+    BatchUpsertResult,
+    Match,
+    Reference,
+    SearchRequest,
+    SearchResponse,
+    SlackReplyRequest,
+    UpsertRequest,
+    UpsertResponse,
+)
+from ..lexical_index import identifier_terms, lexical_identifiers, reciprocal_rank_fusion
+from ..resilience import DependencyUnavailable
+from ..ranking import rerank
+from ..sharding import Shard, current_shard, get_shard, route, search_targets, using_shard
+from ..slack_render import clip
+from ..supa import (
+    SearchFunction,
+    insert_memories,
+    insert_memory,
+    search_archived_memories,
+    search_memory,
+    search_shards,
+    update_memory,
+)
+from .slack import _build_message, send_slack_reply, warm_up_slack
 
 router = APIRouter(prefix="/memory", tags=["memory"])
 
+_NDJSON = "application/x-ndjson"
 
-@router.post("/upsert", response_model=UpsertResponse)
-async def upsert_memory(payload: UpsertRequest) -> UpsertResponse:
-    try:
-        vector = await embed(payload.q_text)
-    except (EmbeddingError, httpx.HTTPError) as exc:
-        logger.exception("embedding failed")
-        raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail=str(exc)) from exc
 
-    row = {
+class _DuplexStreamingResponse(StreamingResponse):
+    """Streaming response that leaves ``receive`` to the request body reader.
+
+    Starlette's ``StreamingResponse`` listens for disconnects on ``receive``
+    while streaming, which would consume body chunks the endpoint has not read
+    yet. Here the body reader sees the disconnect instead (``ClientDisconnect``).
+    """
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+
+def _memory_row(payload: UpsertRequest, vector: List[float]) -> Dict[str, Any]:
+    return {
         "channel": payload.channel,
         "q_text": payload.q_text,
         "a_text": payload.a_text,
@@ -29,25 +77,266 @@ async def upsert_memory(payload: UpsertRequest) -> UpsertResponse:
         "embedding": vector,
     }
 
+
+_DEDUP_OUTCOMES = {"merge": "merged", "update": "updated", "skip": "skipped"}
+
+
+async def _find_duplicate(row: Dict[str, Any]) -> DedupDecision:
+    """Check the row's nearest neighbours in its channel; any failure falls back to inserting."""
+
+    if not settings.dedup_enabled:
+        return DedupDecision("insert")
+    try:
+        neighbours = await search_memory(
+            channel=row["channel"], query_embedding=row["embedding"], k=settings.dedup_neighbours
+        )
+    except (httpx.HTTPError, RuntimeError) as exc:
+        logger.warning("dedup neighbour search failed, inserting: {}", exc)
+        return DedupDecision("insert")
+    return decide(
+        row, neighbours, min_cosine=settings.dedup_min_cosine, min_jaccard=settings.dedup_min_jaccard
+    )
+
+
+@router.post("/upsert", response_model=UpsertResponse, response_model_exclude_none=True)
+async def upsert_memory(payload: UpsertRequest) -> UpsertResponse:
+    with using_shard(route(workspace=payload.workspace, channel=payload.channel)):
+        return await _upsert(payload)
+
+
+async def _upsert(payload: UpsertRequest) -> UpsertResponse:
+    try:
+        vector = await embed(payload.q_text)
+    except DependencyUnavailable:
+        raise
+    except (EmbeddingError, httpx.HTTPError) as exc:
+        logger.exception("embedding failed")
+        raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail=str(exc)) from exc
+
+    row = _memory_row(payload, vector)
+
+    decision = await _find_duplicate(row)
+    if decision.action != "insert":
+        assert decision.memory_id is not None
+        try:
+            await update_memory(decision.memory_id, payload.channel, decision.changes)
+        except DependencyUnavailable:
+            raise
+        except Exception as exc:  # pragma: no cover - network failure path
+            logger.exception("supabase update failed")
+            raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail="Unable to update memory") from exc
+        return UpsertResponse(
+            id=decision.memory_id, action=_DEDUP_OUTCOMES[decision.action], shard=current_shard().client_key
+        )
+
     try:
         memory_id = await insert_memory(row)
+    except DependencyUnavailable:
+        raise
     except Exception as exc:  # pragma: no cover - network failure path
         logger.exception("supabase insert failed")
         raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail="Unable to insert memory") from exc
 
-    return UpsertResponse(id=memory_id)
+    return UpsertResponse(id=memory_id, shard=current_shard().client_key)
 
 
-@router.post("/search", response_model=SearchResponse)
-async def search_memories(payload: SearchRequest) -> SearchResponse:
+async def _ndjson_lines(request: Request) -> AsyncIterator[Tuple[int, bytes]]:
+    """Yield ``(line_number, line)`` pairs from a streamed NDJSON body."""
+
+    buffer = b""
+    line_number = 0
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line_number, line
+            line_number += 1
+    if buffer:
+        yield line_number, buffer
+
+
+async def _apply_existing_duplicate(line: int, row: Dict[str, Any], decision: DedupDecision) -> BatchUpsertResult:
+    assert decision.memory_id is not None
     try:
-        vector = await embed(payload.query)
+        await update_memory(decision.memory_id, row["channel"], decision.changes)
+    except Exception as exc:
+        logger.warning("dedup update of {} failed for line {}: {}", decision.memory_id, line, exc)
+        return BatchUpsertResult(line=line, error="Unable to update memory")
+    return BatchUpsertResult(line=line, id=decision.memory_id, action=_DEDUP_OUTCOMES[decision.action])
+
+
+async def _ingest_chunk(
+    chunk: List[Tuple[int, UpsertRequest]], embed_limiter: asyncio.Semaphore
+) -> List[BatchUpsertResult]:
+    """Split the chunk by shard and ingest each part on its own shard concurrently."""
+
+    parts: Dict[Shard, List[Tuple[int, UpsertRequest]]] = {}
+    for line, payload in chunk:
+        parts.setdefault(route(workspace=payload.workspace, channel=payload.channel), []).append((line, payload))
+
+    async def _on_shard(shard: Shard, part: List[Tuple[int, UpsertRequest]]) -> List[BatchUpsertResult]:
+        with using_shard(shard):
+            results = await _ingest_shard_chunk(part, embed_limiter)
+        if shard.client_key:
+            for result in results:
+                if result.id is not None:
+                    result.shard = shard.client_key
+        return results
+
+    outcomes = await asyncio.gather(*(_on_shard(shard, part) for shard, part in parts.items()))
+    return [result for results in outcomes for result in results]
+
+
+async def _ingest_shard_chunk(
+    chunk: List[Tuple[int, UpsertRequest]], embed_limiter: asyncio.Semaphore
+) -> List[BatchUpsertResult]:
+    async def _prepare(payload: UpsertRequest) -> Tuple[Dict[str, Any], DedupDecision]:
+        async with embed_limiter:
+            row = _memory_row(payload, await embed(payload.q_text))
+            return row, await _find_duplicate(row)
+
+    prepared = await asyncio.gather(*(_prepare(payload) for _, payload in chunk), return_exceptions=True)
+
+    results: List[BatchUpsertResult] = []
+    updates = []
+    lines: List[int] = []
+    rows: List[Dict[str, Any]] = []
+    for (line, _), outcome in zip(chunk, prepared):
+        if isinstance(outcome, (EmbeddingError, httpx.HTTPError)):
+            results.append(BatchUpsertResult(line=line, error=f"embedding failed: {outcome}"))
+        elif isinstance(outcome, BaseException):
+            raise outcome
+        elif outcome[1].action != "insert":
+            updates.append(_apply_existing_duplicate(line, *outcome))
+        else:
+            lines.append(line)
+            rows.append(outcome[0])
+    results.extend(await asyncio.gather(*updates))
+    if not rows:
+        return results
+
+    # Duplicates within the chunk fold into the first copy before it is inserted.
+    folded: List[Tuple[int, DedupDecision]] = []
+    if settings.dedup_enabled:
+        decisions = fold_duplicates(
+            rows, min_cosine=settings.dedup_min_cosine, min_jaccard=settings.dedup_min_jaccard
+        )
+        folded = [(line, d) for line, d in zip(lines, decisions) if d.action != "insert"]
+        positions = [i for i, d in enumerate(decisions) if d.action == "insert"]
+        lines = [lines[i] for i in positions]
+        rows = [rows[i] for i in positions]
+
+    try:
+        ids = await insert_memories(rows)
+    except Exception as exc:
+        logger.warning("batch insert failed for lines {}-{}: {}", lines[0], lines[-1], exc)
+        results.extend(
+            BatchUpsertResult(line=line, error="Unable to insert memory")
+            for line in [*lines, *(line for line, _ in folded)]
+        )
+        return results
+
+    results.extend(BatchUpsertResult(line=line, id=memory_id) for line, memory_id in zip(lines, ids))
+    if folded:
+        id_at = dict(zip(positions, ids))
+        results.extend(
+            BatchUpsertResult(line=line, id=id_at[d.memory_id], action=_DEDUP_OUTCOMES[d.action])  # type: ignore[index]
+            for line, d in folded
+        )
+    return results
+
+
+@router.post("/upsert:batch")
+async def upsert_memories_batch(
+    request: Request,
+    offset: int = Query(default=0, ge=0),
+    batch_size: int = Query(default=100, ge=1, le=1000),
+) -> StreamingResponse:
+    """Bulk-ingest an NDJSON stream of ``UpsertRequest`` rows.
+
+    Results are streamed back as NDJSON ``{"line", "id"|"error"}`` objects in
+    completion order. Lines before ``offset`` are skipped so an interrupted
+    backfill can resend the same file and resume where it stopped. Delivery
+    is at-least-once: if the client disconnects, a chunk whose insert was
+    already in flight may be stored without its ids being reported.
+    """
+
+    results: asyncio.Queue[Optional[List[BatchUpsertResult]]] = asyncio.Queue()
+    insert_limiter = asyncio.Semaphore(settings.supabase_insert_concurrency)
+    embed_limiter = asyncio.Semaphore(settings.embedding_concurrency)
+    tasks: set[asyncio.Task[None]] = set()
+
+    async def _run_chunk(chunk: List[Tuple[int, UpsertRequest]]) -> None:
+        try:
+            await results.put(await _ingest_chunk(chunk, embed_limiter))
+        finally:
+            insert_limiter.release()
+
+    async def _dispatch(chunk: List[Tuple[int, UpsertRequest]]) -> None:
+        # Acquire before spawning so reading the body pauses while all slots are busy.
+        await insert_limiter.acquire()
+        task = asyncio.create_task(_run_chunk(chunk))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+
+    async def _produce() -> None:
+        chunk: List[Tuple[int, UpsertRequest]] = []
+        try:
+            async for line_number, line in _ndjson_lines(request):
+                if line_number < offset or not line.strip():
+                    continue
+                try:
+                    chunk.append((line_number, UpsertRequest.model_validate_json(line)))
+                except ValidationError:
+                    await results.put([BatchUpsertResult(line=line_number, error="Input validation failed")])
+                    continue
+                if len(chunk) >= batch_size:
+                    await _dispatch(chunk)
+                    chunk = []
+            if chunk:
+                await _dispatch(chunk)
+            await asyncio.gather(*tasks)
+        finally:
+            await results.put(None)
+
+    async def _stream() -> AsyncIterator[bytes]:
+        producer = asyncio.create_task(_produce())
+        try:
+            while (batch := await results.get()) is not None:
+                for result in batch:
+                    yield result.model_dump_json(exclude_none=True).encode() + b"\n"
+            await producer
+        finally:
+            producer.cancel()
+            for task in list(tasks):
+                task.cancel()
+
+    return _DuplexStreamingResponse(_stream(), media_type=_NDJSON)
+
+
+async def _embed_query(query: str) -> List[float]:
+    try:
+        return await embed(query)
+    except DependencyUnavailable:
+        raise
     except (EmbeddingError, httpx.HTTPError) as exc:
         logger.exception("embedding failed")
         raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail=str(exc)) from exc
 
+
+async def _vector_rows(
+    channel: Optional[str],
+    vector: List[float],
+    k: int,
+    search: Optional[SearchFunction] = None,
+    shards: Tuple[Shard, ...] = (),
+) -> List[Dict[str, Any]]:
     try:
-        rows = await search_memory(channel=payload.channel, query_embedding=vector, k=payload.k)
+        return await search_shards(
+            shards or (get_shard(),), search or search_memory, channel=channel, query_embedding=vector, k=k
+        )
+    except DependencyUnavailable:
+        raise
     except httpx.HTTPStatusError as exc:
         logger.exception("supabase RPC failed")
         raise HTTPException(status_code=exc.response.status_code, detail="Supabase RPC failed") from exc
@@ -55,5 +344,253 @@ async def search_memories(payload: SearchRequest) -> SearchResponse:
         logger.exception("supabase network error")
         raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail="Supabase network error") from exc
 
-    matches = [Match(**row) for row in rows]
-    return SearchResponse(matches=matches)
+
+def _ranking_enabled() -> bool:
+    return bool(settings.ranking_decay_half_life_days or settings.ranking_usage_weight)
+
+
+async def _vector_candidates(
+    channel: Optional[str],
+    vector: List[float],
+    k: int,
+    *,
+    include_archive: bool = False,
+    shards: Tuple[Shard, ...] = (),
+) -> List[Dict[str, Any]]:
+    """Nearest ``k`` rows across ``shards``; over-fetched and re-ranked by age and usage when ranking is on."""
+
+    shards = shards or (get_shard(),)
+    fetch = k * settings.ranking_candidate_factor if _ranking_enabled() else k
+    rows = await _vector_rows(channel, vector, fetch, shards=shards)
+    if include_archive:
+        archived = await _vector_rows(channel, vector, fetch, search_archived_memories, shards)
+        rows = sorted([*rows, *archived], key=lambda row: row["score"])[:fetch]
+    return rerank(
+        rows,
+        k,
+        half_life_days=settings.ranking_decay_half_life_days,
+        usage_weight=settings.ranking_usage_weight,
+        # Pending counts are keyed by id, which is only unique within one shard.
+        pending_hits=get_usage_tracker(shards[0].client_key).pending if len(shards) == 1 else {},
+    )
+
+
+def _match(row: Dict[str, Any], score: Optional[float] = None) -> Match:
+    """Wrap a row from ``search_memory`` or an index, which is already typed, without revalidating it."""
+
+    ts = row.get("ts")
+    return Match.model_construct(
+        id=row["id"],
+        score=row["score"] if score is None else score,
+        q_text=row["q_text"],
+        a_text=row["a_text"],
+        source_url=row.get("source_url"),
+        ts=datetime.fromisoformat(ts) if isinstance(ts, str) else ts,
+        shard=row.get("shard"),
+    )
+
+
+def _fuse(vector_rows: List[Dict[str, Any]], lexical_rows: List[Dict[str, Any]], k: int) -> List[Match]:
+    """Reciprocal rank fusion; keyword-only hits have no distance and score ``1.0``."""
+
+    rows = {row["id"]: (row, 1.0) for row in lexical_rows}
+    rows.update((row["id"], (row, row["score"])) for row in vector_rows)
+    fused = reciprocal_rank_fusion(
+        [[row["id"] for row in vector_rows], [row["id"] for row in lexical_rows]], k=settings.hybrid_rrf_k
+    )
+    return [_match(*rows[memory_id]) for memory_id, _ in fused[:k]]
+
+
+async def _search_matches(
+    channel: Optional[str],
+    vector: List[float],
+    k: int,
+    *,
+    query: Optional[str] = None,
+    include_archive: bool = False,
+    shards: Tuple[Shard, ...] = (),
+) -> SearchResponse:
+    shards = shards or (get_shard(),)
+    # The BM25 replica mirrors the default shard only.
+    lexical = get_lexical_index() if query and _default_only(shards) else None
+    if lexical is not None and not lexical.is_fresh:
+        lexical = None
+    # Near-identical embeddings of "error E1234" and "error E1235" must not share cached results.
+    cacheable = not include_archive and (lexical is None or not identifier_terms(query or ""))
+    # Writes invalidate one shard's namespace, which a scatter-gather result spans several of.
+    cacheable = cacheable and len(shards) == 1
+    semantic_cache = get_semantic_cache(shards[0].client_key)
+    if cacheable and semantic_cache.enabled:
+        cached = semantic_cache.lookup(channel=channel, k=k, vector=vector)
+        if cached is not None:
+            return cached
+
+    if lexical is None:
+        rows = await _vector_candidates(channel, vector, k, include_archive=include_archive, shards=shards)
+        matches = [_match(row) for row in rows]
+    else:
+        candidates = k * settings.hybrid_candidate_factor
+        vector_rows = await _vector_candidates(
+            channel, vector, candidates, include_archive=include_archive, shards=shards
+        )
+        matches = _fuse(vector_rows, lexical.search(channel=channel, query=query or "", k=candidates), k)
+
+    response = SearchResponse.model_construct(matches=matches)
+    if cacheable:
+        semantic_cache.store(channel=channel, k=k, vector=vector, response=response)
+    return response
+
+
+async def _retrieve(
+    channel: Optional[str],
+    query: str,
+    k: int,
+    timings: Optional[Dict[str, float]] = None,
+    *,
+    include_archive: bool = False,
+    workspace: Optional[str] = None,
+) -> SearchResponse:
+    """Embed and search, or answer a clearly lexical query from BM25 alone.
+
+    ``timings`` (when given) receives ``embed`` and ``search`` in milliseconds.
+    ``include_archive`` also searches rows the retention job archived.
+    ``workspace`` and ``channel`` pick the shards searched.
+    """
+
+    shards = search_targets(workspace=workspace, channel=channel)
+    response = await _search(channel, query, k, timings, include_archive, shards)
+    if settings.usage_flush_interval_seconds:
+        for match in response.matches:
+            get_usage_tracker(match.shard).record([match.id])
+    return response
+
+
+def _default_only(shards: Tuple[Shard, ...]) -> bool:
+    return len(shards) == 1 and shards[0].is_default
+
+
+async def _search(
+    channel: Optional[str],
+    query: str,
+    k: int,
+    timings: Optional[Dict[str, float]],
+    include_archive: bool,
+    shards: Tuple[Shard, ...],
+) -> SearchResponse:
+    started = time.perf_counter()
+    lexical = None if include_archive or not _default_only(shards) else get_lexical_index()
+    if lexical is not None and lexical.is_fresh:
+        identifiers = lexical_identifiers(query)
+        if identifiers and lexical.contains_all(channel, identifiers):
+            rows = lexical.search(channel=channel, query=query, k=k)
+            if timings is not None:
+                timings["search"] = round((time.perf_counter() - started) * 1000, 3)
+            return SearchResponse.model_construct(matches=[_match(row, 1.0) for row in rows])
+
+    vector = await _embed_query(query)
+    embedded = time.perf_counter()
+    response = await _search_matches(
+        channel, vector, k, query=query, include_archive=include_archive, shards=shards
+    )
+    if timings is not None:
+        timings["embed"] = round((embedded - started) * 1000, 3)
+        timings["search"] = round((time.perf_counter() - embedded) * 1000, 3)
+    return response
+
+
+async def _ndjson_matches(matches: List[Match]) -> AsyncIterator[bytes]:
+    for match in matches:
+        yield fastjson.dumps(vars(match)) + b"\n"
+
+
+@router.post("/search", response_model=SearchResponse)
+async def search_memories(payload: SearchRequest, request: Request) -> Response:
+    """Search one channel, or all of them.
+
+    Matches are serialized straight from their typed fields, without a
+    second validation pass. ``Accept: application/x-ndjson`` streams one
+    match per line instead of a ``SearchResponse`` document.
+    """
+
+    response = await _retrieve(
+        payload.channel,
+        payload.query,
+        payload.k,
+        include_archive=payload.include_archive,
+        workspace=payload.workspace,
+    )
+    if _NDJSON in request.headers.get("accept", ""):
+        return StreamingResponse(_ndjson_matches(response.matches), media_type=_NDJSON)
+    return FastJSONResponse({"matches": [vars(match) for match in response.matches]})
+
+
+def _reply_for(payload: AnswerRequest, matches: List[Match]) -> SlackReplyRequest:
+    """Turn search results into a Slack reply using the confidence policy.
+
+    Scores are cosine distances, so confidence is ``1 - score`` of the best
+    match. Below ``CONFIDENCE_MIN_DIRECT`` the reply is a follow-up.
+    """
+
+    best = matches[0] if matches else None
+    confidence = min(max(1.0 - best.score, 0.0), 1.0) if best else 0.0
+    mode = "answer" if confidence >= policy.CONFIDENCE_MIN_DIRECT else "followup"
+    references = [
+        Reference(title=clip(match.q_text, 80), url=match.source_url, memory_id=match.id, shard=match.shard)
+        for match in matches
+        if match.source_url
+    ][: policy.MAX_SOURCES]
+    if best is not None:
+        answer = clip(best.a_text, 1200)
+    else:
+        answer = "I could not find an earlier answer to this question."
+    return SlackReplyRequest(
+        channel=payload.channel,
+        thread_ts=payload.thread_ts,
+        answer=answer,
+        references=references if mode == "answer" else [],
+        mode=mode,
+        confidence=confidence,
+        memory_id=best.id if best is not None else None,
+        shard=best.shard if best is not None else None,
+    )
+
+
+@router.post("/answer", response_model=AnswerResponse)
+async def answer_question(payload: AnswerRequest) -> AnswerResponse:
+    """Embed, search, decide and post to Slack in one request.
+
+    The Slack connection is warmed up while the query is embedded and
+    searched. ``timings_ms`` reports each stage and the total.
+    """
+
+    started = time.perf_counter()
+    timings: Dict[str, float] = {}
+    warm_up = asyncio.create_task(warm_up_slack())
+
+    def _lap(stage: str, since: float) -> float:
+        now = time.perf_counter()
+        timings[stage] = round((now - since) * 1000, 3)
+        return now
+
+    try:
+        search = await _retrieve(payload.channel, payload.query, payload.k, timings, workspace=payload.workspace)
+        mark = time.perf_counter()
+        reply = _reply_for(payload, search.matches)
+        message = _build_message(reply)
+        mark = _lap("decide", mark)
+        await warm_up
+        mark = _lap("warm_up_wait", mark)
+        posted = await send_slack_reply(reply, message)
+        _lap("post", mark)
+    finally:
+        warm_up.cancel()
+    _lap("total", started)
+
+    return AnswerResponse(
+        ok=posted.ok,
+        ts=posted.ts,
+        mode=reply.mode,
+        confidence=reply.confidence,
+        match_id=search.matches[0].id if search.matches else None,
+        timings_ms=timings,
+    )
@@ -1,61 +1,62 @@
 """Slack reply endpoint."""
 from __future__ import annotations
 
-from typing import List
+from typing import Any, Dict, Union
 
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, HTTPException, Query, Response, status
 import httpx
 from loguru import logger
 
 from ..config import settings
 from ..deps import get_http_client
 from ..domain import policy
-from ..domain.schemas import SlackReplyRequest, SlackReplyResponse
+from ..domain.schemas import SlackReplyQueuedResponse, SlackReplyRequest, SlackReplyResponse
+from ..slack_outbox import OutboxFullError, get_slack_outbox, post_chat_message, slack_api_url
+from ..slack_render import render_message, truncate_words
+from ..tracing import traced
 
 router = APIRouter(prefix="/slack", tags=["slack"])
 
 
-def _build_message(payload: SlackReplyRequest) -> str:
-    words = payload.answer.split()
-    if len(words) > policy.MAX_ANSWER_WORDS:
-        trimmed = " ".join(words[: policy.MAX_ANSWER_WORDS])
+def _build_message(payload: SlackReplyRequest) -> Dict[str, Any]:
+    """The ``text`` (and with ``SLACK_REPLY_FORMAT=blocks``, ``blocks``) of a reply."""
+
+    answer, truncated = truncate_words(payload.answer, policy.MAX_ANSWER_WORDS)
+    if truncated:
         logger.warning("answer truncated to policy limit")
-    else:
-        trimmed = payload.answer
+    return render_message(payload, answer, blocks=settings.slack_reply_format == "blocks")
+
 
-    lines: List[str] = [f"[Auto-Reply] {trimmed.strip()}"]
-    refs = payload.references[: policy.MAX_SOURCES]
-    if refs:
-        lines.append("Sources:")
-        for ref in refs:
-            lines.append(f"• <{ref.url}|{ref.title}>")
+async def warm_up_slack() -> None:
+    """Open a pooled connection to Slack ahead of the first ``chat.postMessage``.
 
-    if payload.mode == "followup" and "?" not in trimmed:
-        lines.append("Clarifying question: Could you share a bit more detail?")
+    ``api.test`` needs no token; failures are ignored because the real post
+    retries the connection anyway.
+    """
 
-    lines.append(f"Confidence: {payload.confidence:.2f}")
-    return "\n".join(lines)
+    try:
+        await get_http_client("slack").post(slack_api_url("api.test"))
+    except httpx.HTTPError as exc:
+        logger.debug("slack warm-up failed: {}", exc)
 
 
-@router.post("/reply", response_model=SlackReplyResponse)
-async def post_slack_reply(payload: SlackReplyRequest) -> SlackReplyResponse:
-    message = _build_message(payload)
-    body = {
+def _message_body(payload: SlackReplyRequest, message: Dict[str, Any] | None = None) -> Dict[str, Any]:
+    body: Dict[str, Any] = {
         "channel": payload.channel,
-        "text": message,
+        **(message if message is not None else _build_message(payload)),
         "thread_ts": payload.thread_ts,
         "mrkdwn": True,
     }
     if settings.slack_post_as_user:
         body["as_user"] = True
+    return body
 
-    headers = {
-        "Authorization": f"Bearer {settings.slack_bot_token}",
-        "Content-Type": "application/json; charset=utf-8",
-    }
 
-    client = get_http_client()
-    response = await client.post("https://slack.com/api/chat.postMessage", json=body, headers=headers)
+@traced("post_slack_reply")
+async def send_slack_reply(payload: SlackReplyRequest, message: Dict[str, Any] | None = None) -> SlackReplyResponse:
+    """Post ``payload`` (or a pre-rendered ``message``) to its Slack thread."""
+
+    response = await post_chat_message(_message_body(payload, message))
 
     if response.status_code == status.HTTP_429_TOO_MANY_REQUESTS:
         retry_after = response.headers.get("Retry-After", "1")
@@ -76,3 +77,25 @@ async def post_slack_reply(payload: SlackReplyRequest) -> SlackReplyResponse:
         raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail="Slack API rejected the message")
 
     return SlackReplyResponse(ok=True, ts=data.get("ts", payload.thread_ts))
+
+
+@router.post("/reply", response_model=Union[SlackReplyResponse, SlackReplyQueuedResponse])
+async def post_slack_reply(
+    payload: SlackReplyRequest,
+    response: Response,
+    enqueue: bool = Query(default=False, alias="async"),
+) -> Union[SlackReplyResponse, SlackReplyQueuedResponse]:
+    """Post a reply now, or with ``?async=true`` hand it to the outbox and return 202."""
+
+    if not enqueue:
+        return await send_slack_reply(payload)
+    try:
+        message_id = await get_slack_outbox().enqueue(_message_body(payload))
+    except OutboxFullError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(exc),
+            headers={"Retry-After": "5"},
+        ) from exc
+    response.status_code = status.HTTP_202_ACCEPTED
+    return SlackReplyQueuedResponse(ok=True, message_id=message_id)
@@ -0,0 +1,163 @@
+"""Slack Events API and interactivity receivers."""
+from __future__ import annotations
+
+import json
+from typing import Any, Dict, Optional
+from urllib.parse import parse_qs
+
+from fastapi import APIRouter, HTTPException, Request, status
+from loguru import logger
+
+from ..config import settings
+from ..deps import get_usage_tracker
+from ..domain.schemas import AnswerRequest
+from ..sharding import all_shards
+from ..slack_events import EventDeduper, EventWorkerPool, verify_slack_signature
+from ..slack_outbox import get_slack_outbox
+from ..slack_render import ACTION_HELPFUL, ACTION_NOT_HELPFUL, parse_action
+from .memory import _reply_for, _retrieve
+from .slack import _message_body
+
+router = APIRouter(prefix="/slack", tags=["slack"])
+
+_pool: Optional[EventWorkerPool] = None
+_deduper: Optional[EventDeduper] = None
+
+
+async def _answer_message(event: Dict[str, Any]) -> None:
+    """Embed the message, search its channel and queue a threaded reply."""
+
+    request = AnswerRequest(
+        channel=event["channel"],
+        thread_ts=event.get("thread_ts") or event["ts"],
+        query=event["text"],
+        workspace=event.get("workspace"),
+    )
+    search = await _retrieve(request.channel, request.query, request.k, workspace=request.workspace)
+    if not search.matches:
+        logger.debug("no memories for slack message in {}", request.channel)
+        return
+    reply = _reply_for(request, search.matches)
+    await get_slack_outbox().enqueue(_message_body(reply))
+
+
+def get_slack_event_pool() -> EventWorkerPool:
+    global _pool
+    if _pool is None:
+        _pool = EventWorkerPool(
+            handler=_answer_message,
+            workers=settings.slack_events_workers,
+            queue_size=settings.slack_events_queue_size,
+            drop_policy=settings.slack_events_drop_policy,
+        )
+    return _pool
+
+
+def _get_deduper() -> EventDeduper:
+    global _deduper
+    if _deduper is None:
+        _deduper = EventDeduper(window_seconds=settings.slack_events_dedup_seconds)
+    return _deduper
+
+
+async def shutdown_slack_event_pool() -> None:
+    global _pool
+    if _pool is not None:
+        await _pool.aclose()
+        _pool = None
+
+
+def _is_answerable(event: Dict[str, Any]) -> bool:
+    # Skip edits, joins and bot posts (including our own replies).
+    return (
+        event.get("type") == "message"
+        and not event.get("subtype")
+        and not event.get("bot_id")
+        and bool(event.get("text", "").strip())
+        and bool(event.get("channel"))
+        and bool(event.get("ts"))
+    )
+
+
+async def _verified_body(request: Request) -> bytes:
+    if not settings.slack_signing_secret:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Slack events are not configured")
+    body = await request.body()
+    if not verify_slack_signature(
+        secret=settings.slack_signing_secret,
+        timestamp=request.headers.get("X-Slack-Request-Timestamp"),
+        signature=request.headers.get("X-Slack-Signature"),
+        body=body,
+    ):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid Slack signature")
+    return body
+
+
+@router.post("/events")
+async def slack_events(request: Request) -> Dict[str, Any]:
+    """Verify, ack and queue Slack events; answering happens in the worker pool."""
+
+    body = await _verified_body(request)
+
+    try:
+        payload = json.loads(body)
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid JSON body") from exc
+
+    if payload.get("type") == "url_verification":
+        return {"challenge": payload.get("challenge", "")}
+    if payload.get("type") != "event_callback":
+        return {"ok": True}
+
+    pool = get_slack_event_pool()
+    event_id = payload.get("event_id")
+    if event_id and _get_deduper().seen(event_id):
+        pool.counters["duplicates"] += 1
+        return {"ok": True}
+
+    event = payload.get("event") or {}
+    if _is_answerable(event):
+        # The installing workspace, not the poster's team (they differ in shared channels), picks the shard.
+        pool.submit({**event, "workspace": payload.get("team_id") or event.get("team")})
+    return {"ok": True}
+
+
+def _feedback_hits(kind: str) -> int:
+    if kind == ACTION_HELPFUL:
+        return settings.slack_feedback_hits
+    if kind == ACTION_NOT_HELPFUL:
+        return -settings.slack_feedback_hits
+    return 1  # a click on a source link counts like the memory being returned once more
+
+
+@router.post("/interactions")
+async def slack_interactions(request: Request) -> Dict[str, Any]:
+    """Turn clicks on reply buttons into usage counts that feed ranking.
+
+    Counts go through the same per-shard trackers as search hits, so they
+    only take effect with ``USAGE_FLUSH_INTERVAL_SECONDS`` set. A user's
+    repeated clicks on one button of one message are counted once.
+    """
+
+    body = await _verified_body(request)
+    try:
+        payload = json.loads(parse_qs(body.decode("utf-8"))["payload"][0])
+    except (KeyError, UnicodeDecodeError, ValueError) as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid interaction payload") from exc
+
+    if payload.get("type") != "block_actions" or not settings.usage_flush_interval_seconds:
+        return {"ok": True}
+    user = (payload.get("user") or {}).get("id", "")
+    message_ts = (payload.get("container") or {}).get("message_ts", "")
+    for action in payload.get("actions") or []:
+        parsed = parse_action(action)
+        if parsed is None:
+            continue
+        kind, shard, memory_id = parsed
+        if shard is not None and shard not in all_shards():
+            logger.warning("feedback for unknown shard {}", shard)
+            continue
+        if _get_deduper().seen(f"{user}:{message_ts}:{action.get('action_id')}"):
+            continue
+        get_usage_tracker(shard).add_feedback(memory_id, _feedback_hits(kind))
+    return {"ok": True}
@@ -0,0 +1,138 @@
+"""Search result cache keyed on query embeddings instead of query text."""
+from __future__ import annotations
+
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+import itertools
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .domain.schemas import SearchResponse
+
+BucketKey = Tuple[Optional[str], int]
+
+
+@dataclass
+class SemanticCacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    expirations: int = 0
+    invalidations: int = 0
+
+    def as_dict(self) -> Dict[str, Any]:
+        data: Dict[str, Any] = asdict(self)
+        lookups = self.hits + self.misses
+        data["hit_rate"] = self.hits / lookups if lookups else 0.0
+        return data
+
+
+class _Bucket:
+    """Entries for one ``(channel, k)`` pair with a lazily stacked vector matrix."""
+
+    __slots__ = ("entries", "_matrix", "_order")
+
+    def __init__(self) -> None:
+        self.entries: Dict[int, Tuple[np.ndarray, SearchResponse, float]] = {}
+        self._matrix: Optional[np.ndarray] = None
+        self._order: List[int] = []
+
+    def put(self, entry_id: int, vector: np.ndarray, response: SearchResponse, created: float) -> None:
+        self.entries[entry_id] = (vector, response, created)
+        self._matrix = None
+
+    def drop(self, entry_id: int) -> None:
+        self.entries.pop(entry_id, None)
+        self._matrix = None
+
+    def nearest(self, query: np.ndarray) -> Tuple[Optional[int], float]:
+        if not self.entries:
+            return None, -1.0
+        if self._matrix is None:
+            self._order = list(self.entries)
+            self._matrix = np.stack([self.entries[entry_id][0] for entry_id in self._order])
+        similarities = self._matrix @ query
+        best = int(np.argmax(similarities))
+        return self._order[best], float(similarities[best])
+
+
+class SemanticCache:
+    """Return a cached ``SearchResponse`` for near-duplicate queries.
+
+    A lookup hits when a live entry for the same channel and ``k`` has cosine
+    similarity of at least ``min_similarity`` to the query vector. Entries
+    expire after ``ttl_seconds``, the oldest are evicted beyond
+    ``max_entries``, and writes to a channel invalidate its entries (and the
+    all-channel entries, which may now be missing the new row).
+    """
+
+    def __init__(self, *, max_entries: int, ttl_seconds: float, min_similarity: float) -> None:
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.min_similarity = min_similarity
+        self.stats = SemanticCacheStats()
+        self._buckets: Dict[BucketKey, _Bucket] = {}
+        self._age: "OrderedDict[int, BucketKey]" = OrderedDict()
+        self._ids = itertools.count()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def __len__(self) -> int:
+        return len(self._age)
+
+    @staticmethod
+    def _normalize(vector: List[float]) -> np.ndarray:
+        array = np.asarray(vector, dtype=np.float32)
+        norm = float(np.linalg.norm(array))
+        return array / norm if norm else array
+
+    def lookup(self, *, channel: Optional[str], k: int, vector: List[float]) -> Optional[SearchResponse]:
+        bucket = self._buckets.get((channel, k))
+        if bucket is not None:
+            entry_id, similarity = bucket.nearest(self._normalize(vector))
+            if entry_id is not None and similarity >= self.min_similarity:
+                _, response, created = bucket.entries[entry_id]
+                if self.ttl_seconds <= 0 or time.monotonic() - created <= self.ttl_seconds:
+                    self.stats.hits += 1
+                    return response
+                self._remove(entry_id)
+                self.stats.expirations += 1
+        self.stats.misses += 1
+        return None
+
+    def store(self, *, channel: Optional[str], k: int, vector: List[float], response: SearchResponse) -> None:
+        if not self.enabled:
+            return
+        key = (channel, k)
+        entry_id = next(self._ids)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = _Bucket()
+        bucket.put(entry_id, self._normalize(vector), response, time.monotonic())
+        self._age[entry_id] = key
+        while len(self._age) > self.max_entries:
+            self._remove(next(iter(self._age)))
+            self.stats.evictions += 1
+
+    def invalidate(self, channel: Optional[str]) -> None:
+        """Drop entries that a write to ``channel`` could have changed."""
+
+        for key in [key for key in self._buckets if key[0] is None or key[0] == channel]:
+            bucket = self._buckets.pop(key)
+            for entry_id in bucket.entries:
+                self._age.pop(entry_id, None)
+            self.stats.invalidations += len(bucket.entries)
+
+    def _remove(self, entry_id: int) -> None:
+        key = self._age.pop(entry_id, None)
+        if key is None:
+            return
+        bucket = self._buckets.get(key)
+        if bucket is not None:
+            bucket.drop(entry_id)
+            if not bucket.entries:
+                del self._buckets[key]
@@ -0,0 +1,133 @@
+"""Production entrypoint: a pre-forking supervisor around ``WEB_CONCURRENCY`` uvicorn workers.
+
+    python -m app.serve --host 0.0.0.0 --port 8080
+
+The parent imports the application and loads heavy read-mostly state once
+(the local index snapshot plus a first sync of both replicas), freezes it
+out of the garbage collector's reach and then forks. Workers share those
+pages copy-on-write and accept from one listening socket; a worker that
+dies is re-forked from the same warm parent. Each worker gets
+``APP_WORKER_INDEX`` so files only one process may write (outbox journal,
+trace export) are kept per worker, and its outbound pool is its share of
+``HTTP_CONNECTION_BUDGET``.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import gc
+import os
+import signal
+import socket
+import time
+from typing import Dict, Optional
+
+from loguru import logger
+import uvicorn
+
+from .config import settings
+from .deps import DESTINATIONS, get_lexical_index, get_local_index, http_limits, shutdown_dependencies
+from .main import app
+from .supa import sync_local_index
+
+# Room for rows synced after the fork, so appends dirty only the tail pages.
+_PRELOAD_HEADROOM = 0.25
+_RESPAWN_BACKOFF_SECONDS = 1.0
+
+
+async def _preload() -> None:
+    try:
+        for replica, name in ((get_local_index(), "local index"), (get_lexical_index(), "lexical index")):
+            if replica is None:
+                continue
+            try:
+                added = await sync_local_index(replica)
+                logger.info("preloaded {} with {} rows ({} synced)", name, len(replica), added)
+            except Exception as exc:
+                logger.warning("{} preload sync failed, workers will retry: {}", name, exc)
+        index = get_local_index()
+        if index is not None:
+            index.reserve(_PRELOAD_HEADROOM)
+    finally:
+        # The client and its sockets belong to this loop; workers open their own.
+        await shutdown_dependencies()
+
+
+def _bind(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _spawn(index: int, sock: socket.socket, args: argparse.Namespace) -> int:
+    pid = os.fork()
+    if pid:
+        return pid
+    status = 0
+    try:
+        os.environ["APP_WORKER_INDEX"] = str(index)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        config = uvicorn.Config(app, log_level=args.log_level, proxy_headers=True, lifespan="on")
+        uvicorn.Server(config).run(sockets=[sock])
+    except BaseException:
+        logger.exception("worker {} crashed", index)
+        status = 1
+    finally:
+        os._exit(status)
+
+
+def serve(args: argparse.Namespace) -> None:
+    workers = settings.web_concurrency
+    logger.info(
+        "starting {} workers with {} outbound connections each",
+        workers,
+        sum(http_limits(destination).max_connections for destination in DESTINATIONS),
+    )
+    asyncio.run(_preload())
+    sock = _bind(args.host, args.port)
+    gc.freeze()
+
+    children: Dict[int, int] = {}
+    stopping = False
+
+    def _stop(signum: int, _frame: object) -> None:
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signum)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, _stop)
+    signal.signal(signal.SIGINT, _stop)
+    for index in range(workers):
+        children[_spawn(index, sock, args)] = index
+
+    last_respawn: Optional[float] = None
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        index = children.pop(pid, None)
+        if index is None or stopping:
+            continue
+        logger.warning("worker {} (pid {}) exited with status {}; restarting", index, pid, status)
+        if last_respawn is not None and time.monotonic() - last_respawn < _RESPAWN_BACKOFF_SECONDS:
+            time.sleep(_RESPAWN_BACKOFF_SECONDS)
+        last_respawn = time.monotonic()
+        children[_spawn(index, sock, args)] = index
+    sock.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=settings.port)
+    parser.add_argument("--log-level", default=settings.log_level.lower())
+    serve(parser.parse_args())
@@ -0,0 +1,166 @@
+"""Tenancy: route each request to a Supabase shard by channel or workspace.
+
+A shard is a Supabase project plus the table and functions memories live
+in. The ``default`` shard is the ``SUPABASE_*`` settings; ``SUPABASE_SHARDS``
+(a JSON list) adds more, each overriding only what differs from the default:
+
+    [{"name": "acme", "url": "https://acme.supabase.co", "service_role_key_env": "ACME_KEY"},
+     {"name": "acme2", "table": "kb_acme2", "search_function": "match_acme2"}]
+
+``SHARD_ROUTES`` maps channel or workspace IDs to a group of shards
+(``T0123=acme|acme2,C0456=acme``); a channel route wins over its
+workspace's. Within a group a channel always lands on the same shard
+(crc32 of the channel ID), so writes and channel searches touch one shard
+and a search without a channel scatters across the group. Anything
+unrouted stays on ``default``.
+
+The shard a request was routed to is kept in a ``ContextVar`` (like the
+current span in ``app.tracing``), so ``app.supa`` reads it instead of every
+data access function growing a parameter.
+"""
+from __future__ import annotations
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+import json
+import os
+from typing import Any, Dict, Iterator, Optional, Tuple
+import zlib
+
+from .config import AppConfig, settings
+
+DEFAULT_SHARD = "default"
+
+
+@dataclass(frozen=True)
+class Shard:
+    name: str
+    url: str
+    service_role_key: str
+    schema: str
+    table: str
+    search_function: str
+    archive_table: str
+    archive_search_function: str
+    usage_function: str
+    reindex_function: str
+
+    @property
+    def is_default(self) -> bool:
+        return self.name == DEFAULT_SHARD
+
+    @property
+    def client_key(self) -> Optional[str]:
+        """Name for per-shard pools, caches and counters; ``None`` keeps the default shard's unsuffixed ones."""
+
+        return None if self.is_default else self.name
+
+    def rest_url(self, path: str) -> str:
+        return f"{self.url.rstrip('/')}/rest/v1/{path}"
+
+
+def _default_shard(config: AppConfig) -> Shard:
+    return Shard(
+        name=DEFAULT_SHARD,
+        url=str(config.supabase_url),
+        service_role_key=config.supabase_service_role_key,
+        schema=config.supabase_schema,
+        table=config.supabase_table,
+        search_function=config.supabase_search_function,
+        archive_table=config.supabase_archive_table,
+        archive_search_function=config.supabase_archive_search_function,
+        usage_function=config.supabase_usage_function,
+        reindex_function=config.supabase_reindex_function,
+    )
+
+
+def _shard_from(spec: Dict[str, Any], default: Shard) -> Shard:
+    fields = dict(spec)
+    name = fields.pop("name", None)
+    if not name or name == DEFAULT_SHARD:
+        raise ValueError(f"SUPABASE_SHARDS entry needs a name other than {DEFAULT_SHARD!r}: {spec}")
+    key_env = fields.pop("service_role_key_env", None)
+    if key_env:
+        fields["service_role_key"] = os.environ.get(key_env) or ""
+        if not fields["service_role_key"]:
+            raise ValueError(f"shard {name}: {key_env} is not set")
+    unknown = set(fields) - set(Shard.__dataclass_fields__)
+    if unknown:
+        raise ValueError(f"shard {name}: unknown fields {sorted(unknown)}")
+    return Shard(**{**vars(default), **fields, "name": name})
+
+
+_Topology = Tuple[Dict[str, Shard], Dict[str, Tuple[Shard, ...]]]
+_parsed: Optional[Tuple[AppConfig, _Topology]] = None
+
+
+def _topology() -> _Topology:
+    global _parsed
+    if _parsed is None or _parsed[0] is not settings:
+        default = _default_shard(settings)
+        shards = {DEFAULT_SHARD: default}
+        for spec in json.loads(settings.supabase_shards or "[]"):
+            shard = _shard_from(spec, default)
+            shards[shard.name] = shard
+        routes: Dict[str, Tuple[Shard, ...]] = {}
+        for item in settings.shard_routes.split(","):
+            key, _, names = item.partition("=")
+            if not key.strip() or not names.strip():
+                continue
+            try:
+                routes[key.strip()] = tuple(shards[name.strip()] for name in names.split("|"))
+            except KeyError as exc:
+                raise ValueError(f"SHARD_ROUTES names unknown shard {exc}") from None
+        _parsed = (settings, (shards, routes))
+    return _parsed[1]
+
+
+def all_shards() -> Dict[str, Shard]:
+    return _topology()[0]
+
+
+def get_shard(name: Optional[str] = None) -> Shard:
+    """The shard called ``name`` (``None`` is the default); ``KeyError`` when none is configured."""
+
+    return all_shards()[name or DEFAULT_SHARD]
+
+
+def shard_group(*, workspace: Optional[str], channel: Optional[str]) -> Tuple[Shard, ...]:
+    routes = _topology()[1]
+    return routes.get(channel or "") or routes.get(workspace or "") or (get_shard(),)
+
+
+def route(*, workspace: Optional[str], channel: Optional[str]) -> Shard:
+    """The one shard that stores ``channel``'s memories."""
+
+    group = shard_group(workspace=workspace, channel=channel)
+    if len(group) == 1 or not channel:
+        return group[0]
+    return group[zlib.crc32(channel.encode("utf-8")) % len(group)]
+
+
+def search_targets(*, workspace: Optional[str], channel: Optional[str]) -> Tuple[Shard, ...]:
+    """Shards a search must ask: the channel's shard, or its whole group without a channel."""
+
+    if channel:
+        return (route(workspace=workspace, channel=channel),)
+    return shard_group(workspace=workspace, channel=None)
+
+
+_current_shard: ContextVar[Optional[Shard]] = ContextVar("current_shard", default=None)
+
+
+def current_shard() -> Shard:
+    return _current_shard.get() or get_shard()
+
+
+@contextmanager
+def using_shard(shard: Shard) -> Iterator[Shard]:
+    """Route data access inside the block (and tasks it spawns) to ``shard``."""
+
+    token = _current_shard.set(shard)
+    try:
+        yield shard
+    finally:
+        _current_shard.reset(token)
@@ -0,0 +1,147 @@
+"""Slack Events API helpers: signature checks, dedup and a bounded worker pool."""
+from __future__ import annotations
+
+import asyncio
+from collections import OrderedDict
+import hashlib
+import hmac
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from loguru import logger
+
+from .metrics import LATENCY_BUCKETS_SECONDS, Histogram
+
+EventHandler = Callable[[Dict[str, Any]], Awaitable[None]]
+
+SIGNATURE_TOLERANCE_SECONDS = 300
+
+
+def verify_slack_signature(
+    *,
+    secret: str,
+    timestamp: Optional[str],
+    signature: Optional[str],
+    body: bytes,
+    now: Optional[float] = None,
+) -> bool:
+    """Check ``X-Slack-Signature`` (v0 HMAC-SHA256) and reject replayed timestamps."""
+
+    if not timestamp or not signature:
+        return False
+    try:
+        sent = int(timestamp)
+    except ValueError:
+        return False
+    if abs((now if now is not None else time.time()) - sent) > SIGNATURE_TOLERANCE_SECONDS:
+        return False
+    base = b"v0:" + timestamp.encode("ascii") + b":" + body
+    expected = "v0=" + hmac.new(secret.encode("utf-8"), base, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, signature)
+
+
+class EventDeduper:
+    """Remember event ids for ``window_seconds`` so Slack retries are dropped."""
+
+    def __init__(self, *, window_seconds: float, max_entries: int = 100_000) -> None:
+        self.window_seconds = window_seconds
+        self.max_entries = max_entries
+        self._seen: "OrderedDict[str, float]" = OrderedDict()
+
+    def seen(self, event_id: str) -> bool:
+        """Return ``True`` for a duplicate; otherwise record ``event_id``."""
+
+        now = time.monotonic()
+        while self._seen:
+            oldest, seen_at = next(iter(self._seen.items()))
+            if now - seen_at <= self.window_seconds and len(self._seen) < self.max_entries:
+                break
+            del self._seen[oldest]
+        if event_id in self._seen:
+            return True
+        self._seen[event_id] = now
+        return False
+
+
+class EventWorkerPool:
+    """Run ``handler`` for queued events on ``workers`` tasks.
+
+    The queue holds at most ``queue_size`` events. When it is full,
+    ``drop_newest`` rejects the incoming event and ``drop_oldest`` discards
+    the longest-waiting one to make room; either way the HTTP ack is never
+    delayed. Workers start on the first ``submit``.
+    """
+
+    def __init__(self, *, handler: EventHandler, workers: int, queue_size: int, drop_policy: str) -> None:
+        if drop_policy not in {"drop_newest", "drop_oldest"}:
+            raise ValueError(f"unknown drop policy {drop_policy!r}")
+        self._handler = handler
+        self.workers = workers
+        self.queue_size = queue_size
+        self.drop_policy = drop_policy
+        self._queue: Optional[asyncio.Queue[Tuple[float, Dict[str, Any]]]] = None
+        self._tasks: List[asyncio.Task[None]] = []
+        self.counters: Dict[str, int] = {"accepted": 0, "processed": 0, "failed": 0, "dropped": 0, "duplicates": 0}
+        self.queue_latency = Histogram(LATENCY_BUCKETS_SECONDS)
+        self.handler_latency = Histogram(LATENCY_BUCKETS_SECONDS)
+
+    def _start(self) -> asyncio.Queue[Tuple[float, Dict[str, Any]]]:
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.queue_size)
+            self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+        return self._queue
+
+    def submit(self, event: Dict[str, Any]) -> bool:
+        """Queue an event without waiting; returns ``False`` if it was dropped."""
+
+        queue = self._start()
+        if queue.full():
+            self.counters["dropped"] += 1
+            if self.drop_policy == "drop_newest":
+                logger.warning("slack event queue full; dropping incoming event")
+                return False
+            queue.get_nowait()
+            queue.task_done()
+            logger.warning("slack event queue full; dropping oldest event")
+        queue.put_nowait((time.monotonic(), event))
+        self.counters["accepted"] += 1
+        return True
+
+    async def _work(self) -> None:
+        assert self._queue is not None
+        while True:
+            enqueued, event = await self._queue.get()
+            started = time.monotonic()
+            self.queue_latency.observe(started - enqueued)
+            try:
+                await self._handler(event)
+                self.counters["processed"] += 1
+            except Exception:
+                self.counters["failed"] += 1
+                logger.exception("slack event handler failed")
+            finally:
+                self.handler_latency.observe(time.monotonic() - started)
+                self._queue.task_done()
+
+    async def join(self) -> None:
+        """Wait until every queued event has been handled."""
+
+        if self._queue is not None:
+            await self._queue.join()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.counters,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "workers": self.workers,
+            "queue_latency_seconds": self.queue_latency.snapshot(),
+            "handler_latency_seconds": self.handler_latency.snapshot(),
+        }
+
+    async def aclose(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
@@ -0,0 +1,378 @@
+"""Durable, rate-limited outbound queue for Slack ``chat.postMessage`` calls."""
+from __future__ import annotations
+
+import asyncio
+from collections import deque
+from dataclasses import dataclass
+import json
+import random
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Deque, Dict, List, Optional, Set
+
+import httpx
+from loguru import logger
+
+from .config import settings, worker_scoped_path
+from .deps import get_http_client
+from .metrics import LATENCY_BUCKETS_SECONDS, Histogram
+
+if TYPE_CHECKING:
+    import sqlite3
+
+PostMessage = Callable[[Dict[str, Any]], Awaitable[httpx.Response]]
+
+_outbox: Optional["SlackOutbox"] = None
+
+
+class OutboxFullError(RuntimeError):
+    """Raised when the outbox already holds ``max_depth`` messages."""
+
+
+def slack_api_url(method: str) -> str:
+    return f"{settings.slack_api_url}/{method}"
+
+
+async def post_chat_message(body: Dict[str, Any]) -> httpx.Response:
+    """Send one ``chat.postMessage`` call with the bot token."""
+
+    headers = {
+        "Authorization": f"Bearer {settings.slack_bot_token}",
+        "Content-Type": "application/json; charset=utf-8",
+    }
+    return await get_http_client("slack").post(slack_api_url("chat.postMessage"), json=body, headers=headers)
+
+
+class TokenBucket:
+    """Classic token bucket: ``rate`` tokens per second, up to ``capacity``."""
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now: float) -> float:
+        """Seconds until one token is available (``0`` if it is now)."""
+
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self, now: float) -> None:
+        self._refill(now)
+        self.tokens -= 1
+
+    def full(self, now: float) -> bool:
+        self._refill(now)
+        return self.tokens >= self.capacity
+
+
+@dataclass
+class OutboxMessage:
+    id: int
+    channel: str
+    body: Dict[str, Any]
+    attempts: int = 0
+    not_before: float = 0.0
+    created: float = 0.0
+
+
+class SlackOutbox:
+    """Per-channel FIFO queues drained within Slack's rate limits.
+
+    Each channel has its own token bucket (Slack allows about one message
+    per second per channel) and all channels share a method-wide bucket.
+    Only one message per channel is in flight, so replies stay in order.
+    A 429 parks the channel's head message until ``Retry-After`` has passed;
+    network errors and 5xx responses retry with jittered exponential
+    backoff until ``max_attempts``. With a ``path``, messages are journaled
+    to SQLite before ``enqueue`` returns and reloaded by ``start``, so a
+    restart resumes delivery (at-least-once).
+    """
+
+    def __init__(
+        self,
+        *,
+        post: PostMessage,
+        path: Optional[str] = None,
+        channel_rate: float = 1.0,
+        channel_burst: float = 3.0,
+        method_rate_per_minute: float = 300.0,
+        concurrency: int = 8,
+        max_depth: int = 10000,
+        max_attempts: int = 8,
+        retry_base_seconds: float = 1.0,
+        retry_max_seconds: float = 60.0,
+    ) -> None:
+        self._post = post
+        self.channel_rate = channel_rate
+        self.channel_burst = channel_burst
+        self.concurrency = concurrency
+        self.max_depth = max_depth
+        self.max_attempts = max_attempts
+        self.retry_base_seconds = retry_base_seconds
+        self.retry_max_seconds = retry_max_seconds
+        self._method_bucket = TokenBucket(method_rate_per_minute / 60.0, max(1.0, method_rate_per_minute / 60.0))
+        self._channel_buckets: Dict[str, TokenBucket] = {}
+        self._queues: Dict[str, Deque[OutboxMessage]] = {}
+        self._sending: Set[str] = set()
+        self._tasks: Set[asyncio.Task[None]] = set()
+        self._wake: Optional[asyncio.Event] = None
+        self._worker: Optional[asyncio.Task[None]] = None
+        self._next_id = 1
+        self._sent_times: Deque[float] = deque()
+        self.counters: Dict[str, int] = {"enqueued": 0, "sent": 0, "retried": 0, "failed": 0, "rate_limited": 0}
+        self.delivery_latency = Histogram(LATENCY_BUCKETS_SECONDS + (30.0, 60.0, 300.0))
+        self._db_lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._loaded = path is None
+        if path:
+            import sqlite3  # only needed with a configured file
+
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS outbox ("
+                "id INTEGER PRIMARY KEY, channel TEXT NOT NULL, body TEXT NOT NULL, "
+                "attempts INTEGER NOT NULL, not_before REAL NOT NULL, created REAL NOT NULL)"
+            )
+            self._db.commit()
+
+    @property
+    def depth(self) -> int:
+        return sum(len(queue) for queue in self._queues.values()) + len(self._sending)
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        while self._sent_times and now - self._sent_times[0] > 60:
+            self._sent_times.popleft()
+        return {
+            **self.counters,
+            "depth": self.depth,
+            "in_flight": len(self._sending),
+            "channels": len(self._queues),
+            "drain_rate_per_second": len(self._sent_times) / 60.0,
+            "delivery_latency_seconds": self.delivery_latency.snapshot(),
+        }
+
+    async def start(self) -> None:
+        """Reload journaled messages and start the drain loop."""
+
+        if not self._loaded:
+            self._loaded = True
+            rows = await asyncio.to_thread(self._journal_load)
+            for row_id, channel, body, attempts, not_before, created in rows:
+                self._queues.setdefault(channel, deque()).append(
+                    OutboxMessage(row_id, channel, json.loads(body), attempts, not_before, created)
+                )
+                self._next_id = max(self._next_id, row_id + 1)
+            if rows:
+                logger.info("slack outbox resumed {} pending messages", len(rows))
+        if self._worker is None or self._worker.done():
+            self._wake = asyncio.Event()
+            self._worker = asyncio.create_task(self._drain())
+
+    async def enqueue(self, body: Dict[str, Any]) -> int:
+        """Persist a ``chat.postMessage`` body and return its outbox id."""
+
+        await self.start()
+        if self.depth >= self.max_depth:
+            raise OutboxFullError(f"slack outbox is full ({self.max_depth} messages)")
+        message = OutboxMessage(self._next_id, body["channel"], body, created=time.time())
+        self._next_id += 1
+        if self._db is not None:
+            await asyncio.to_thread(self._journal_insert, message)
+        self._queues.setdefault(message.channel, deque()).append(message)
+        self.counters["enqueued"] += 1
+        self._notify()
+        return message.id
+
+    def _notify(self) -> None:
+        if self._wake is not None:
+            self._wake.set()
+
+    def _channel_bucket(self, channel: str) -> TokenBucket:
+        bucket = self._channel_buckets.get(channel)
+        if bucket is None:
+            bucket = self._channel_buckets[channel] = TokenBucket(self.channel_rate, self.channel_burst)
+        return bucket
+
+    async def _drain(self) -> None:
+        assert self._wake is not None
+        while True:
+            self._wake.clear()
+            delay: Optional[float] = None
+            for channel, queue in list(self._queues.items()):
+                if not queue:
+                    if channel not in self._sending:
+                        del self._queues[channel]
+                    continue
+                if channel in self._sending:
+                    continue
+                if len(self._sending) >= self.concurrency:
+                    break
+                now = time.monotonic()
+                bucket = self._channel_bucket(channel)
+                wait = max(
+                    queue[0].not_before - time.time(),
+                    bucket.wait_time(now),
+                    self._method_bucket.wait_time(now),
+                )
+                if wait > 0:
+                    delay = wait if delay is None else min(delay, wait)
+                    continue
+                bucket.take(now)
+                self._method_bucket.take(now)
+                self._sending.add(channel)
+                task = asyncio.create_task(self._deliver(queue.popleft()))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+            now = time.monotonic()
+            for channel in [c for c, b in self._channel_buckets.items() if c not in self._queues and b.full(now)]:
+                del self._channel_buckets[channel]
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _deliver(self, message: OutboxMessage) -> None:
+        try:
+            try:
+                response = await self._post(message.body)
+            except httpx.HTTPError as exc:
+                await self._retry(message, None, f"network error: {exc}")
+                return
+            if response.status_code == 429:
+                self.counters["rate_limited"] += 1
+                await self._retry(message, _retry_after(response), "rate limited")
+            elif response.status_code >= 500:
+                await self._retry(message, None, f"HTTP {response.status_code}")
+            elif response.status_code >= 400:
+                await self._fail(message, f"HTTP {response.status_code}")
+            else:
+                data = response.json()
+                if data.get("ok"):
+                    await self._done(message)
+                elif data.get("error") == "ratelimited":
+                    self.counters["rate_limited"] += 1
+                    await self._retry(message, _retry_after(response), "rate limited")
+                else:
+                    await self._fail(message, str(data.get("error")))
+        finally:
+            self._sending.discard(message.channel)
+            self._notify()
+
+    async def _done(self, message: OutboxMessage) -> None:
+        self.counters["sent"] += 1
+        self._sent_times.append(time.monotonic())
+        self.delivery_latency.observe(max(0.0, time.time() - message.created))
+        if self._db is not None:
+            await asyncio.to_thread(self._journal_delete, message.id)
+
+    async def _fail(self, message: OutboxMessage, reason: str) -> None:
+        self.counters["failed"] += 1
+        logger.error("dropping slack message {} for {}: {}", message.id, message.channel, reason)
+        if self._db is not None:
+            await asyncio.to_thread(self._journal_delete, message.id)
+
+    async def _retry(self, message: OutboxMessage, retry_after: Optional[float], reason: str) -> None:
+        message.attempts += 1
+        if message.attempts >= self.max_attempts:
+            await self._fail(message, f"{reason} after {message.attempts} attempts")
+            return
+        if retry_after is None:
+            backoff = min(self.retry_max_seconds, self.retry_base_seconds * 2 ** (message.attempts - 1))
+            retry_after = random.uniform(backoff / 2, backoff)
+        message.not_before = time.time() + retry_after
+        self.counters["retried"] += 1
+        logger.warning("slack message {} retrying in {:.1f}s: {}", message.id, retry_after, reason)
+        if self._db is not None:
+            await asyncio.to_thread(self._journal_update, message)
+        # Back at the head of its channel so later replies wait behind it.
+        self._queues.setdefault(message.channel, deque()).appendleft(message)
+
+    def _journal_load(self) -> List[tuple]:
+        with self._db_lock:
+            if self._db is None:
+                return []
+            return self._db.execute(
+                "SELECT id, channel, body, attempts, not_before, created FROM outbox ORDER BY id"
+            ).fetchall()
+
+    def _journal_insert(self, message: OutboxMessage) -> None:
+        with self._db_lock:
+            if self._db is None:
+                return
+            self._db.execute(
+                "INSERT INTO outbox (id, channel, body, attempts, not_before, created) VALUES (?, ?, ?, ?, ?, ?)",
+                (message.id, message.channel, json.dumps(message.body), 0, 0.0, message.created),
+            )
+            self._db.commit()
+
+    def _journal_update(self, message: OutboxMessage) -> None:
+        with self._db_lock:
+            if self._db is None:
+                return
+            self._db.execute(
+                "UPDATE outbox SET attempts = ?, not_before = ? WHERE id = ?",
+                (message.attempts, message.not_before, message.id),
+            )
+            self._db.commit()
+
+    def _journal_delete(self, message_id: int) -> None:
+        with self._db_lock:
+            if self._db is None:
+                return
+            self._db.execute("DELETE FROM outbox WHERE id = ?", (message_id,))
+            self._db.commit()
+
+    async def aclose(self) -> None:
+        """Stop draining; undelivered journaled messages resume on the next start."""
+
+        if self._worker is not None:
+            self._worker.cancel()
+            self._worker = None
+        for task in list(self._tasks):
+            task.cancel()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        with self._db_lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+def _retry_after(response: httpx.Response) -> float:
+    try:
+        return max(0.0, float(response.headers.get("Retry-After", "1")))
+    except ValueError:
+        return 1.0
+
+
+def get_slack_outbox() -> SlackOutbox:
+    """Return the shared Slack outbox."""
+
+    global _outbox
+    if _outbox is None:
+        _outbox = SlackOutbox(
+            post=post_chat_message,
+            path=worker_scoped_path(settings.slack_outbox_path) if settings.slack_outbox_path else None,
+            channel_rate=settings.slack_channel_rate_per_second,
+            channel_burst=settings.slack_channel_burst,
+            method_rate_per_minute=settings.slack_method_rate_per_minute,
+            concurrency=settings.slack_outbox_concurrency,
+            max_depth=settings.slack_outbox_max_depth,
+            max_attempts=settings.slack_outbox_max_attempts,
+        )
+    return _outbox
+
+
+async def shutdown_slack_outbox() -> None:
+    global _outbox
+    if _outbox is not None:
+        await _outbox.aclose()
+        _outbox = None
@@ -0,0 +1,239 @@
+"""Slack reply rendering: mrkdwn text and Block Kit, within Slack's size limits.
+
+Every template is compiled once (``compile_template`` is cached) into the
+bytecode of an f-string, and the parts of the Block Kit payload that never change
+are built at import, so rendering a reply is a few joins and dict copies.
+The answer is cut to ``policy.MAX_ANSWER_WORDS`` in one pass that stops at
+the last word kept. Slack's per-field limits (message text, section text,
+button text, URL and value, elements per block, blocks per message) are
+enforced here rather than left for Slack to reject or silently truncate,
+and anything clipped is cut at a grapheme boundary, so an emoji sequence
+or an accented letter is never split.
+
+In Block Kit replies each source is a link button and the reply ends with
+"Helpful" / "Not helpful" buttons. Their values name the memory an answer
+or source came from (``<shard>:<id>``); ``parse_action`` reads them back
+for ``/slack/interactions``, which turns clicks into usage counts that
+feed ranking.
+"""
+from __future__ import annotations
+
+from functools import lru_cache
+import re
+from string import Formatter
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+import unicodedata
+
+from .domain import policy
+from .domain.schemas import Reference, SlackReplyRequest
+
+# https://api.slack.com/reference/block-kit
+TEXT_LIMIT = 40_000
+MAX_BLOCKS = 50
+SECTION_TEXT_LIMIT = 3_000
+CONTEXT_TEXT_LIMIT = 3_000
+BUTTON_TEXT_LIMIT = 75
+BUTTON_URL_LIMIT = 3_000
+BUTTON_VALUE_LIMIT = 2_000
+ACTION_ELEMENTS_LIMIT = 25
+
+ACTION_SOURCE = "source"
+ACTION_HELPFUL = "feedback_helpful"
+ACTION_NOT_HELPFUL = "feedback_not_helpful"
+
+_ELLIPSIS = "…"
+_WORD = re.compile(r"\S+")
+
+
+class Template:
+    """A ``str.format`` template compiled once into the bytecode of an equivalent f-string.
+
+    Fields must be plain names; ``render`` takes them as keyword arguments.
+    """
+
+    __slots__ = ("source", "fields", "render")
+
+    def __init__(self, source: str) -> None:
+        fields: List[str] = []
+        for _, field, _, conversion in Formatter().parse(source):
+            if field is None:
+                continue
+            if not field.isidentifier() or conversion:
+                raise ValueError(f"template fields must be plain names: {source!r}")
+            fields.append(field)
+        self.source = source
+        self.fields = tuple(dict.fromkeys(fields))
+        params = f"*, {', '.join(self.fields)}" if self.fields else ""
+        self.render: Callable[..., str] = eval(compile(f"lambda {params}: f{source!r}", "<template>", "eval"), {})
+
+
+@lru_cache(maxsize=None)
+def compile_template(source: str) -> Template:
+    return Template(source)
+
+
+_ANSWER = compile_template("[Auto-Reply] {answer}")
+_SOURCE_LINE = compile_template("• <{url}|{title}>")
+_CONFIDENCE = compile_template("Confidence: {confidence:.2f}")
+_SOURCES_HEADING = "Sources:"
+_CLARIFY = "Clarifying question: Could you share a bit more detail?"
+
+
+def _continues_cluster(text: str, index: int) -> bool:
+    """Whether ``text[index]`` belongs to the grapheme that ``text[index - 1]`` is part of.
+
+    The subset of UAX #29 that occurs in chat text: combining marks,
+    zero-width joiner sequences, variation selectors, emoji modifiers and
+    tags, regional indicator pairs (flags), Hangul jamo and CR LF.
+    """
+
+    char = text[index]
+    previous = text[index - 1]
+    code = ord(char)
+    if previous == "\u200d" or char == "\u200d":
+        return True
+    if previous == "\r" and char == "\n":
+        return True
+    if unicodedata.category(char) in ("Mn", "Mc", "Me"):
+        return True
+    if 0xFE00 <= code <= 0xFE0F or 0xE0100 <= code <= 0xE01EF:  # variation selectors
+        return True
+    if 0x1F3FB <= code <= 0x1F3FF or 0xE0020 <= code <= 0xE007F:  # skin tones, tag sequences
+        return True
+    if 0x1160 <= code <= 0x11FF:  # Hangul medial vowels and final consonants
+        return True
+    if 0x1F1E6 <= code <= 0x1F1FF:
+        # A regional indicator ends a flag when an odd number of them precede it.
+        run = 0
+        while index - run - 1 >= 0 and 0x1F1E6 <= ord(text[index - run - 1]) <= 0x1F1FF:
+            run += 1
+        return run % 2 == 1
+    return False
+
+
+def clip(text: str, limit: int, ellipsis: str = _ELLIPSIS) -> str:
+    """``text`` cut to at most ``limit`` characters at a grapheme boundary, marked with ``ellipsis``."""
+
+    if len(text) <= limit:
+        return text
+    cut = max(limit - len(ellipsis), 0)
+    while 0 < cut < len(text) and _continues_cluster(text, cut):
+        cut -= 1
+    return text[:cut].rstrip() + ellipsis
+
+
+@lru_cache(maxsize=None)
+def _first_words(limit: int) -> re.Pattern[str]:
+    return re.compile(r"\s*(?:\S+\s+){0,%d}\S+" % (limit - 1))
+
+
+def truncate_words(text: str, limit: int) -> Tuple[str, bool]:
+    """The first ``limit`` words of ``text`` and whether any were cut.
+
+    One regex match scans up to the end of the last word kept, and the cut
+    is at the whitespace after it, which never falls inside a grapheme.
+    Spacing and line breaks between the kept words are left as they were.
+    """
+
+    match = _first_words(limit).match(text) if limit > 0 else None
+    if match is None:
+        return text.strip(), bool(text.strip())
+    return match.group().strip(), _WORD.search(text, match.end()) is not None
+
+
+def escape_mrkdwn(text: str) -> str:
+    """Escape the three characters Slack reserves for links and mentions."""
+
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+
+def render_text(payload: SlackReplyRequest, answer: str) -> str:
+    """The reply as mrkdwn text (``answer`` already truncated); also the fallback for Block Kit replies."""
+
+    lines = [_ANSWER.render(answer=escape_mrkdwn(answer))]
+    refs = payload.references[: policy.MAX_SOURCES]
+    if refs:
+        lines.append(_SOURCES_HEADING)
+        for ref in refs:
+            lines.append(_SOURCE_LINE.render(url=ref.url, title=escape_mrkdwn(ref.title)))
+    if payload.mode == "followup" and "?" not in answer:
+        lines.append(_CLARIFY)
+    lines.append(_CONFIDENCE.render(confidence=payload.confidence))
+    return clip("\n".join(lines), TEXT_LIMIT)
+
+
+def memory_ref(memory_id: int, shard: Optional[str]) -> str:
+    return f"{shard or ''}:{memory_id}"
+
+
+def parse_action(action: Dict[str, Any]) -> Optional[Tuple[str, Optional[str], int]]:
+    """``(kind, shard, memory_id)`` for a click on one of our buttons, else ``None``.
+
+    ``kind`` is ``source``, ``feedback_helpful`` or ``feedback_not_helpful``;
+    ``shard`` is ``None`` for the default shard.
+    """
+
+    action_id = str(action.get("action_id") or "")
+    kind = action_id.partition(":")[0]
+    if kind not in (ACTION_SOURCE, ACTION_HELPFUL, ACTION_NOT_HELPFUL):
+        return None
+    shard, sep, memory_id = str(action.get("value") or "").rpartition(":")
+    if not sep or not memory_id.isdigit():
+        return None
+    return kind, shard or None, int(memory_id)
+
+
+def _plain(text: str, limit: int) -> Dict[str, Any]:
+    return {"type": "plain_text", "text": clip(text, limit), "emoji": True}
+
+
+_CLARIFY_BLOCK = {"type": "section", "text": {"type": "mrkdwn", "text": _CLARIFY}}
+_FEEDBACK_BUTTONS = (
+    (ACTION_HELPFUL, {"type": "button", "text": _plain("👍 Helpful", BUTTON_TEXT_LIMIT), "style": "primary"}),
+    (ACTION_NOT_HELPFUL, {"type": "button", "text": _plain("👎 Not helpful", BUTTON_TEXT_LIMIT)}),
+)
+
+
+def _source_buttons(refs: Sequence[Reference]) -> List[Dict[str, Any]]:
+    buttons: List[Dict[str, Any]] = []
+    for index, ref in enumerate(refs[:ACTION_ELEMENTS_LIMIT]):
+        if len(ref.url) > BUTTON_URL_LIMIT:
+            continue  # a clipped URL would point somewhere else
+        button: Dict[str, Any] = {
+            "type": "button",
+            "action_id": f"{ACTION_SOURCE}:{index}",
+            "text": _plain(ref.title, BUTTON_TEXT_LIMIT),
+            "url": ref.url,
+        }
+        if ref.memory_id is not None:
+            button["value"] = clip(memory_ref(ref.memory_id, ref.shard), BUTTON_VALUE_LIMIT)
+        buttons.append(button)
+    return buttons
+
+
+def render_blocks(payload: SlackReplyRequest, answer: str) -> List[Dict[str, Any]]:
+    """The reply as Block Kit: answer, clarifying question, source buttons, confidence, feedback."""
+
+    text = clip(_ANSWER.render(answer=escape_mrkdwn(answer)), SECTION_TEXT_LIMIT)
+    blocks: List[Dict[str, Any]] = [{"type": "section", "text": {"type": "mrkdwn", "text": text}}]
+    if payload.mode == "followup" and "?" not in answer:
+        blocks.append(_CLARIFY_BLOCK)
+    sources = _source_buttons(payload.references[: policy.MAX_SOURCES])
+    if sources:
+        blocks.append({"type": "actions", "block_id": "sources", "elements": sources})
+    confidence = clip(_CONFIDENCE.render(confidence=payload.confidence), CONTEXT_TEXT_LIMIT)
+    blocks.append({"type": "context", "elements": [{"type": "mrkdwn", "text": confidence}]})
+    if payload.memory_id is not None:
+        value = memory_ref(payload.memory_id, payload.shard)
+        buttons = [{**button, "action_id": action_id, "value": value} for action_id, button in _FEEDBACK_BUTTONS]
+        blocks.append({"type": "actions", "block_id": "feedback", "elements": buttons})
+    return blocks[:MAX_BLOCKS]
+
+
+def render_message(payload: SlackReplyRequest, answer: str, *, blocks: bool) -> Dict[str, Any]:
+    """The content fields of a ``chat.postMessage`` body: ``text``, plus ``blocks`` when asked for."""
+
+    message: Dict[str, Any] = {"text": render_text(payload, answer)}
+    if blocks:
+        message["blocks"] = render_blocks(payload, answer)
+    return message
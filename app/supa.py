@@ -1,32 +1,221 @@
-"""Helpers around Supabase data access."""
+"""Helpers around Supabase data access.
+
+Every call goes to the shard the request was routed to (``app.sharding``);
+outside a routed request that is the default shard, the only one the local
+replicas mirror.
+"""
 from __future__ import annotations
 
 import asyncio
-from typing import Any, Dict, List, Optional
+import heapq
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Union,
+)
 
+import httpx
 from loguru import logger
 
+from . import fastjson
 from .config import settings
-from .deps import get_http_client, get_supabase_client
+from .deps import get_http_client, get_lexical_index, get_local_index, get_semantic_cache
+from .resilience import DependencyUnavailable
+from .sharding import Shard, current_shard, get_shard, using_shard
+from .tracing import set_span_attribute, traced
+
+if TYPE_CHECKING:
+    from .lexical_index import LexicalIndex
+    from .vector_index import LocalVectorIndex
+
+_SYNC_PAGE_SIZE = 1000
+_SYNC_COLUMNS = "id,channel,q_text,a_text,source_url,ts,embedding"
+_LEXICAL_SYNC_COLUMNS = "id,channel,q_text,a_text,source_url,ts"
+RETENTION_COLUMNS = f"{_SYNC_COLUMNS},hits,last_hit_at"
+_ARCHIVE_BATCH = 200
+# REINDEX of a large ivfflat index can take minutes.
+_REINDEX_TIMEOUT_SECONDS = 900.0
+
+
+def _rest_url(path: str) -> str:
+    return current_shard().rest_url(path)
+
+
+def _rest_headers() -> Dict[str, str]:
+    key = current_shard().service_role_key
+    return {
+        "apikey": key,
+        "Authorization": f"Bearer {key}",
+        "Content-Type": "application/json",
+        "Accept": "application/json",
+        "Prefer": "return=representation",
+    }
 
 
+def _http_client() -> httpx.AsyncClient:
+    return get_http_client("supabase", current_shard().client_key)
+
+
+def _replicas() -> List[Union[LocalVectorIndex, LexicalIndex]]:
+    """Local replicas a write must reach; they mirror the default shard only."""
+
+    if not current_shard().is_default:
+        return []
+    return [replica for replica in (get_local_index(), get_lexical_index()) if replica is not None]
+
+
+@traced("insert_memories")
+async def insert_memories(rows: List[Dict[str, Any]]) -> List[int]:
+    """Insert memory rows through PostgREST on the shared async client.
+
+    Several rows go out as one multi-row insert; ``select=id`` keeps the
+    representation down to the generated ids.
+    """
+
+    if not rows:
+        return []
+
+    shard = current_shard()
+    headers = _rest_headers()
+    headers["Content-Profile"] = shard.schema
+    http_client = _http_client()
+    response = await http_client.post(
+        _rest_url(shard.table), params={"select": "id"}, json=rows, headers=headers
+    )
+    response.raise_for_status()
+    data = response.json()
+    if not isinstance(data, list) or len(data) != len(rows):
+        logger.error("Unexpected insert response: {}", data)
+        raise RuntimeError("Supabase insert returned an unexpected number of rows")
+    try:
+        ids = [int(item["id"]) for item in data]
+    except (KeyError, TypeError, ValueError) as exc:
+        raise RuntimeError("Supabase insert did not return an id") from exc
+
+    for replica in _replicas():
+        replica.add({**row, "id": memory_id} for row, memory_id in zip(rows, ids))
+    _after_write(row.get("channel") for row in rows)
+    return ids
+
+
+@traced("insert_memory")
 async def insert_memory(row: Dict[str, Any]) -> int:
-    """Insert a memory row via the Supabase client."""
+    """Insert a single memory row and return its id."""
+
+    ids = await insert_memories([row])
+    return ids[0]
+
+
+def _after_write(channels: Iterable[Optional[str]]) -> None:
+    semantic_cache = get_semantic_cache(current_shard().client_key)
+    for channel in set(channels):
+        semantic_cache.invalidate(channel)
+
+
+@traced("update_memory")
+async def update_memory(memory_id: int, channel: Optional[str], changes: Dict[str, Any]) -> None:
+    """Patch columns of an existing row (used when an upsert merges into a duplicate)."""
+
+    if not changes:
+        return
+    shard = current_shard()
+    headers = _rest_headers()
+    headers["Content-Profile"] = shard.schema
+    headers["Prefer"] = "return=minimal"
+    http_client = _http_client()
+    response = await http_client.patch(
+        _rest_url(shard.table), params={"id": f"eq.{memory_id}"}, json=changes, headers=headers
+    )
+    response.raise_for_status()
+
+    for replica in _replicas():
+        replica.update(memory_id, changes)
+    _after_write([channel])
+
+
+async def delete_memories(ids: List[int], channels: Iterable[Optional[str]] = ()) -> int:
+    """Delete rows by id; returns how many PostgREST reported deleted."""
+
+    if not ids:
+        return 0
+    shard = current_shard()
+    headers = _rest_headers()
+    headers["Content-Profile"] = shard.schema
+    http_client = _http_client()
+    response = await http_client.delete(
+        _rest_url(shard.table),
+        params={"id": f"in.({','.join(str(memory_id) for memory_id in ids)})", "select": "id"},
+        headers=headers,
+    )
+    response.raise_for_status()
+
+    for replica in _replicas():
+        replica.remove(ids)
+    _after_write(channels)
+    return len(response.json())
+
+
+async def _call_rpc(function: str, payload: Dict[str, Any], **kwargs: Any) -> None:
+    headers = _rest_headers()
+    headers["Prefer"] = "return=minimal"
+    response = await _http_client().post(
+        _rest_url(f"rpc/{function}"), json=payload, headers=headers, **kwargs
+    )
+    response.raise_for_status()
+
 
-    def _insert_sync() -> int:
-        client = get_supabase_client()
-        response = client.table(settings.supabase_table).insert(row).execute()
-        data = getattr(response, "data", None) or []
-        if not data:
-            raise RuntimeError("Supabase insert returned no data")
-        memory_id = data[0].get("id")
-        if memory_id is None:
-            raise RuntimeError("Supabase insert did not return an id")
-        return int(memory_id)
+async def record_memory_hits(counts: Dict[int, int]) -> None:
+    """Add ``counts`` to ``kb.hits`` and stamp ``kb.last_hit_at``, in one RPC."""
 
-    return await asyncio.to_thread(_insert_sync)
+    if not counts:
+        return
+    await _call_rpc(
+        current_shard().usage_function,
+        {"memory_ids": list(counts), "counts": list(counts.values())},
+    )
 
 
+@traced("archive_memories")
+async def archive_memories(rows: List[Dict[str, Any]]) -> int:
+    """Copy rows (as read with ``RETENTION_COLUMNS``) into the archive table, then delete them from ``kb``.
+
+    The copy is idempotent on ``id``, so a run interrupted between the two
+    steps is completed by the next one.
+    """
+
+    shard = current_shard()
+    headers = _rest_headers()
+    headers["Content-Profile"] = shard.schema
+    headers["Prefer"] = "resolution=merge-duplicates,return=minimal"
+    http_client = _http_client()
+    archived = 0
+    for start in range(0, len(rows), _ARCHIVE_BATCH):
+        batch = rows[start : start + _ARCHIVE_BATCH]
+        response = await http_client.post(
+            _rest_url(shard.archive_table), params={"on_conflict": "id"}, json=batch, headers=headers
+        )
+        response.raise_for_status()
+        archived += await delete_memories(
+            [int(row["id"]) for row in batch], (row.get("channel") for row in batch)
+        )
+    return archived
+
+
+async def reindex_memories() -> None:
+    """Rebuild ``kb``'s vector index so ivfflat lists are re-trained on the rows left."""
+
+    await _call_rpc(current_shard().reindex_function, {}, timeout=_REINDEX_TIMEOUT_SECONDS)
+
+
+@traced("search_memory")
 async def search_memory(
     *, channel: Optional[str], query_embedding: List[float], k: int
 ) -> List[Dict[str, Any]]:
@@ -35,25 +224,101 @@ async def search_memory(
     if k <= 0:
         return []
 
-    url = f"{str(settings.supabase_url).rstrip('/')}/rest/v1/rpc/{settings.supabase_search_function}"
-    headers = {
-        "apikey": settings.supabase_service_role_key,
-        "Authorization": f"Bearer {settings.supabase_service_role_key}",
-        "Content-Type": "application/json",
-        "Accept": "application/json",
-        "Prefer": "return=representation",
-    }
+    shard = current_shard()
+    index = get_local_index() if shard.is_default else None
+    if index is not None and index.is_fresh:
+        set_span_attribute("search.source", "local_index")
+        return index.search(channel=channel, query_embedding=query_embedding, k=k)
+    set_span_attribute("search.source", "rpc")
+
+    try:
+        return await _rpc_search(shard.search_function, channel, query_embedding, k)
+    except DependencyUnavailable:
+        # Stale answers beat none while Supabase is shedding our calls.
+        if index is None or not len(index):
+            raise
+        set_span_attribute("search.source", "local_index_stale")
+        return index.search(channel=channel, query_embedding=query_embedding, k=k)
+
+
+@traced("search_archived_memories")
+async def search_archived_memories(
+    *, channel: Optional[str], query_embedding: List[float], k: int
+) -> List[Dict[str, Any]]:
+    """Similarity search over rows the retention job moved to the archive table."""
+
+    if k <= 0:
+        return []
+    return await _rpc_search(current_shard().archive_search_function, channel, query_embedding, k)
+
+
+SearchFunction = Callable[..., Awaitable[List[Dict[str, Any]]]]
+
+
+async def search_shards(
+    shards: Sequence[Shard],
+    search: SearchFunction,
+    *,
+    channel: Optional[str],
+    query_embedding: List[float],
+    k: int,
+) -> List[Dict[str, Any]]:
+    """Scatter ``search`` over ``shards`` and gather the ``k`` nearest rows by distance.
+
+    Rows from a shard other than the default carry its name in ``shard``,
+    since ids are only unique within one. A failing shard is left out with
+    a warning; only when every shard fails is the first error raised.
+    """
+
+    async def _one(shard: Shard) -> List[Dict[str, Any]]:
+        with using_shard(shard):
+            rows = await search(channel=channel, query_embedding=query_embedding, k=k)
+        return [{**row, "shard": shard.client_key} for row in rows] if shard.client_key else rows
+
+    if len(shards) == 1:
+        return await _one(shards[0])
+    results = await asyncio.gather(*(_one(shard) for shard in shards), return_exceptions=True)
+    rows: List[Dict[str, Any]] = []
+    errors: List[BaseException] = []
+    for shard, result in zip(shards, results):
+        if isinstance(result, BaseException):
+            if not isinstance(result, Exception):
+                raise result
+            logger.warning("search on shard {} failed: {}", shard.name, result)
+            errors.append(result)
+        else:
+            rows.extend(result)
+    set_span_attribute("search.shards", len(shards))
+    if errors:
+        set_span_attribute("search.shards_failed", len(errors))
+        if len(errors) == len(shards):
+            raise errors[0]
+    return heapq.nsmallest(k, rows, key=lambda row: row["score"])
+
+
+async def _rpc_search(
+    function: str, channel: Optional[str], query_embedding: List[float], k: int
+) -> List[Dict[str, Any]]:
+    # quantization pulls in numpy; only the first search pays for it.
+    from .quantization import format_vector_literal
+
+    url = _rest_url(f"rpc/{function}")
+    headers = _rest_headers()
     payload: Dict[str, Any] = {
-        "query_embedding": query_embedding,
+        "query_embedding": (
+            format_vector_literal(query_embedding, settings.rpc_vector_digits)
+            if settings.rpc_vector_digits
+            else query_embedding
+        ),
         "match_count": k,
     }
     if channel:
         payload["channel_filter"] = channel
 
-    http_client = get_http_client()
+    http_client = _http_client()
     response = await http_client.post(url, json=payload, headers=headers)
     response.raise_for_status()
-    data = response.json()
+    data = fastjson.loads(response.content)
     if not isinstance(data, list):
         logger.error("Unexpected RPC response: {}", data)
         raise RuntimeError("Supabase RPC returned unexpected payload")
@@ -68,9 +333,78 @@ async def search_memory(
                     "a_text": row["a_text"],
                     "source_url": row.get("source_url"),
                     "ts": row.get("ts"),
+                    "hits": int(row.get("hits") or 0),
                     "score": float(row.get("distance", 0.0)),
                 }
             )
         except KeyError as exc:
             logger.error("RPC row missing field: {}", exc)
     return matches
+
+
+def _parse_vector(value: Any) -> List[float]:
+    # PostgREST renders pgvector columns as "[0.1,0.2,...]" strings.
+    if isinstance(value, str):
+        value = fastjson.loads(value)
+    return [float(item) for item in value]
+
+
+async def iter_memory_pages(
+    *, after: int = 0, with_embeddings: bool = True, columns: Optional[str] = None
+) -> AsyncIterator[List[Dict[str, Any]]]:
+    """Yield pages of ``kb`` rows with ``id > after`` in id order.
+
+    ``columns`` overrides the default sync column list; include ``embedding``
+    in it only together with ``with_embeddings``.
+    """
+
+    shard = current_shard()
+    headers = _rest_headers()
+    headers["Accept-Profile"] = shard.schema
+    http_client = _http_client()
+    cursor = after
+    while True:
+        response = await http_client.get(
+            _rest_url(shard.table),
+            params={
+                "select": columns or (_SYNC_COLUMNS if with_embeddings else _LEXICAL_SYNC_COLUMNS),
+                "id": f"gt.{cursor}",
+                "order": "id.asc",
+                "limit": str(_SYNC_PAGE_SIZE),
+            },
+            headers=headers,
+        )
+        response.raise_for_status()
+        rows = fastjson.loads(response.content)
+        if not isinstance(rows, list):
+            logger.error("Unexpected sync response: {}", rows)
+            raise RuntimeError("Supabase sync returned unexpected payload")
+        if with_embeddings:
+            for row in rows:
+                row["embedding"] = _parse_vector(row["embedding"])
+        if rows:
+            cursor = max(int(row["id"]) for row in rows)
+            yield rows
+        if len(rows) < _SYNC_PAGE_SIZE:
+            return
+
+
+async def sync_local_index(index: Union[LocalVectorIndex, LexicalIndex]) -> int:
+    """Pull rows newer than the replica's cursor from ``kb``; returns rows added.
+
+    The lexical index does not need embeddings, so they are not fetched for it.
+    """
+
+    from .vector_index import LocalVectorIndex
+
+    cursor = index.sync_cursor
+    added = 0
+    with_embeddings = isinstance(index, LocalVectorIndex)
+    # Usage boosts need the stored hit counts of rows served from the replica.
+    columns = f"{_SYNC_COLUMNS},hits" if with_embeddings and settings.ranking_usage_weight else None
+    with using_shard(get_shard()):
+        async for rows in iter_memory_pages(after=cursor, with_embeddings=with_embeddings, columns=columns):
+            added += index.add(rows)
+            cursor = max(int(row["id"]) for row in rows)
+    index.mark_synced(cursor)
+    return added
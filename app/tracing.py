@@ -0,0 +1,302 @@
+"""Lightweight request tracing exported as OTLP/JSON.
+
+Spans are kept in a ``ContextVar`` so they follow the request through
+``await`` and into tasks it spawns. Every request is recorded, but a
+finished trace is only kept when it was head-sampled (``TRACE_SAMPLE_RATE``
+or a sampled W3C ``traceparent``) or when it ran longer than
+``TRACE_SLOW_REQUEST_MS``. That way the slow requests behind a p99 spike are
+always captured. Kept traces go to an in-memory ring buffer and, optionally,
+are appended to a JSON-lines file that OpenTelemetry tooling can read
+(one ``resourceSpans`` document per line).
+"""
+from __future__ import annotations
+
+import asyncio
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+import functools
+import json
+import os
+import random
+import threading
+import time
+from typing import Any, Awaitable, Callable, Deque, Dict, Iterator, List, Optional, Tuple, TypeVar
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .config import settings, worker_scoped_path
+
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+SPAN_KIND_CLIENT = 3
+
+T = TypeVar("T")
+
+
+@dataclass
+class _Trace:
+    sampled: bool
+    spans: List["Span"] = field(default_factory=list)
+
+
+@dataclass
+class Span:
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str]
+    name: str
+    kind: int
+    start_ns: int
+    trace: _Trace
+    end_ns: int = 0
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    error: Optional[str] = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.trace.sampled else '00'}"
+
+    def to_otlp(self) -> Dict[str, Any]:
+        span: Dict[str, Any] = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [{"key": key, "value": _otlp_value(value)} for key, value in self.attributes.items()],
+            "status": {"code": 2, "message": self.error} if self.error else {"code": 0},
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        return span
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def set_span_attribute(key: str, value: Any) -> None:
+    span = _current_span.get()
+    if span is not None:
+        span.set_attribute(key, value)
+
+
+def parse_traceparent(header: Optional[str]) -> Optional[Tuple[str, str, bool]]:
+    """Return ``(trace_id, parent_span_id, sampled)`` from a W3C ``traceparent``."""
+
+    if not header:
+        return None
+    parts = header.strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        flags = int(parts[3], 16)
+        int(parts[1], 16), int(parts[2], 16)
+    except ValueError:
+        return None
+    return parts[1], parts[2], bool(flags & 1)
+
+
+class Tracer:
+    """Decides which finished traces to keep and exports them."""
+
+    def __init__(
+        self,
+        *,
+        sample_rate: float,
+        slow_threshold_seconds: float,
+        buffer_size: int,
+        export_path: Optional[str] = None,
+    ) -> None:
+        self.sample_rate = sample_rate
+        self.slow_threshold_seconds = slow_threshold_seconds
+        self.export_path = export_path
+        self.traces: Deque[Dict[str, Any]] = deque(maxlen=buffer_size)
+        self._pending: List[str] = []
+        self._writer: Optional[asyncio.Task[None]] = None
+        self._file_lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.sample_rate > 0 or self.slow_threshold_seconds > 0
+
+    def should_sample(self) -> bool:
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def finish(self, trace: _Trace, root: Span) -> None:
+        duration = (root.end_ns - root.start_ns) / 1e9
+        slow = self.slow_threshold_seconds > 0 and duration >= self.slow_threshold_seconds
+        if not (trace.sampled or slow):
+            return
+        document = {
+            "resourceSpans": [
+                {
+                    "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": "slack-agent"}}]},
+                    "scopeSpans": [{"scope": {"name": "app.tracing"}, "spans": [s.to_otlp() for s in trace.spans]}],
+                }
+            ]
+        }
+        self.traces.append(document)
+        if self.export_path:
+            self._pending.append(json.dumps(document, separators=(",", ":")))
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                self._write(self._take_pending())
+                return
+            if self._writer is None or self._writer.done():
+                self._writer = loop.create_task(self._write_behind())
+
+    def _take_pending(self) -> List[str]:
+        lines, self._pending = self._pending, []
+        return lines
+
+    async def _write_behind(self) -> None:
+        while self._pending:
+            await asyncio.to_thread(self._write, self._take_pending())
+
+    def _write(self, lines: List[str]) -> None:
+        assert self.export_path is not None
+        with self._file_lock, open(self.export_path, "a", encoding="utf-8") as handle:
+            handle.write("\n".join(lines) + "\n")
+
+    async def flush(self) -> None:
+        if self._writer is not None:
+            await self._writer
+        if self._pending:
+            await self._write_behind()
+
+
+_tracer: Optional[Tracer] = None
+
+
+def get_tracer() -> Tracer:
+    global _tracer
+    if _tracer is None:
+        _tracer = Tracer(
+            sample_rate=settings.trace_sample_rate,
+            slow_threshold_seconds=settings.trace_slow_request_ms / 1000.0,
+            buffer_size=settings.trace_buffer_size,
+            export_path=worker_scoped_path(settings.trace_export_path) if settings.trace_export_path else None,
+        )
+    return _tracer
+
+
+@contextmanager
+def start_span(
+    name: str,
+    *,
+    kind: int = SPAN_KIND_INTERNAL,
+    attributes: Optional[Dict[str, Any]] = None,
+    remote_parent: Optional[Tuple[str, str, bool]] = None,
+    child_only: bool = False,
+) -> Iterator[Optional[Span]]:
+    """Open a span under the current one, or start a trace if there is none.
+
+    With ``child_only`` nothing is recorded outside an existing trace.
+    """
+
+    tracer = get_tracer()
+    parent = _current_span.get()
+    if not tracer.enabled or (parent is None and child_only):
+        yield None
+        return
+
+    if parent is not None:
+        trace, trace_id, parent_id = parent.trace, parent.trace_id, parent.span_id
+    elif remote_parent is not None:
+        trace_id, parent_id, sampled = remote_parent
+        trace = _Trace(sampled=sampled or tracer.should_sample())
+    else:
+        trace, trace_id, parent_id = _Trace(sampled=tracer.should_sample()), os.urandom(16).hex(), None
+
+    span = Span(
+        trace_id=trace_id,
+        span_id=os.urandom(8).hex(),
+        parent_id=parent_id,
+        name=name,
+        kind=kind,
+        start_ns=time.time_ns(),
+        trace=trace,
+        attributes=dict(attributes or {}),
+    )
+    trace.spans.append(span)
+    token = _current_span.set(span)
+    try:
+        yield span
+    except BaseException as exc:
+        span.error = type(exc).__name__
+        raise
+    finally:
+        span.end_ns = time.time_ns()
+        _current_span.reset(token)
+        if parent is None:
+            tracer.finish(trace, span)
+
+
+def traced(name: str) -> Callable[[Callable[..., Awaitable[T]]], Callable[..., Awaitable[T]]]:
+    """Wrap an async function in a span named ``name``."""
+
+    def decorate(func: Callable[..., Awaitable[T]]) -> Callable[..., Awaitable[T]]:
+        @functools.wraps(func)
+        async def wrapper(*args: Any, **kwargs: Any) -> T:
+            with start_span(name):
+                return await func(*args, **kwargs)
+
+        return wrapper
+
+    return decorate
+
+
+class TracingMiddleware:
+    """Pure ASGI middleware opening a server span per request."""
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not get_tracer().enabled:
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        remote_parent = parse_traceparent(headers.get(b"traceparent", b"").decode("latin-1"))
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        with start_span(scope["method"], kind=SPAN_KIND_SERVER, remote_parent=remote_parent) as span:
+            assert span is not None
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                route = getattr(scope.get("route"), "path", scope.get("path", ""))
+                span.name = f"{scope['method']} {route}"
+                span.attributes.update(
+                    {"http.method": scope["method"], "http.route": route, "http.status_code": status_code}
+                )
+                if status_code >= 500 and span.error is None:
+                    span.error = f"HTTP {status_code}"
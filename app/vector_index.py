@@ -0,0 +1,197 @@
+"""In-process read replica of the ``kb`` embeddings for local search."""
+from __future__ import annotations
+
+import json
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+from .ann import FlatEngine, create_engine, load_engine
+
+_SNAPSHOT_VERSION = 1
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class LocalVectorIndex:
+    """Cosine top-k over per-channel partitions, each backed by a search engine.
+
+    Rows are only ever appended: the replica follows ``kb`` by ``id`` and
+    Supabase stays the source of truth. Removed rows keep their vectors in the
+    engines but are filtered out of results. ``is_fresh`` tells callers whether
+    the last successful sync is recent enough to answer from the replica.
+    ``engine`` picks exact (``flat``) or approximate (``ivf``/``hnsw``) search;
+    ``engine_params`` are passed through to it, including the ``codec`` that
+    stores flat partitions as float16, int8 or PQ codes.
+    """
+
+    def __init__(
+        self,
+        *,
+        dim: int,
+        max_staleness_seconds: float,
+        engine: str = "flat",
+        engine_params: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        self.dim = dim
+        self.max_staleness_seconds = max_staleness_seconds
+        self.engine = engine
+        self.engine_params = dict(engine_params or {})
+        self.sync_cursor = 0
+        self.last_synced: Optional[float] = None
+        self._partitions: Dict[Optional[str], FlatEngine] = {}
+        self._rows: Dict[int, Dict[str, Any]] = {}
+        create_engine(engine, dim, **self.engine_params)  # fail fast on a bad engine name
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    @property
+    def is_fresh(self) -> bool:
+        if self.last_synced is None:
+            return False
+        return time.monotonic() - self.last_synced <= self.max_staleness_seconds
+
+    def mark_synced(self, cursor: int) -> None:
+        """Record a completed sync up to ``cursor``.
+
+        Rows added locally after an insert do not move the cursor, so rows
+        written concurrently by other processes with lower ids are still
+        picked up by the next sync.
+        """
+
+        self.sync_cursor = max(self.sync_cursor, cursor)
+        self.last_synced = time.monotonic()
+
+    def _partition(self, channel: Optional[str]) -> FlatEngine:
+        partition = self._partitions.get(channel)
+        if partition is None:
+            partition = self._partitions[channel] = create_engine(self.engine, self.dim, **self.engine_params)
+        return partition
+
+    def add(self, rows: Iterable[Dict[str, Any]]) -> int:
+        """Append rows carrying ``id``, ``channel`` and ``embedding``; returns how many were new."""
+
+        by_channel: Dict[Optional[str], List[Dict[str, Any]]] = {}
+        for row in rows:
+            memory_id = int(row["id"])
+            if memory_id in self._rows or len(row["embedding"]) != self.dim:
+                continue
+            self._rows[memory_id] = {
+                "id": memory_id,
+                "q_text": row["q_text"],
+                "a_text": row["a_text"],
+                "source_url": row.get("source_url"),
+                "ts": row.get("ts"),
+            }
+            by_channel.setdefault(row.get("channel"), []).append(row)
+
+        added = 0
+        for channel, channel_rows in by_channel.items():
+            ids = np.fromiter((int(row["id"]) for row in channel_rows), dtype=np.int64, count=len(channel_rows))
+            vectors = normalize_rows(np.asarray([row["embedding"] for row in channel_rows], dtype=np.float32))
+            self._partition(channel).add(ids, vectors)
+            added += len(channel_rows)
+        return added
+
+    def reserve(self, headroom: float) -> None:
+        """Leave room for ``headroom`` × the current rows in every partition."""
+
+        for partition in self._partitions.values():
+            partition.reserve(int(len(partition) * (1 + headroom)) + 64)
+
+    def update(self, memory_id: int, changes: Dict[str, Any]) -> None:
+        """Apply column changes to a row; the embedding (of ``q_text``) is unchanged."""
+
+        row = self._rows.get(memory_id)
+        if row is not None:
+            row.update((key, value) for key, value in changes.items() if key in row)
+
+    def remove(self, ids: Iterable[int]) -> int:
+        return sum(self._rows.pop(int(memory_id), None) is not None for memory_id in ids)
+
+    def search(self, *, channel: Optional[str], query_embedding: List[float], k: int) -> List[Dict[str, Any]]:
+        """Return the ``k`` nearest rows shaped like ``search_memory`` results."""
+
+        if k <= 0:
+            return []
+        query = np.asarray(query_embedding, dtype=np.float32)
+        norm = float(np.linalg.norm(query))
+        if norm:
+            query = query / norm
+
+        if channel:
+            partitions = [self._partitions[channel]] if channel in self._partitions else []
+        else:
+            partitions = list(self._partitions.values())
+
+        # Over-fetch by the number of removed rows so filtering them still leaves k.
+        removed = sum(len(partition) for partition in self._partitions.values()) - len(self._rows)
+        candidates: List[tuple[float, int]] = []
+        for partition in partitions:
+            ids, distances = partition.search(query, k + removed)
+            candidates.extend(
+                (distance, memory_id)
+                for distance, memory_id in zip(distances.tolist(), ids.tolist())
+                if memory_id in self._rows
+            )
+
+        candidates.sort()
+        return [{**self._rows[memory_id], "score": distance} for distance, memory_id in candidates[:k]]
+
+    def save(self, path: str) -> None:
+        """Write a snapshot that ``load`` can restore, cursor included."""
+
+        channels = list(self._partitions)
+        header = {
+            "version": _SNAPSHOT_VERSION,
+            "dim": self.dim,
+            "engine": self.engine,
+            "codec": self.engine_params.get("codec", "none"),
+            "sync_cursor": self.sync_cursor,
+            "channels": channels,
+        }
+        arrays: Dict[str, np.ndarray] = {
+            "header": np.frombuffer(json.dumps(header).encode("utf-8"), dtype=np.uint8),
+            "rows": np.frombuffer(json.dumps(list(self._rows.values())).encode("utf-8"), dtype=np.uint8),
+        }
+        for position, channel in enumerate(channels):
+            for name, array in self._partitions[channel].to_arrays().items():
+                arrays[f"{position}/{name}"] = array
+        with open(path, "wb") as handle:
+            np.savez(handle, **arrays)
+
+    @classmethod
+    def load(
+        cls,
+        path: str,
+        *,
+        max_staleness_seconds: float,
+        engine_params: Optional[Dict[str, Any]] = None,
+    ) -> "LocalVectorIndex":
+        """Restore a snapshot; it is not fresh until the next sync completes."""
+
+        with np.load(path) as data:
+            header = json.loads(data["header"].tobytes())
+            if header.get("version") != _SNAPSHOT_VERSION:
+                raise ValueError(f"unsupported index snapshot version {header.get('version')!r}")
+            index = cls(
+                dim=header["dim"],
+                max_staleness_seconds=max_staleness_seconds,
+                engine=header["engine"],
+                engine_params=engine_params,
+            )
+            if header.get("codec", "none") != index.engine_params.get("codec", "none"):
+                raise ValueError("index snapshot was written with a different vector codec")
+            index.sync_cursor = int(header["sync_cursor"])
+            index._rows = {int(row["id"]): row for row in json.loads(data["rows"].tobytes())}
+            for position, channel in enumerate(header["channels"]):
+                prefix = f"{position}/"
+                arrays = {name[len(prefix) :]: data[name] for name in data.files if name.startswith(prefix)}
+                index._partitions[channel] = load_engine(index.engine, index.dim, arrays, **index.engine_params)
+        return index
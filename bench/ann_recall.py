@@ -0,0 +1,81 @@
+"""Recall-vs-latency sweep of the local ANN engines against exact search.
+
+Run with ``python -m bench.ann_recall``; prints one JSON line per setting.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import time
+from typing import Any, Dict, List
+
+import numpy as np
+
+from app.ann import FlatEngine, create_engine
+from app.vector_index import normalize_rows
+
+
+def _dataset(count: int, queries: int, dim: int, clusters: int, seed: int) -> tuple[np.ndarray, np.ndarray]:
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim))
+    data = centers[rng.integers(0, clusters, count)] + 0.5 * rng.standard_normal((count, dim))
+    probes = data[rng.integers(0, count, queries)] + 0.5 * rng.standard_normal((queries, dim))
+    return normalize_rows(data.astype(np.float32)), normalize_rows(probes.astype(np.float32))
+
+
+def _measure(engine: FlatEngine, queries: np.ndarray, truth: List[set], k: int) -> Dict[str, Any]:
+    latencies: List[float] = []
+    hits = 0
+    for query, expected in zip(queries, truth):
+        started = time.perf_counter()
+        ids, _ = engine.search(query, k)
+        latencies.append(time.perf_counter() - started)
+        hits += len(expected & set(ids.tolist()))
+    latencies.sort()
+    return {
+        "recall": round(hits / (k * len(queries)), 4),
+        "p50_ms": round(statistics.median(latencies) * 1000, 3),
+        "p99_ms": round(latencies[max(0, int(len(latencies) * 0.99) - 1)] * 1000, 3),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--vectors", type=int, default=10000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--dim", type=int, default=128)
+    parser.add_argument("--clusters", type=int, default=50)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    data, queries = _dataset(args.vectors, args.queries, args.dim, args.clusters, args.seed)
+    ids = np.arange(len(data), dtype=np.int64)
+
+    exact = FlatEngine(args.dim)
+    exact.add(ids, data)
+    truth = [set(exact.search(query, args.k)[0].tolist()) for query in queries]
+    print(json.dumps({"engine": "flat", **_measure(exact, queries, truth, args.k)}))
+
+    started = time.perf_counter()
+    ivf = create_engine("ivf", args.dim)
+    ivf.add(ids, data)
+    build_seconds = round(time.perf_counter() - started, 2)
+    for nprobe in (1, 2, 4, 8, 16, 32):
+        ivf.nprobe = nprobe
+        result = _measure(ivf, queries, truth, args.k)
+        print(json.dumps({"engine": "ivf", "nprobe": nprobe, "build_s": build_seconds, **result}))
+
+    started = time.perf_counter()
+    hnsw = create_engine("hnsw", args.dim)
+    hnsw.add(ids, data)
+    build_seconds = round(time.perf_counter() - started, 2)
+    for ef_search in (16, 32, 64, 128, 256):
+        hnsw.ef_search = ef_search
+        result = _measure(hnsw, queries, truth, args.k)
+        print(json.dumps({"engine": "hnsw", "ef_search": ef_search, "build_s": build_seconds, **result}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""Local stand-ins for the service's outbound dependencies."""
+from __future__ import annotations
+
+import asyncio
+from contextlib import contextmanager
+import hashlib
+import itertools
+import json
+import re
+import socket
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+import numpy as np
+import uvicorn
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _unit(vector: Any) -> np.ndarray:
+    # The RPC may receive a pgvector text literal instead of a JSON array.
+    array = np.asarray(json.loads(vector) if isinstance(vector, str) else vector, dtype=np.float32)
+    norm = float(np.linalg.norm(array))
+    return array / norm if norm else array
+
+
+def fake_embedding(text: str, dim: int) -> List[float]:
+    """Deterministic unit vector per text, so repeated texts embed identically."""
+
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    vector = np.random.default_rng(seed).standard_normal(dim).astype(np.float32)
+    return (vector / np.linalg.norm(vector)).tolist()
+
+
+def create_embedding_app(*, dim: int, latency_seconds: float = 0.0) -> FastAPI:
+    """Embedding provider stand-in for ``{"text"}`` and batched ``{"texts"}`` calls."""
+
+    app = FastAPI()
+
+    @app.post("/embed")
+    async def embed(request: Request) -> Dict[str, Any]:
+        await asyncio.sleep(latency_seconds)
+        payload = await request.json()
+        if "texts" in payload:
+            return {"embeddings": [fake_embedding(text, dim) for text in payload["texts"]]}
+        return {"embedding": fake_embedding(payload["text"], dim)}
+
+    return app
+
+
+def create_slack_app(*, latency_seconds: float = 0.0, rate_limit_every: int = 0, retry_after: int = 1) -> FastAPI:
+    """``chat.postMessage`` stand-in; every ``rate_limit_every``-th post gets a 429."""
+
+    app = FastAPI()
+    counter = itertools.count(1)
+    app.state.posts = 0
+
+    @app.post("/api/api.test")
+    async def api_test() -> Dict[str, Any]:
+        return {"ok": True}
+
+    @app.post("/api/chat.postMessage")
+    async def post_message(request: Request):
+        await asyncio.sleep(latency_seconds)
+        await request.body()
+        if rate_limit_every and next(counter) % rate_limit_every == 0:
+            return JSONResponse(
+                {"ok": False, "error": "ratelimited"}, status_code=429, headers={"Retry-After": str(retry_after)}
+            )
+        app.state.posts += 1
+        return {"ok": True, "ts": f"{time.time():.6f}"}
+
+    return app
+
+
+def create_postgrest_app(*, latency_seconds: float = 0.0) -> FastAPI:
+    """PostgREST stand-in: table inserts/reads and a ``match_memories``-style RPC over in-memory rows."""
+
+    app = FastAPI()
+    rows: List[Dict[str, Any]] = []
+    vectors: List[np.ndarray] = []
+    matrix: Dict[str, Optional[np.ndarray]] = {"stacked": None}
+
+    @app.middleware("http")
+    async def collapse_slashes(request: Request, call_next):
+        # supabase-py joins a trailing-slash URL with "/rest/v1"; real PostgREST tolerates "//".
+        request.scope["path"] = re.sub("/+", "/", request.scope["path"])
+        return await call_next(request)
+
+    @app.post("/rest/v1/rpc/{function}")
+    async def rpc(function: str, request: Request) -> List[Dict[str, Any]]:
+        await asyncio.sleep(latency_seconds)
+        payload = await request.json()
+        if not rows:
+            return []
+        if matrix["stacked"] is None or len(matrix["stacked"]) != len(vectors):
+            matrix["stacked"] = np.stack(vectors)
+        distances = 1.0 - matrix["stacked"] @ _unit(payload["query_embedding"])
+        channel = payload.get("channel_filter")
+        if channel is not None:
+            distances[[row.get("channel") != channel for row in rows]] = np.inf
+        order = np.argsort(distances)[: payload["match_count"]]
+        return [
+            {**{k: v for k, v in rows[i].items() if k != "embedding"}, "distance": float(distances[i])}
+            for i in order
+            if np.isfinite(distances[i])
+        ]
+
+    @app.post("/rest/v1/{table}")
+    async def insert(table: str, request: Request) -> List[Dict[str, Any]]:
+        await asyncio.sleep(latency_seconds)
+        payload = await request.json()
+        batch = payload if isinstance(payload, list) else [payload]
+        inserted = []
+        for row in batch:
+            stored = {**row, "id": len(rows) + 1}
+            rows.append(stored)
+            vectors.append(_unit(row["embedding"]))
+            inserted.append(stored)
+        if request.query_params.get("select") == "id":
+            return [{"id": row["id"]} for row in inserted]
+        return inserted
+
+    @app.get("/rest/v1/{table}")
+    async def read(table: str, request: Request) -> List[Dict[str, Any]]:
+        await asyncio.sleep(latency_seconds)
+        after = int(request.query_params.get("id", "gt.0").split(".", 1)[1])
+        limit = int(request.query_params.get("limit", "1000"))
+        return [
+            {**row, "embedding": json.dumps(row["embedding"])} for row in rows[after : after + limit]
+        ]
+
+    return app
+
+
+@contextmanager
+def serve(app: FastAPI, port: int) -> Iterator[str]:
+    """Run ``app`` on a background uvicorn thread and yield its base URL."""
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    try:
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        server.should_exit = True
+        thread.join()
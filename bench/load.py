@@ -0,0 +1,227 @@
+"""Drive the service end to end against local fake dependencies.
+
+Starts fake embedding, PostgREST and Slack servers in this process and the
+service itself as a ``uvicorn`` subprocess pointed at them, then runs each
+scenario (``upsert``, ``search``, ``reply``) at each concurrency level.
+Prints a single JSON document (or writes it to ``--output``) with RPS,
+latency percentiles and service CPU time per request, tagged with the git
+commit so runs can be compared. Extra service settings (e.g.
+``LOCAL_INDEX_ENABLED=true``) are taken from the environment.
+
+    python -m bench.load --concurrency 1,10,50 --requests 500
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+from contextlib import ExitStack
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import httpx
+
+from .fakes import create_embedding_app, create_postgrest_app, create_slack_app, free_port, serve
+
+TOPICS = ["request VPN access", "reset my password", "book a meeting room", "expense a taxi", "join on-call"]
+
+
+def _percentile(ordered: List[float], q: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, max(0, round(q * len(ordered)) - 1))]
+
+
+def _process_cpu_seconds(pid: int) -> Optional[float]:
+    """User+system CPU of ``pid`` from ``/proc`` (Linux only)."""
+
+    try:
+        with open(f"/proc/{pid}/stat", encoding="ascii") as handle:
+            fields = handle.read().rsplit(")", 1)[1].split()
+    except OSError:
+        return None
+    # utime and stime are fields 14 and 15; the split above starts at field 3.
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _payload(scenario: str, i: int, *, async_reply: bool) -> tuple[str, Dict[str, Any]]:
+    topic = TOPICS[i % len(TOPICS)]
+    channel = f"C{i % 4}"
+    if scenario == "upsert":
+        return "/memory/upsert", {
+            "channel": channel,
+            "q_text": f"How do I {topic}? #{i}",
+            "a_text": f"Steps to {topic}.",
+        }
+    if scenario == "search":
+        return "/memory/search", {"channel": channel, "query": f"How do I {topic}? #{i % 50}", "k": 5}
+    return ("/slack/reply?async=true" if async_reply else "/slack/reply"), {
+        "channel": channel,
+        "thread_ts": f"1729.{i}",
+        "answer": f"Here is how to {topic}.",
+        "references": [{"title": "SOP", "url": "https://example.com/sop"}],
+        "mode": "answer",
+        "confidence": 0.9,
+    }
+
+
+async def _run(
+    client: httpx.AsyncClient,
+    scenario: str,
+    concurrency: int,
+    total: int,
+    cpu: Callable[[], Optional[float]],
+    *,
+    async_reply: bool,
+) -> Dict[str, Any]:
+    latencies: List[float] = []
+    errors: Dict[str, int] = {}
+    counter = iter(range(total))
+
+    async def _worker() -> None:
+        for i in counter:
+            path, body = _payload(scenario, i, async_reply=async_reply)
+            started = time.perf_counter()
+            try:
+                response = await client.post(path, json=body)
+                outcome = None if response.status_code < 400 else str(response.status_code)
+            except httpx.HTTPError as exc:
+                outcome = type(exc).__name__
+            latencies.append(time.perf_counter() - started)
+            if outcome is not None:
+                errors[outcome] = errors.get(outcome, 0) + 1
+
+    cpu_before = cpu()
+    started = time.perf_counter()
+    await asyncio.gather(*(_worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    cpu_after = cpu()
+    latencies.sort()
+    return {
+        "scenario": scenario,
+        "concurrency": concurrency,
+        "requests": total,
+        "errors": errors,
+        "rps": round(total / elapsed, 1),
+        "p50_ms": round(_percentile(latencies, 0.50) * 1000, 2),
+        "p95_ms": round(_percentile(latencies, 0.95) * 1000, 2),
+        "p99_ms": round(_percentile(latencies, 0.99) * 1000, 2),
+        "cpu_ms_per_request": (
+            round((cpu_after - cpu_before) * 1000 / total, 3)
+            if cpu_before is not None and cpu_after is not None
+            else None
+        ),
+    }
+
+
+async def _wait_ready(client: httpx.AsyncClient, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            if (await client.get("/health")).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        if time.monotonic() > deadline:
+            raise RuntimeError("service did not become healthy")
+        await asyncio.sleep(0.1)
+
+
+async def main(args: argparse.Namespace) -> Dict[str, Any]:
+    ports = {name: free_port() for name in ("embedding", "postgrest", "slack", "service")}
+    with ExitStack() as stack:
+        embedding_url = stack.enter_context(
+            serve(create_embedding_app(dim=args.dim, latency_seconds=args.embedding_latency), ports["embedding"])
+        )
+        postgrest_url = stack.enter_context(
+            serve(create_postgrest_app(latency_seconds=args.postgrest_latency), ports["postgrest"])
+        )
+        slack_url = stack.enter_context(
+            serve(
+                create_slack_app(latency_seconds=args.slack_latency, rate_limit_every=args.slack_429_every),
+                ports["slack"],
+            )
+        )
+        env = {
+            **os.environ,
+            "SLACK_BOT_TOKEN": "xoxb-bench",
+            "SLACK_API_URL": f"{slack_url}/api",
+            "SUPABASE_URL": postgrest_url,
+            "SUPABASE_SERVICE_ROLE_KEY": "bench.service.role",
+            "EMBEDDING_API_URL": f"{embedding_url}/embed",
+            "EMBEDDING_API_KEY": "bench",
+            "EMBEDDING_DIM": str(args.dim),
+            "LOG_LEVEL": os.environ.get("LOG_LEVEL", "WARNING"),
+        }
+        service = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(ports["service"]), "--log-level", "warning"],
+            env=env,
+        )
+        try:
+            async with httpx.AsyncClient(
+                base_url=f"http://127.0.0.1:{ports['service']}",
+                timeout=60.0,
+                limits=httpx.Limits(max_connections=max(args.concurrency) + 10),
+            ) as client:
+                await _wait_ready(client)
+                results = []
+                for scenario in args.scenarios:
+                    for concurrency in args.concurrency:
+                        result = await _run(
+                            client,
+                            scenario,
+                            concurrency,
+                            args.requests,
+                            lambda: _process_cpu_seconds(service.pid),
+                            async_reply=args.async_reply,
+                        )
+                        results.append(result)
+                        print(json.dumps(result), file=sys.stderr)
+        finally:
+            service.terminate()
+            service.wait(timeout=30)
+
+    return {
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "settings": {k: v for k, v in vars(args).items() if k != "output"},
+        "results": results,
+    }
+
+
+def _csv_ints(value: str) -> List[int]:
+    return [int(part) for part in value.split(",") if part]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", type=lambda v: v.split(","), default=["upsert", "search", "reply"])
+    parser.add_argument("--concurrency", type=_csv_ints, default=[1, 10, 50])
+    parser.add_argument("--requests", type=int, default=500, help="requests per scenario and concurrency level")
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--embedding-latency", type=float, default=0.02)
+    parser.add_argument("--postgrest-latency", type=float, default=0.01)
+    parser.add_argument("--slack-latency", type=float, default=0.03)
+    parser.add_argument("--slack-429-every", type=int, default=0, help="answer every Nth Slack post with a 429")
+    parser.add_argument("--async-reply", action="store_true", help="use /slack/reply?async=true")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+    report = asyncio.run(main(args))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            json.dump(report, handle, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
@@ -0,0 +1,106 @@
+"""Cost of a log call under the previous setup and the batched JSON pipeline.
+
+Run with ``python -m bench.logging_overhead``; prints one JSON line per
+(setup, scenario). ``text`` is the previous configuration: loguru's
+``enqueue=True`` stdout handler with the default format. ``json`` is the
+current ``LOG_FORMAT=json`` sink with sampling at ``--burst``, and
+``json_unsampled`` the same sink with sampling off. ``info`` logs a short
+message; ``outage`` calls ``logger.exception`` from one call site, as the
+routers do on every failed embedding or RPC while a provider is down.
+``caller_us`` is the time spent in the log call itself, ``drained_us`` also
+counts waiting for everything to reach the file, and ``cpu_us`` is process
+CPU (all threads) per call. Output goes to ``os.devnull``.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import time
+from typing import Callable, Dict, Tuple
+
+from loguru import logger
+
+for key, value in {
+    "SLACK_BOT_TOKEN": "xoxb-bench",
+    "SUPABASE_URL": "http://127.0.0.1:1",
+    "SUPABASE_SERVICE_ROLE_KEY": "bench",
+    "EMBEDDING_API_URL": "http://127.0.0.1:1/embed",
+    "EMBEDDING_API_KEY": "bench",
+}.items():
+    os.environ.setdefault(key, value)
+
+from app.logging import BatchingJsonSink, ErrorSampler  # noqa: E402
+
+
+def _text(stream) -> Tuple[int, Callable[[], None]]:
+    handler = logger.add(stream, level="INFO", enqueue=True, colorize=False, backtrace=False, diagnose=False)
+    return handler, logger.complete
+
+
+def _json(stream, burst: int) -> Tuple[int, Callable[[], None]]:
+    sink = BatchingJsonSink(
+        stream,
+        max_queue=1_000_000,
+        batch_size=256,
+        flush_interval_seconds=0.1,
+        sampler=ErrorSampler(burst, 60.0) if burst else None,
+    )
+    handler = logger.add(sink.write, level="INFO", format=lambda _: "", backtrace=False, diagnose=False)
+    return handler, sink.flush
+
+
+def _info(index: int) -> None:
+    logger.info("local index synced {} rows ({} total)", index, index * 10)
+
+
+def _outage(index: int) -> None:
+    try:
+        raise ConnectionError(f"embedding provider unreachable (attempt {index})")
+    except ConnectionError:
+        logger.exception("embedding failed")
+
+
+def _measure(setup: Callable, scenario: Callable[[int], None], calls: int) -> Dict[str, float]:
+    with open(os.devnull, "w") as stream:
+        handler, drain = setup(stream)
+        try:
+            for index in range(100):
+                scenario(index)
+            drain()
+            cpu_started, started = time.process_time(), time.perf_counter()
+            for index in range(calls):
+                scenario(index)
+            caller = time.perf_counter() - started
+            drain()
+            drained = time.perf_counter() - started
+            cpu = time.process_time() - cpu_started
+        finally:
+            logger.remove(handler)
+    return {
+        "caller_us": round(caller / calls * 1e6, 2),
+        "drained_us": round(drained / calls * 1e6, 2),
+        "cpu_us": round(cpu / calls * 1e6, 2),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=20000)
+    parser.add_argument("--burst", type=int, default=5)
+    args = parser.parse_args()
+
+    logger.remove()
+    setups = {
+        "text": _text,
+        "json": lambda stream: _json(stream, args.burst),
+        "json_unsampled": lambda stream: _json(stream, 0),
+    }
+    for scenario_name, scenario in (("info", _info), ("outage", _outage)):
+        for setup_name, setup in setups.items():
+            result = _measure(setup, scenario, args.calls)
+            print(json.dumps({"setup": setup_name, "scenario": scenario_name, "calls": args.calls, **result}))
+
+
+if __name__ == "__main__":
+    main()
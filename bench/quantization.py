@@ -0,0 +1,68 @@
+"""Recall loss and memory saved per vector codec, plus RPC payload size.
+
+Run with ``python -m bench.quantization``; prints one JSON line per setting.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import time
+
+import numpy as np
+
+from app.ann import FlatEngine, QuantizedFlatEngine
+from app.quantization import CODECS, format_vector_literal
+
+from .ann_recall import _dataset
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--vectors", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--clusters", type=int, default=50)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--pq-subvectors", type=int, default=96)
+    args = parser.parse_args()
+
+    data, queries = _dataset(args.vectors, args.queries, args.dim, args.clusters, seed=0)
+    ids = np.arange(len(data), dtype=np.int64)
+    exact = FlatEngine(args.dim)
+    exact.add(ids, data)
+    truth = [set(exact.search(query, args.k)[0].tolist()) for query in queries]
+    baseline_bytes = data.nbytes
+
+    for codec in CODECS:
+        for rerank_factor in (1, 4, 16):
+            engine = QuantizedFlatEngine(
+                args.dim, codec=codec, rerank_factor=rerank_factor, pq_subvectors=args.pq_subvectors
+            )
+            engine.add(ids, data)
+            hits = 0
+            started = time.perf_counter()
+            for query, expected in zip(queries, truth):
+                hits += len(expected & set(engine.search(query, args.k)[0].tolist()))
+            elapsed = time.perf_counter() - started
+            print(
+                json.dumps(
+                    {
+                        "codec": codec,
+                        "rerank_factor": rerank_factor,
+                        "recall": round(hits / (args.k * len(queries)), 4),
+                        "bytes": engine.nbytes,
+                        "memory_saved": round(1 - engine.nbytes / baseline_bytes, 4),
+                        "mean_ms": round(elapsed / len(queries) * 1000, 3),
+                    }
+                )
+            )
+
+    vector = data[0].tolist()
+    full = len(json.dumps({"query_embedding": vector}))
+    for digits in (4, 5, 6):
+        compact = len(json.dumps({"query_embedding": format_vector_literal(vector, digits)}))
+        print(json.dumps({"rpc_payload_digits": digits, "bytes": compact, "full_precision_bytes": full}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""Time and allocations of the ``/memory/search`` response path, before and after the fast path.
+
+Run with ``python -m bench.search_response``; prints one JSON line per
+(path, k) pair. ``validated`` replays the previous path: ``Response.json``,
+``Match(**row)``, then FastAPI's ``response_model`` dump, revalidation and
+stdlib ``json.dumps``. ``fast`` is the current one: a single ``orjson``
+parse, ``model_construct`` and one ``orjson`` dump. ``ndjson`` is the fast
+path with ``Accept: application/x-ndjson``, where only one match is
+encoded at a time. ``peak_kib`` is the tracemalloc peak for one request.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List
+
+for key, value in {
+    "SLACK_BOT_TOKEN": "xoxb-bench",
+    "SUPABASE_URL": "http://127.0.0.1:1",
+    "SUPABASE_SERVICE_ROLE_KEY": "bench",
+    "EMBEDDING_API_URL": "http://127.0.0.1:1/embed",
+    "EMBEDDING_API_KEY": "bench",
+}.items():
+    os.environ.setdefault(key, value)
+
+import httpx  # noqa: E402
+from pydantic import TypeAdapter  # noqa: E402
+
+from app import fastjson  # noqa: E402
+from app.domain.schemas import Match, SearchResponse  # noqa: E402
+from app.routers.memory import _match  # noqa: E402
+
+_ADAPTER = TypeAdapter(SearchResponse)
+
+
+def _rpc_body(k: int, answer_chars: int) -> bytes:
+    rows = [
+        {
+            "id": position,
+            "q_text": f"How do I fix problem {position}?",
+            "a_text": ("Restart the service and check the logs. " * (answer_chars // 40 + 1))[:answer_chars],
+            "source_url": f"https://kb.example/{position}",
+            "ts": "2024-05-01T12:00:00+00:00",
+            "distance": position / 100,
+        }
+        for position in range(k)
+    ]
+    return json.dumps(rows).encode()
+
+
+def _rows(data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return [
+        {
+            "id": int(row["id"]),
+            "q_text": row["q_text"],
+            "a_text": row["a_text"],
+            "source_url": row.get("source_url"),
+            "ts": row.get("ts"),
+            "score": float(row.get("distance", 0.0)),
+        }
+        for row in data
+    ]
+
+
+def validated(body: bytes) -> bytes:
+    data = httpx.Response(200, content=body).json()
+    response = SearchResponse(matches=[Match(**row) for row in _rows(data)])
+    revalidated = _ADAPTER.validate_python(response.model_dump())
+    content = _ADAPTER.dump_python(revalidated, mode="json")
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode()
+
+
+def fast(body: bytes) -> bytes:
+    data = fastjson.loads(httpx.Response(200, content=body).content)
+    matches = [_match(row) for row in _rows(data)]
+    return fastjson.dumps({"matches": [vars(match) for match in matches]})
+
+
+def ndjson(body: bytes) -> int:
+    data = fastjson.loads(httpx.Response(200, content=body).content)
+    sent = 0
+    for match in (_match(row) for row in _rows(data)):
+        sent += len(fastjson.dumps(vars(match)) + b"\n")  # each line is written out, then dropped
+    return sent
+
+
+def _measure(path: Callable[[bytes], object], body: bytes, iterations: int) -> Dict[str, float]:
+    path(body)
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        path(body)
+        timings.append(time.perf_counter() - started)
+    tracemalloc.start()
+    path(body)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "p50_us": round(statistics.median(timings) * 1e6, 1),
+        "mean_us": round(statistics.fmean(timings) * 1e6, 1),
+        "peak_kib": round(peak / 1024, 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--k", default="5,20")
+    parser.add_argument("--answer-chars", type=int, default=4000)
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    for k in (int(value) for value in args.k.split(",")):
+        body = _rpc_body(k, args.answer_chars)
+        assert json.loads(validated(body)) == json.loads(fast(body))
+        paths = (("validated", validated), ("fast", fast), ("ndjson", ndjson))
+        results = {name: _measure(path, body, args.iterations) for name, path in paths}
+        for name, result in results.items():
+            print(json.dumps({"path": name, "k": k, "rpc_bytes": len(body), **result}))
+        print(
+            json.dumps(
+                {
+                    "k": k,
+                    "speedup": round(results["validated"]["p50_us"] / results["fast"]["p50_us"], 2),
+                    "ndjson_peak_memory_saved": round(
+                        1 - results["ndjson"]["peak_kib"] / results["validated"]["peak_kib"], 3
+                    ),
+                }
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
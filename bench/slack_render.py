@@ -0,0 +1,134 @@
+"""Per-message cost of rendering Slack replies.
+
+Run with ``python -m bench.slack_render``; prints one JSON line per
+(renderer, answer). ``previous`` is the old ``_build_message``: split every
+word, join the first ``MAX_ANSWER_WORDS`` again, then ``str.format`` each
+line. ``text`` and ``blocks`` are ``_build_message`` under
+``SLACK_REPLY_FORMAT=text`` and ``blocks``, and ``blocks_json`` also
+serializes the body, as posting it does. ``short`` is a one-line answer,
+``long`` a 1200-character answer over the word limit, and ``emoji`` a long
+answer full of flags, ZWJ sequences and combining marks. ``us_per_message``
+is the median over ``--rounds`` of ``--messages`` renders; ``body_bytes``
+is the size of the resulting ``chat.postMessage`` body.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import time
+from typing import Any, Callable, Dict, List
+
+for key, value in {
+    "SLACK_BOT_TOKEN": "xoxb-bench",
+    "SUPABASE_URL": "http://127.0.0.1:1",
+    "SUPABASE_SERVICE_ROLE_KEY": "bench",
+    "EMBEDDING_API_URL": "http://127.0.0.1:1/embed",
+    "EMBEDDING_API_KEY": "bench",
+    "LOG_LEVEL": "ERROR",
+}.items():
+    os.environ.setdefault(key, value)
+
+from app import fastjson  # noqa: E402
+from app.domain import policy  # noqa: E402
+from app.domain.schemas import Reference, SlackReplyRequest  # noqa: E402
+from app.logging import configure_logging  # noqa: E402
+from app.routers import slack  # noqa: E402
+
+
+def _previous(payload: SlackReplyRequest) -> Dict[str, Any]:
+    words = payload.answer.split()
+    if len(words) > policy.MAX_ANSWER_WORDS:
+        trimmed = " ".join(words[: policy.MAX_ANSWER_WORDS])
+    else:
+        trimmed = payload.answer
+    lines: List[str] = [f"[Auto-Reply] {trimmed.strip()}"]
+    refs = payload.references[: policy.MAX_SOURCES]
+    if refs:
+        lines.append("Sources:")
+        for ref in refs:
+            lines.append(f"• <{ref.url}|{ref.title}>")
+    if payload.mode == "followup" and "?" not in trimmed:
+        lines.append("Clarifying question: Could you share a bit more detail?")
+    lines.append(f"Confidence: {payload.confidence:.2f}")
+    return {"text": "\n".join(lines)}
+
+
+def _answers() -> Dict[str, str]:
+    emoji = "Ship it 🇳🇴 👨‍👩‍👧 café crème 👍🏽 — "
+    return {
+        "short": "Use the IT portal to request VPN access.",
+        "long": ("Open the IT portal, pick VPN access, and wait for the approval email. " * 20)[:1200],
+        "emoji": (emoji * 60)[:1200],
+    }
+
+
+def _payload(answer: str) -> SlackReplyRequest:
+    return SlackReplyRequest(
+        channel="C1",
+        thread_ts="1729.1",
+        answer=answer,
+        references=[
+            Reference(title="How do I get VPN access?", url="https://wiki.example.com/vpn", memory_id=41),
+            Reference(title="VPN troubleshooting & FAQ", url="https://wiki.example.com/vpn-faq", memory_id=42),
+        ],
+        mode="answer",
+        confidence=0.91,
+        memory_id=41,
+    )
+
+
+def _with_format(reply_format: str) -> Callable[[SlackReplyRequest], Dict[str, Any]]:
+    config = slack.settings.model_copy(update={"slack_reply_format": reply_format})
+
+    def render(payload: SlackReplyRequest) -> Dict[str, Any]:
+        slack.settings = config
+        return slack._build_message(payload)
+
+    return render
+
+
+def _measure(
+    render: Callable[[SlackReplyRequest], Any], payload: SlackReplyRequest, messages: int, rounds: int
+) -> float:
+    samples = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        for _ in range(messages):
+            render(payload)
+        samples.append((time.perf_counter() - started) / messages * 1e6)
+    return round(statistics.median(samples), 2)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    configure_logging()  # truncation warnings go through the batched sink, as in the service
+    blocks = _with_format("blocks")
+    renderers = {
+        "previous": _previous,
+        "text": _with_format("text"),
+        "blocks": blocks,
+        "blocks_json": lambda payload: fastjson.dumps(slack._message_body(payload, blocks(payload))),
+    }
+    for answer_name, answer in _answers().items():
+        payload = _payload(answer)
+        for name, render in renderers.items():
+            message = render(payload)
+            body = message if isinstance(message, bytes) else fastjson.dumps(slack._message_body(payload, message))
+            result = {
+                "renderer": name,
+                "answer": answer_name,
+                "messages": args.messages,
+                "us_per_message": _measure(render, payload, args.messages, args.rounds),
+                "body_bytes": len(body),
+            }
+            print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
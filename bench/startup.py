@@ -0,0 +1,143 @@
+"""Where a cold start spends its time: module imports, then startup steps.
+
+Run with ``python -m bench.startup``. ``imports`` runs
+``python -X importtime -c "import app.main"`` and sums self time per
+top-level package, plus the slowest single modules. ``startup`` starts the
+service under uvicorn against the fake embedding, PostgREST and Slack
+servers, once per ``FAST_STARTUP`` mode, and reports time from process start
+to the first ``/health`` 200 (process up) and to the first
+``/health/ready`` 200 (dependencies warm), with the per-step breakdown the
+service reports under ``startup``. Prints one JSON document.
+"""
+from __future__ import annotations
+
+import argparse
+from collections import defaultdict
+from contextlib import ExitStack
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Tuple
+
+import httpx
+
+from .fakes import create_embedding_app, create_postgrest_app, create_slack_app, free_port, serve
+
+_IMPORT_ENV = {
+    "SLACK_BOT_TOKEN": "xoxb-bench",
+    "SUPABASE_URL": "http://127.0.0.1:1",
+    "SUPABASE_SERVICE_ROLE_KEY": "bench",
+    "EMBEDDING_API_URL": "http://127.0.0.1:1/embed",
+    "EMBEDDING_API_KEY": "bench",
+}
+
+
+def _import_times() -> List[Tuple[str, int]]:
+    """``(module, self_us)`` for every module ``import app.main`` loads, in import order."""
+
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        env={**_IMPORT_ENV, **os.environ},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = line[len("import time:") :].split("|")
+        modules.append((name.strip(), int(self_us)))
+    return modules
+
+
+def imports(runs: int, top: int) -> Dict[str, Any]:
+    _import_times()  # the first run also writes bytecode caches
+    samples = [_import_times() for _ in range(runs)]
+    by_module: Dict[str, List[int]] = defaultdict(list)
+    for sample in samples:
+        for name, self_us in sample:
+            by_module[name].append(self_us)
+    median_us = {name: statistics.median(values) for name, values in by_module.items()}
+    by_package: Dict[str, float] = defaultdict(float)
+    for name, self_us in median_us.items():
+        by_package[name.split(".")[0]] += self_us
+    return {
+        "total_ms": round(statistics.median(sum(us for _, us in sample) for sample in samples) / 1000, 1),
+        "modules": len(median_us),
+        "packages_ms": {
+            name: round(us / 1000, 1) for name, us in sorted(by_package.items(), key=lambda item: -item[1])[:top]
+        },
+        "slowest_modules_ms": {
+            name: round(us / 1000, 1) for name, us in sorted(median_us.items(), key=lambda item: -item[1])[:top]
+        },
+        "heavy_modules_loaded": sorted({"numpy", "supabase", "sqlite3"} & set(median_us)),
+    }
+
+
+def _wait_for(client: httpx.Client, path: str, started: float, timeout: float) -> float:
+    while time.perf_counter() - started < timeout:
+        try:
+            if client.get(path).status_code == 200:
+                return round((time.perf_counter() - started) * 1000, 1)
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.005)
+    raise RuntimeError(f"{path} did not return 200 within {timeout}s")
+
+
+def startup(urls: Dict[str, str], fast_startup: bool, dim: int) -> Dict[str, Any]:
+    port = free_port()
+    env = {
+        **os.environ,
+        "SLACK_BOT_TOKEN": "xoxb-bench",
+        "SLACK_API_URL": f"{urls['slack']}/api",
+        "SUPABASE_URL": urls["postgrest"],
+        "SUPABASE_SERVICE_ROLE_KEY": "bench.service.role",
+        "EMBEDDING_API_URL": f"{urls['embedding']}/embed",
+        "EMBEDDING_API_KEY": "bench",
+        "EMBEDDING_DIM": str(dim),
+        "FAST_STARTUP": str(fast_startup).lower(),
+        "LOG_LEVEL": os.environ.get("LOG_LEVEL", "WARNING"),
+    }
+    started = time.perf_counter()
+    service = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"], env=env
+    )
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=5.0) as client:
+            up_ms = _wait_for(client, "/health", started, 60.0)
+            ready_ms = _wait_for(client, "/health/ready", started, 60.0)
+            report = client.get("/health").json()["startup"]
+    finally:
+        service.terminate()
+        service.wait(timeout=30)
+    return {"fast_startup": fast_startup, "process_up_ms": up_ms, "ready_ms": ready_ms, "startup": report}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="import profiles to take the median of")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--embedding-latency", type=float, default=0.0)
+    args = parser.parse_args()
+
+    result: Dict[str, Any] = {"imports": imports(args.runs, args.top)}
+    with ExitStack() as stack:
+        urls = {
+            "embedding": stack.enter_context(
+                serve(create_embedding_app(dim=args.dim, latency_seconds=args.embedding_latency), free_port())
+            ),
+            "postgrest": stack.enter_context(serve(create_postgrest_app(), free_port())),
+            "slack": stack.enter_context(serve(create_slack_app(), free_port())),
+        }
+        result["startup"] = [startup(urls, fast, args.dim) for fast in (False, True)]
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Compare the thread-pool supabase-py insert with the async PostgREST path.
+
+Run with ``python -m bench.supabase_writes``; prints one JSON line per
+(path, concurrency) pair.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+from typing import Any, Awaitable, Callable, Dict, List
+
+from .fakes import create_postgrest_app, free_port, serve
+
+PORT = free_port()
+os.environ.update(
+    {
+        "SLACK_BOT_TOKEN": "xoxb-bench",
+        "SUPABASE_URL": f"http://127.0.0.1:{PORT}",
+        # supabase-py only accepts JWT-shaped keys.
+        "SUPABASE_SERVICE_ROLE_KEY": "bench.service.role",
+        "EMBEDDING_API_URL": "http://127.0.0.1:1/embed",
+        "EMBEDDING_API_KEY": "bench",
+        "EMBEDDING_DIM": "1536",
+    }
+)
+
+from app.config import settings  # noqa: E402
+from app.deps import get_supabase_client, shutdown_dependencies  # noqa: E402
+from app.supa import insert_memory  # noqa: E402
+
+
+async def _thread_pool_insert(row: Dict[str, Any]) -> int:
+    """The previous write path: sync supabase-py in the default executor."""
+
+    def _insert_sync() -> int:
+        response = get_supabase_client().table(settings.supabase_table).insert(row).execute()
+        return int(response.data[0]["id"])
+
+    return await asyncio.to_thread(_insert_sync)
+
+
+async def _run(insert: Callable[[Dict[str, Any]], Awaitable[int]], concurrency: int, total: int) -> Dict[str, Any]:
+    row = {"channel": "C1", "q_text": "q", "a_text": "a", "embedding": [0.01] * settings.embedding_dim}
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+
+    async def _one() -> None:
+        async with semaphore:
+            started = time.perf_counter()
+            await insert(row)
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(_one() for _ in range(total)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "concurrency": concurrency,
+        "requests": total,
+        "rps": round(total / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "p99_ms": round(latencies[int(len(latencies) * 0.99) - 1] * 1000, 2),
+    }
+
+
+async def main(total: int, latency: float) -> None:
+    with serve(create_postgrest_app(latency_seconds=latency), PORT):
+        for concurrency in (1, 10, 100):
+            for name, insert in (("thread_pool", _thread_pool_insert), ("async_postgrest", insert_memory)):
+                result = await _run(insert, concurrency, total)
+                print(json.dumps({"path": name, **result}))
+        await shutdown_dependencies()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--latency", type=float, default=0.02, help="simulated PostgREST latency in seconds")
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.latency))
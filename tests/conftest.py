@@ -2,6 +2,8 @@ from __future__ import annotations
 
 import os
 
+import pytest
+
 pytest_plugins = ["respx"]
 
 _env_defaults = {
@@ -21,3 +23,89 @@ _env_defaults = {
 
 for key, value in _env_defaults.items():
     os.environ.setdefault(key, value)
+
+
+@pytest.fixture(autouse=True)
+def _fresh_embedding_cache(monkeypatch: pytest.MonkeyPatch):
+    """Give each test its own memory-only cache so a configured disk file is never touched."""
+
+    from app.config import settings
+    from app.embedding_cache import EmbeddingCache
+
+    cache = EmbeddingCache(
+        max_entries=settings.embedding_cache_size, ttl_seconds=settings.embedding_cache_ttl_seconds
+    )
+    monkeypatch.setattr("app.deps._embedding_cache", cache)
+    yield cache
+
+
+@pytest.fixture(autouse=True)
+def _fresh_embedding_dispatcher(monkeypatch: pytest.MonkeyPatch):
+    """Each test runs on its own event loop, so never reuse a loop-bound dispatcher."""
+
+    monkeypatch.setattr("app.embeddings._dispatcher", None)
+    yield
+
+
+@pytest.fixture(autouse=True)
+def _fresh_slack_outbox(monkeypatch: pytest.MonkeyPatch):
+    """The outbox worker is loop-bound too, and must never reuse a configured journal."""
+
+    monkeypatch.setattr("app.slack_outbox._outbox", None)
+    monkeypatch.setattr("app.routers.slack_events._pool", None)
+    monkeypatch.setattr("app.routers.slack_events._deduper", None)
+    yield
+
+
+@pytest.fixture(autouse=True)
+def _fresh_tracer(monkeypatch: pytest.MonkeyPatch):
+    """Keep traces in memory only and isolated per test."""
+
+    from app.tracing import Tracer
+
+    tracer = Tracer(sample_rate=0.0, slow_threshold_seconds=0.0, buffer_size=64)
+    monkeypatch.setattr("app.tracing._tracer", tracer)
+    yield tracer
+
+
+@pytest.fixture(autouse=True)
+def _fresh_semantic_cache(monkeypatch: pytest.MonkeyPatch):
+    from app.config import settings
+    from app.semantic_cache import SemanticCache
+
+    cache = SemanticCache(
+        max_entries=settings.semantic_cache_size,
+        ttl_seconds=settings.semantic_cache_ttl_seconds,
+        min_similarity=settings.semantic_cache_min_similarity,
+    )
+    monkeypatch.setattr("app.deps._semantic_cache", cache)
+    yield cache
+
+
+@pytest.fixture(autouse=True)
+def _fresh_lexical_index(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr("app.deps._lexical_index", None)
+    yield
+
+
+@pytest.fixture(autouse=True)
+def _fresh_dependency_guards(monkeypatch: pytest.MonkeyPatch):
+    """Breakers and concurrency limits carry failures over, so start every test with closed ones."""
+
+    monkeypatch.setattr("app.deps._http_clients", {})
+    monkeypatch.setattr("app.deps._limiters", {})
+    monkeypatch.setattr("app.deps._breakers", {})
+    yield
+
+
+@pytest.fixture(autouse=True)
+def _fresh_startup(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr("app.deps._startup", None)
+    yield
+
+
+@pytest.fixture(autouse=True)
+def _fresh_shards(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr("app.deps._shard_semantic_caches", {})
+    monkeypatch.setattr("app.deps._shard_usage_trackers", {})
+    yield
@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+import httpx
+from httpx import AsyncClient
+import numpy as np
+import pytest
+
+from app import compaction
+from app.config import settings
+from app.dedup import cluster_duplicates, decide, fold_duplicates, jaccard, minhash
+from app.main import app
+
+THRESHOLDS = {"min_cosine": 0.95, "min_jaccard": 0.6}
+
+
+def _neighbour(memory_id: int, distance: float, q_text: str, a_text: str, **extra) -> dict:
+    return {"id": memory_id, "score": distance, "q_text": q_text, "a_text": a_text, **extra}
+
+
+def test_minhash_estimates_question_overlap():
+    assert jaccard(minhash("How do I request VPN access?"), minhash("how do I request vpn access")) == 1.0
+    assert jaccard(minhash("How do I request VPN access?"), minhash("Where is the cafeteria menu?")) < 0.2
+
+
+def test_decide_merges_updates_or_skips():
+    row = {"q_text": "How do I request VPN access?", "a_text": "Use the IT portal.", "source_url": "https://it/vpn"}
+    same = _neighbour(1, 0.01, "how do i request vpn access", "Use the IT portal")
+    assert decide(row, [same], **THRESHOLDS).action == "merge"
+    assert decide(row, [{**same, "source_url": "https://old"}], **THRESHOLDS).action == "skip"
+
+    changed = decide(row, [_neighbour(2, 0.02, "How to request VPN access?", "Email the helpdesk.")], **THRESHOLDS)
+    assert (changed.action, changed.memory_id, changed.changes["a_text"]) == ("update", 2, "Use the IT portal.")
+
+    paraphrase = _neighbour(3, 0.03, "What is needed to get onto the corporate network remotely?", "x")
+    assert decide(row, [paraphrase], **THRESHOLDS).action == "insert"
+    assert decide(row, [{**same, "score": 0.2}], **THRESHOLDS).action == "insert"
+
+
+def test_fold_and_cluster_find_duplicates_in_a_batch():
+    vector = [1.0, 0.0, 0.0]
+    rows = [
+        {"q_text": "Reset my password", "a_text": "Use SSO.", "embedding": vector},
+        {"q_text": "Book a meeting room", "a_text": "Use the calendar.", "embedding": [0.0, 1.0, 0.0]},
+        {"q_text": "reset my password!", "a_text": "Use SSO", "source_url": "https://sso", "embedding": vector},
+    ]
+    decisions = fold_duplicates(rows, **THRESHOLDS)
+    assert [d.action for d in decisions] == ["insert", "insert", "merge"]
+    assert decisions[2].memory_id == 0 and rows[0]["source_url"] == "https://sso"
+
+    clusters = cluster_duplicates(rows, np.asarray([row["embedding"] for row in rows]), **THRESHOLDS)
+    assert clusters == [[0, 2]]
+
+
+@pytest.mark.asyncio
+async def test_upsert_updates_existing_duplicate(monkeypatch: pytest.MonkeyPatch, respx_mock):
+    monkeypatch.setattr(
+        "app.routers.memory.settings", settings.model_copy(update={"dedup_enabled": True})
+    )
+    respx_mock.post(str(settings.embedding_api_url)).mock(
+        return_value=httpx.Response(200, json={"embedding": [0.1] * settings.embedding_dim})
+    )
+    updates = []
+
+    async def fake_search(**kwargs):
+        assert kwargs["k"] == settings.dedup_neighbours
+        return [_neighbour(9, 0.01, "How do I request VPN?", "Ask IT.")]
+
+    async def fake_update(memory_id, channel, changes):
+        updates.append((memory_id, channel, changes))
+
+    async def fail_insert(row):  # pragma: no cover - must not be called
+        raise AssertionError("duplicate was inserted")
+
+    monkeypatch.setattr("app.routers.memory.search_memory", fake_search)
+    monkeypatch.setattr("app.routers.memory.update_memory", fake_update)
+    monkeypatch.setattr("app.routers.memory.insert_memory", fail_insert)
+
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        resp = await client.post(
+            "/memory/upsert", json={"channel": "C1", "q_text": "how do I request VPN", "a_text": "Use the portal."}
+        )
+
+    assert resp.json() == {"id": 9, "action": "updated"}
+    assert updates == [(9, "C1", {"a_text": "Use the portal."})]
+
+
+@pytest.mark.asyncio
+async def test_compaction_deletes_all_but_the_newest_copy(monkeypatch: pytest.MonkeyPatch):
+    rows = [
+        {"id": 1, "channel": "C1", "q_text": "Reset my password", "a_text": "a", "ts": "2024-01-01T00:00:00+00:00"},
+        {"id": 2, "channel": "C1", "q_text": "reset my password?", "a_text": "b", "ts": "2024-03-01T00:00:00+00:00"},
+        {"id": 3, "channel": "C1", "q_text": "Book a room", "a_text": "c", "ts": None},
+    ]
+    embeddings = [[1.0, 0.0], [0.99, 0.01], [0.0, 1.0]]
+    deleted = []
+
+    async def fake_pages(**kwargs):
+        yield [{**row, "embedding": embedding} for row, embedding in zip(rows, embeddings)]
+
+    async def fake_delete(ids, channels=()):
+        deleted.extend(ids)
+        return len(ids)
+
+    monkeypatch.setattr(compaction, "iter_memory_pages", fake_pages)
+    monkeypatch.setattr(compaction, "delete_memories", fake_delete)
+
+    dry_run = await compaction.compact(apply=False, **THRESHOLDS)
+    assert (dry_run["rows_scanned"], dry_run["rows_reclaimed"], deleted) == (3, 1, [])
+
+    report = await compaction.compact(apply=True, **THRESHOLDS)
+    assert report["clusters"] == 1 and deleted == [1]
@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+import httpx
+
+from app.config import settings
+from app.embedding_batcher import EmbeddingDispatcher
+from app.embedding_cache import EmbeddingCache, make_cache_key
+from app.embeddings import embed
+
+
+@pytest.mark.asyncio
+async def test_embed_uses_cache_for_normalized_text(respx_mock):
+    vector = [0.5] * settings.embedding_dim
+    route = respx_mock.post(str(settings.embedding_api_url)).mock(
+        return_value=httpx.Response(200, json={"embedding": vector})
+    )
+
+    first = await embed("How do I get VPN?")
+    second = await embed("  How do I   get VPN? ")
+
+    assert first == second == vector
+    assert route.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_cache_evicts_lru_and_persists_to_disk(tmp_path):
+    path = str(tmp_path / "embeddings.sqlite")
+    cache = EmbeddingCache(max_entries=2, ttl_seconds=60, path=path)
+    keys = [make_cache_key(f"q{i}", dim=2, provider="p") for i in range(3)]
+    for i, key in enumerate(keys):
+        cache.put(key, [float(i), 0.5])
+
+    assert len(cache) == 2
+    assert cache.stats.evictions == 1
+    await cache.close()
+
+    reopened = EmbeddingCache(max_entries=2, ttl_seconds=60, path=path)
+    assert await reopened.get(keys[0]) == [0.0, 0.5]
+    assert reopened.stats.disk_hits == 1
+    assert await reopened.get(make_cache_key("missing", dim=2, provider="p")) is None
+    assert reopened.stats.misses == 1
+    await reopened.close()
+
+
+@pytest.mark.asyncio
+async def test_disk_hit_keeps_original_expiry(tmp_path, monkeypatch: pytest.MonkeyPatch):
+    path = str(tmp_path / "embeddings.sqlite")
+    clock = [1000.0]
+    monkeypatch.setattr("app.embedding_cache.time.time", lambda: clock[0])
+    cache = EmbeddingCache(max_entries=0, ttl_seconds=60, path=path)
+    key = make_cache_key("q", dim=1, provider="p")
+    cache.put(key, [1.0])
+    await cache.close()
+
+    reopened = EmbeddingCache(max_entries=4, ttl_seconds=60, path=path)
+    clock[0] = 1050.0
+    assert await reopened.get(key) == [1.0]
+    clock[0] = 1070.0
+    assert await reopened.get(key) is None
+    await reopened.close()
+
+
+@pytest.mark.asyncio
+async def test_dispatcher_batches_and_deduplicates():
+    calls: list[list[str]] = []
+
+    async def fetch_one(text: str) -> list[float]:
+        raise AssertionError("batched provider should not receive single calls")
+
+    async def fetch_many(texts: list[str]) -> list[list[float]]:
+        calls.append(texts)
+        return [[float(len(text))] for text in texts]
+
+    dispatcher = EmbeddingDispatcher(
+        fetch_one=fetch_one, fetch_many=fetch_many, window_seconds=0.005, max_batch_size=8
+    )
+    results = await asyncio.gather(
+        dispatcher.submit("vpn"), dispatcher.submit("vpn"), dispatcher.submit("reset password")
+    )
+
+    assert results == [[3.0], [3.0], [14.0]]
+    assert calls == [["vpn", "reset password"]]
+    assert dispatcher.batch_size_histogram.count == 1
+    assert dispatcher.queue_wait_histogram.count == 3
+
+
+@pytest.mark.asyncio
+async def test_dispatcher_fails_waiters_on_short_batch():
+    async def fetch_one(text: str) -> list[float]:
+        return [1.0]
+
+    async def fetch_many(texts: list[str]) -> list[list[float]]:
+        return [[1.0]]
+
+    dispatcher = EmbeddingDispatcher(
+        fetch_one=fetch_one, fetch_many=fetch_many, window_seconds=0, max_batch_size=8
+    )
+    results = await asyncio.gather(
+        dispatcher.submit("a"), dispatcher.submit("b"), return_exceptions=True
+    )
+
+    assert results[0] == [1.0]
+    assert isinstance(results[1], RuntimeError)
+    assert dispatcher.stats()["inflight"] == 0
@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import httpx
+from httpx import AsyncClient
+import pytest
+
+from app import deps
+from app.config import settings
+from app.lexical_index import LexicalIndex, identifier_terms, lexical_identifiers, reciprocal_rank_fusion, tokenize
+from app.main import app
+
+ROWS = [
+    {"id": 1, "channel": "C1", "q_text": "Job fails with ORA-00942", "a_text": "Grant select on the view."},
+    {"id": 2, "channel": "C1", "q_text": "How do I reset my password?", "a_text": "Use the IT portal."},
+    {"id": 3, "channel": "C1", "q_text": "db-01.prod is down", "a_text": "Fail over to db-02.prod."},
+    {"id": 4, "channel": "C2", "q_text": "ORA-00942 in reporting", "a_text": "Check the synonym."},
+]
+
+
+def test_tokenizer_keeps_identifiers_whole_and_split():
+    assert tokenize("db-01.prod down") == ["db-01.prod", "db", "01", "prod", "down"]
+    assert identifier_terms("why does INC0012345 mention db-01.prod?") == ["inc0012345", "db-01.prod"]
+    assert lexical_identifiers("ORA-00942") == ["ora-00942"]
+    assert lexical_identifiers("how do I reset the db-01 password today") == []
+
+
+def test_bm25_ranks_exact_identifier_first_and_respects_channel():
+    index = LexicalIndex(max_staleness_seconds=60)
+    assert index.add(ROWS) == 4 and index.add(ROWS[:1]) == 0
+
+    hits = index.search(channel="C1", query="ORA-00942", k=5)
+    assert [hit["id"] for hit in hits] == [1]
+    assert hits[0]["bm25"] > 0
+    assert {hit["id"] for hit in index.search(channel=None, query="ORA-00942", k=5)} == {1, 4}
+    assert index.contains_all("C1", ["db-01.prod"]) and not index.contains_all("C2", ["db-01.prod"])
+
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    fused = reciprocal_rank_fusion([[1, 2, 3], [3, 1]], k=60)
+    assert [memory_id for memory_id, _ in fused] == [1, 3, 2]
+
+
+@pytest.mark.asyncio
+async def test_identifier_query_skips_embedding(monkeypatch: pytest.MonkeyPatch, respx_mock):
+    monkeypatch.setattr(deps, "settings", settings.model_copy(update={"hybrid_search_enabled": True}))
+    index = deps.get_lexical_index()
+    index.add(ROWS)
+    index.mark_synced(4)
+    embed = respx_mock.post(str(settings.embedding_api_url)).mock(
+        return_value=httpx.Response(200, json={"embedding": [0.01] * settings.embedding_dim})
+    )
+
+    async def fake_search(**kwargs):
+        assert kwargs["k"] == 2 * settings.hybrid_candidate_factor
+        return [{"id": 2, "score": 0.2, "q_text": "q", "a_text": "a", "source_url": None, "ts": None}]
+
+    monkeypatch.setattr("app.routers.memory.search_memory", fake_search)
+
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        lexical = await client.post("/memory/search", json={"channel": "C1", "query": "ORA-00942", "k": 2})
+        assert not embed.called
+        assert [(m["id"], m["score"]) for m in lexical.json()["matches"]] == [(1, 1.0)]
+
+        hybrid = await client.post(
+            "/memory/search", json={"channel": "C1", "query": "how do I reset my password", "k": 2}
+        )
+        assert embed.call_count == 1
+        assert [(m["id"], m["score"]) for m in hybrid.json()["matches"]] == [(2, 0.2)]
+
+
+def test_updated_and_removed_rows_are_reindexed():
+    index = LexicalIndex(max_staleness_seconds=60)
+    index.add(ROWS)
+    index.update(2, {"a_text": "Open a ticket with INC0012345."})
+    assert [hit["id"] for hit in index.search(channel="C1", query="INC0012345", k=5)] == [2]
+    assert index.search(channel="C1", query="portal", k=5) == []
+
+    assert index.remove([1, 99]) == 1
+    assert [hit["id"] for hit in index.search(channel=None, query="ORA-00942", k=5)] == [4]
@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import io
+import json
+
+from httpx import AsyncClient
+from loguru import logger
+import pytest
+
+from app import logging as app_logging
+from app.logging import BatchingJsonSink, ErrorSampler
+from app.main import app
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_sampler_admits_a_burst_per_window_and_reports_the_rest():
+    clock = _Clock()
+    sampler = ErrorSampler(burst=2, window_seconds=10, clock=clock)
+
+    assert [sampler.admit("k") for _ in range(5)] == [(True, True), (True, False)] + [(False, False)] * 3
+    assert sampler.expired() == []
+    clock.now = 10
+    assert sampler.expired() == [("k", 3)]
+    assert sampler.admit("k") == (True, True)
+
+
+def test_sink_writes_json_lines_with_correlation_and_sampled_tracebacks():
+    clock = _Clock()
+    stream = io.StringIO()
+    sink = BatchingJsonSink(
+        stream, max_queue=100, batch_size=10, flush_interval_seconds=0.01, sampler=ErrorSampler(2, 60, clock)
+    )
+    handler = logger.add(sink.write, format=lambda _: "", level="INFO")
+    token = app_logging._request_id.set("req-1")
+    try:
+        for attempt in range(5):
+            try:
+                raise RuntimeError(f"provider down {attempt}")
+            except RuntimeError:
+                logger.exception("embedding failed")
+        logger.bind(channel="C1").info("done")
+        sink.flush()
+        clock.now = 60
+        sink.flush()
+    finally:
+        app_logging._request_id.reset(token)
+        logger.remove(handler)
+        sink.close()
+
+    lines = [json.loads(line) for line in stream.getvalue().splitlines()]
+    errors = [line for line in lines if line["message"] == "embedding failed"]
+    assert len(errors) == 2
+    assert "Traceback" in errors[0]["exception"]["traceback"]
+    assert errors[1]["exception"] == {"type": "RuntimeError", "message": "provider down 1"}
+    assert all(line["request_id"] == "req-1" for line in errors)
+    assert next(line for line in lines if line["message"] == "done")["extra"] == {"channel": "C1"}
+    summary = next(line for line in lines if "suppressed" in line)
+    assert summary["suppressed"] == 3
+    assert sink.stats()["suppressed"] == 3
+
+
+def test_full_queue_drops_instead_of_blocking():
+    sink = BatchingJsonSink(io.StringIO(), max_queue=1, batch_size=100, flush_interval_seconds=60)
+    handler = logger.add(sink.write, format=lambda _: "", level="INFO")
+    try:
+        for _ in range(3):
+            logger.info("burst")
+    finally:
+        logger.remove(handler)
+        sink.close()
+
+    assert sink.dropped == 2
+
+
+@pytest.mark.asyncio
+async def test_request_id_is_kept_or_generated_and_echoed():
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        kept = await client.get("/", headers={"X-Request-ID": "abc-123"})
+        generated = await client.get("/", headers={"X-Request-ID": "bad id\n"})
+
+    assert kept.headers["x-request-id"] == "abc-123"
+    assert len(generated.headers["x-request-id"]) == 32
@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+import json
+
 import pytest
 import httpx
 from httpx import AsyncClient
@@ -55,3 +57,216 @@ async def test_memory_upsert_and_search(monkeypatch: pytest.MonkeyPatch, respx_m
         assert resp.status_code == 200
         data = resp.json()
         assert data["matches"][0]["score"] == pytest.approx(0.12)
+
+
+@pytest.mark.asyncio
+async def test_memory_upsert_batch_streams_results(monkeypatch: pytest.MonkeyPatch, respx_mock):
+    vector = [0.02] * settings.embedding_dim
+    respx_mock.post(str(settings.embedding_api_url)).mock(
+        return_value=httpx.Response(200, json={"embedding": vector})
+    )
+    inserted: list[list[dict]] = []
+
+    async def fake_insert_many(rows):
+        inserted.append(rows)
+        return [100 + len(inserted) * 10 + i for i in range(len(rows))]
+
+    monkeypatch.setattr("app.routers.memory.insert_memories", fake_insert_many)
+
+    rows = [
+        {"channel": "C1", "q_text": f"question {i}", "a_text": f"answer {i}"} for i in range(5)
+    ]
+    lines = [json.dumps(row) for row in rows]
+    lines.insert(3, '{"channel": "C1"}')
+    body = "\n".join(lines) + "\n"
+
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        resp = await client.post(
+            "/memory/upsert:batch",
+            params={"offset": 1, "batch_size": 2},
+            content=body,
+            headers={"content-type": "application/x-ndjson"},
+        )
+
+    assert resp.status_code == 200
+    results = sorted((json.loads(line) for line in resp.text.splitlines()), key=lambda r: r["line"])
+    assert [r["line"] for r in results] == [1, 2, 3, 4, 5]
+    assert results[2] == {"line": 3, "error": "Input validation failed"}
+    assert all("id" in r for r in results if r["line"] != 3)
+    assert sum(len(batch) for batch in inserted) == 4
+    assert all(len(batch) <= 2 for batch in inserted)
+
+
+@pytest.mark.asyncio
+async def test_memory_upsert_batch_reports_errors_per_row(monkeypatch: pytest.MonkeyPatch, respx_mock):
+    vector = [0.03] * settings.embedding_dim
+
+    def embedding_response(request):
+        if b"broken" in request.content:
+            return httpx.Response(500)
+        return httpx.Response(200, json={"embedding": vector})
+
+    respx_mock.post(str(settings.embedding_api_url)).mock(side_effect=embedding_response)
+
+    async def fake_insert_many(rows):
+        if any(row["q_text"] == "fails insert" for row in rows):
+            raise RuntimeError("insert exploded")
+        return list(range(7, 7 + len(rows)))
+
+    monkeypatch.setattr("app.routers.memory.insert_memories", fake_insert_many)
+
+    questions = ["ok one", "broken", "ok two", "fails insert"]
+    body = "\n".join(json.dumps({"channel": "C1", "q_text": q, "a_text": "a"}) for q in questions)
+
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        resp = await client.post("/memory/upsert:batch", params={"batch_size": 2}, content=body)
+
+    results = {r["line"]: r for r in (json.loads(line) for line in resp.text.splitlines())}
+    assert results[0] == {"line": 0, "id": 7}
+    assert results[1]["error"].startswith("embedding failed")
+    assert results[2]["error"] == "Unable to insert memory"
+    assert results[3]["error"] == "Unable to insert memory"
+
+
+@pytest.mark.asyncio
+async def test_insert_memories_posts_to_postgrest(respx_mock):
+    from app.supa import insert_memories
+
+    route = respx_mock.post(f"{str(settings.supabase_url).rstrip('/')}/rest/v1/{settings.supabase_table}").mock(
+        return_value=httpx.Response(201, json=[{"id": 5}, {"id": 6}])
+    )
+
+    ids = await insert_memories([{"q_text": "a"}, {"q_text": "b"}])
+
+    assert ids == [5, 6]
+    request = route.calls.last.request
+    assert request.url.params["select"] == "id"
+    assert request.headers["Content-Profile"] == settings.supabase_schema
+    assert json.loads(request.content) == [{"q_text": "a"}, {"q_text": "b"}]
+
+
+@pytest.mark.asyncio
+async def test_search_reuses_results_for_near_duplicate_queries(
+    monkeypatch: pytest.MonkeyPatch, respx_mock, _fresh_semantic_cache
+):
+    base = [0.01] * settings.embedding_dim
+    paraphrase = list(base)
+    paraphrase[0] = 0.011
+    respx_mock.post(str(settings.embedding_api_url)).mock(
+        side_effect=[
+            httpx.Response(200, json={"embedding": base}),
+            httpx.Response(200, json={"embedding": paraphrase}),
+            httpx.Response(200, json={"embedding": paraphrase}),
+        ]
+    )
+    calls = []
+
+    async def fake_search(**kwargs):
+        calls.append(kwargs)
+        return [{"id": 1, "score": 0.1, "q_text": "q", "a_text": "a", "source_url": None, "ts": None}]
+
+    monkeypatch.setattr("app.routers.memory.search_memory", fake_search)
+
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        first = await client.post("/memory/search", json={"channel": "C1", "query": "vpn access", "k": 3})
+        second = await client.post("/memory/search", json={"channel": "C1", "query": "VPN access?", "k": 3})
+        assert second.json() == first.json()
+        assert len(calls) == 1
+
+        _fresh_semantic_cache.invalidate("C1")
+        await client.post("/memory/search", json={"channel": "C1", "query": "access to vpn", "k": 3})
+        assert len(calls) == 2
+
+    stats = _fresh_semantic_cache.stats.as_dict()
+    assert stats["hits"] == 1 and stats["misses"] == 2 and stats["invalidations"] == 1
+
+
+@pytest.mark.asyncio
+async def test_answer_pipeline_posts_to_slack(monkeypatch: pytest.MonkeyPatch, respx_mock):
+    vector = [0.02] * settings.embedding_dim
+    respx_mock.post(str(settings.embedding_api_url)).mock(
+        return_value=httpx.Response(200, json={"embedding": vector})
+    )
+    warm_up = respx_mock.post("https://slack.com/api/api.test").mock(
+        return_value=httpx.Response(200, json={"ok": True})
+    )
+    post = respx_mock.post("https://slack.com/api/chat.postMessage").mock(
+        return_value=httpx.Response(200, json={"ok": True, "ts": "1729.2"})
+    )
+
+    async def fake_search(**kwargs):
+        assert kwargs["channel"] == "C9"
+        return [
+            {
+                "id": 7,
+                "score": 0.1,
+                "q_text": "How to request VPN?",
+                "a_text": "Use the IT portal",
+                "source_url": "https://confluence/vpn",
+                "ts": None,
+            }
+        ]
+
+    monkeypatch.setattr("app.routers.memory.search_memory", fake_search)
+
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        resp = await client.post(
+            "/memory/answer", json={"channel": "C9", "thread_ts": "1729.1", "query": "vpn?", "k": 3}
+        )
+
+    assert resp.status_code == 200
+    body = resp.json()
+    assert body["mode"] == "answer" and body["match_id"] == 7 and body["ts"] == "1729.2"
+    assert body["confidence"] == pytest.approx(0.9)
+    assert {"embed", "search", "decide", "post", "total"} <= set(body["timings_ms"])
+    assert warm_up.called
+    sent = json.loads(post.calls.last.request.content.decode())
+    assert sent["thread_ts"] == "1729.1"
+    assert "Use the IT portal" in sent["text"] and "https://confluence/vpn" in sent["text"]
+
+
+@pytest.mark.asyncio
+async def test_metrics_report_route_and_dependency_latency(monkeypatch: pytest.MonkeyPatch, respx_mock):
+    respx_mock.post(str(settings.embedding_api_url)).mock(return_value=httpx.Response(503))
+
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        resp = await client.post("/memory/search", json={"channel": "C1", "query": "metrics?", "k": 3})
+        assert resp.status_code == 502
+        text = (await client.get("/metrics")).text
+
+    assert 'http_request_duration_seconds_count{method="POST",route="/memory/search",status="502"}' in text
+    assert 'outbound_request_duration_seconds_count{dependency="embedding",status="503"}' in text
+    assert 'errors_total{source="embedding",type="http_503"}' in text
+    assert 'httpx_pool_connections{destination="embedding",state="max"} 30' in text
+
+
+@pytest.mark.asyncio
+async def test_search_serializes_like_the_model_and_streams_ndjson(respx_mock):
+    from app.domain.schemas import Match
+
+    respx_mock.post(str(settings.embedding_api_url)).mock(
+        return_value=httpx.Response(200, json={"embedding": [0.1] * settings.embedding_dim})
+    )
+    rows = [
+        {"id": 1, "q_text": "vpn?", "a_text": "Use the portal", "distance": 0.1, "ts": "2024-01-01T08:30:00+00:00"},
+        {"id": 2, "q_text": "wifi?", "a_text": "Ask IT", "source_url": "https://kb/wifi", "distance": 0.25},
+    ]
+    respx_mock.post("https://example.supabase.co/rest/v1/rpc/match_memories").mock(
+        return_value=httpx.Response(200, json=rows)
+    )
+    expected = [
+        json.loads(Match(id=1, score=0.1, q_text="vpn?", a_text="Use the portal", ts=rows[0]["ts"]).model_dump_json()),
+        json.loads(
+            Match(id=2, score=0.25, q_text="wifi?", a_text="Ask IT", source_url="https://kb/wifi").model_dump_json()
+        ),
+    ]
+
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        document = await client.post("/memory/search", json={"query": "network", "k": 2})
+        streamed = await client.post(
+            "/memory/search", json={"query": "network", "k": 2}, headers={"Accept": "application/x-ndjson"}
+        )
+
+    assert document.json() == {"matches": expected}
+    assert streamed.headers["content-type"].startswith("application/x-ndjson")
+    assert [json.loads(line) for line in streamed.text.splitlines()] == expected
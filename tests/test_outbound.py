@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+import httpx
+from httpx import AsyncClient
+import pytest
+
+from app import deps
+from app.config import settings
+from app.main import app
+from app.outbound import RetryBudget, RetryingTransport
+
+
+class _FlakyTransport(httpx.AsyncBaseTransport):
+    def __init__(self, failures: int) -> None:
+        self.failures = failures
+        self.calls = 0
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise httpx.ConnectError("refused", request=request)
+        return httpx.Response(200, request=request)
+
+
+@pytest.mark.asyncio
+async def test_connect_errors_are_retried_within_the_budget():
+    inner = _FlakyTransport(failures=2)
+    transport = RetryingTransport(inner, retries=3, budget=RetryBudget(ratio=0.2), name="test")
+    async with httpx.AsyncClient(transport=transport) as client:
+        assert (await client.get("https://dep.test/")).status_code == 200
+    assert inner.calls == 3
+
+    empty = RetryBudget(ratio=0.0, min_per_second=0.0, capacity=0.0)
+    inner = _FlakyTransport(failures=1)
+    transport = RetryingTransport(inner, retries=3, budget=empty, name="test")
+    async with httpx.AsyncClient(transport=transport) as client:
+        with pytest.raises(httpx.ConnectError):
+            await client.get("https://dep.test/")
+    assert inner.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_health_reports_readiness_after_warm_up(monkeypatch: pytest.MonkeyPatch, respx_mock):
+    monkeypatch.setattr(deps, "_http_clients", {})
+    monkeypatch.setattr(deps, "_dependency_status", {})
+    respx_mock.head(url__regex=r"https://(embeddings\.test|example\.supabase\.co)/").mock(
+        return_value=httpx.Response(404)
+    )
+    respx_mock.head("https://slack.com/").mock(side_effect=httpx.ConnectError("down"))
+
+    await deps.warm_up_http_clients()
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        body = (await client.get("/health")).json()
+
+    assert body["ok"] is True and body["ready"] is False
+    assert body["dependencies"]["embedding"]["warm"] is True
+    assert body["dependencies"]["slack"] == {
+        "warm": False,
+        "http_version": None,
+        "http2_enabled": settings.slack_http2,
+        "max_connections": deps.http_limits("slack").max_connections,
+        "error": "ConnectError",
+    }
+    await deps.shutdown_dependencies()
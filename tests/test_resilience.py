@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+import asyncio
+
+import httpx
+from httpx import AsyncClient
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+
+from app import deps
+from app.config import settings
+from app.main import app
+from app.resilience import AIMDLimiter, LoadShedder, LoadSheddingMiddleware
+
+
+@pytest.mark.asyncio
+async def test_aimd_limit_backs_off_on_slow_calls_and_recovers():
+    limiter = AIMDLimiter(max_limit=4, latency_target=0.1, max_wait=0.01)
+
+    for _ in range(4):
+        assert await limiter.acquire()
+    assert not await limiter.acquire()  # full, and no slot frees up in time
+    for _ in range(4):
+        limiter.release(0.5, overloaded=False)
+    assert limiter.limit < 3 and limiter.stats()["rejected"] == 1
+
+    for _ in range(20):
+        assert await limiter.acquire()
+        limiter.release(0.01, overloaded=False)
+    assert limiter.limit == 4
+
+
+@pytest.mark.asyncio
+async def test_open_breaker_fails_fast_with_problem_details(respx_mock):
+    route = respx_mock.post(str(settings.embedding_api_url)).mock(return_value=httpx.Response(500))
+    payload = {"channel": "C1", "q_text": "q", "a_text": "a"}
+
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        for _ in range(settings.breaker_failure_threshold):
+            assert (await client.post("/memory/upsert", json=payload)).status_code == 502
+        resp = await client.post("/memory/upsert", json=payload)
+        stats = (await client.get("/health/stats")).json()["resilience"]
+
+    assert resp.status_code == 503
+    assert resp.json()["title"] == "Dependency Unavailable"
+    assert int(resp.headers["Retry-After"]) >= 1
+    assert route.call_count == settings.breaker_failure_threshold
+    assert stats["dependencies"]["embedding"]["breaker"]["state"] == "open"
+    assert stats["dependencies"]["supabase"]["breaker"]["state"] == "closed"
+    await deps.shutdown_dependencies()
+
+
+@pytest.mark.asyncio
+async def test_load_shedder_rejects_while_a_queue_stands():
+    async def slow(_request):
+        await asyncio.sleep(0.03)
+        return PlainTextResponse("ok")
+
+    shedder = LoadShedder(target=0.01, interval=0.02)
+    inner = Starlette(routes=[Route("/memory/search", slow), Route("/health", slow)])
+    guarded = LoadSheddingMiddleware(inner, shedder=shedder, prefixes=("/memory",))
+
+    async with AsyncClient(app=guarded, base_url="http://test") as client:
+        assert (await client.get("/memory/search")).status_code == 200
+        shed = await client.get("/memory/search")
+        assert (await client.get("/health")).status_code == 200
+
+    assert shed.status_code == 503 and shed.headers["Retry-After"] == "1"
+    assert shed.json()["title"] == "Overloaded"
+    assert shedder.shed == 1
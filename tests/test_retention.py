@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+from datetime import datetime, timezone
+import json
+
+import httpx
+import pytest
+
+from app import retention
+from app.config import settings
+from app.ranking import rerank
+from app.retention import RetentionPolicy
+
+NOW = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+def test_rows_go_cold_only_when_old_and_unused():
+    policy = RetentionPolicy(max_age_days=365, idle_days=90, min_hits=3)
+    old = {"ts": "2023-06-01T00:00:00+00:00", "hits": 0, "last_hit_at": None}
+
+    assert policy.is_cold(old, NOW)
+    assert not policy.is_cold({**old, "ts": "2024-12-01T00:00:00+00:00"}, NOW)
+    assert not policy.is_cold({**old, "hits": 5}, NOW)
+    assert not policy.is_cold({**old, "hits": 1, "last_hit_at": "2024-12-20T00:00:00Z"}, NOW)
+    assert not RetentionPolicy(max_age_days=0, idle_days=90, min_hits=3).is_cold(old, NOW)
+
+
+def test_channel_overrides_the_maximum_age(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(
+        retention,
+        "settings",
+        settings.model_copy(update={"retention_max_age_days": 365.0, "retention_channel_max_age_days": "C1=0, C2=30"}),
+    )
+
+    assert retention.policy_for("C1").max_age_days == 0
+    assert retention.policy_for("C2").max_age_days == 30
+    assert retention.policy_for("C3").max_age_days == 365
+
+
+def test_rerank_prefers_fresh_and_frequently_used_rows():
+    rows = [
+        {"id": 1, "score": 0.10, "ts": "2020-01-01T00:00:00+00:00", "hits": 0},
+        {"id": 2, "score": 0.12, "ts": "2024-12-01T00:00:00+00:00", "hits": 0},
+        {"id": 3, "score": 0.15, "ts": "2020-01-01T00:00:00+00:00", "hits": 40},
+    ]
+
+    assert [row["id"] for row in rerank(rows, 3, half_life_days=0, usage_weight=0, now=NOW)] == [1, 2, 3]
+    assert [row["id"] for row in rerank(rows, 2, half_life_days=365, usage_weight=0, now=NOW)] == [2, 1]
+    boosted = rerank(rows, 3, half_life_days=0, usage_weight=0.5, pending_hits={2: 3}, now=NOW)
+    assert [row["id"] for row in boosted] == [3, 2, 1]
+    assert boosted[0]["score"] == 0.15
+
+
+@pytest.mark.asyncio
+async def test_apply_archives_cold_rows_and_reindexes(monkeypatch: pytest.MonkeyPatch, respx_mock):
+    monkeypatch.setattr(retention, "settings", settings.model_copy(update={"retention_max_age_days": 365.0}))
+    base = "https://example.supabase.co/rest/v1"
+    rows = [
+        {"id": 1, "channel": "C1", "q_text": "q1", "a_text": "a", "ts": "2022-01-01T00:00:00+00:00", "hits": 0},
+        {"id": 2, "channel": "C1", "q_text": "q2", "a_text": "a", "ts": "2024-12-01T00:00:00+00:00", "hits": 0},
+        {"id": 3, "channel": "C2", "q_text": "q3", "a_text": "a", "ts": "2022-01-01T00:00:00+00:00", "hits": 9},
+    ]
+    respx_mock.get(f"{base}/kb").mock(
+        return_value=httpx.Response(200, json=[{**row, "embedding": "[0.1,0.2]", "last_hit_at": None} for row in rows])
+    )
+    search = respx_mock.post(f"{base}/rpc/match_memories").mock(return_value=httpx.Response(200, json=[]))
+    archive = respx_mock.post(f"{base}/kb_archive").mock(return_value=httpx.Response(201))
+    delete = respx_mock.delete(f"{base}/kb").mock(return_value=httpx.Response(200, json=[{"id": 1}]))
+    reindex = respx_mock.post(f"{base}/rpc/reindex_memories").mock(return_value=httpx.Response(204))
+
+    report = await retention.apply_retention(apply=True, probes=2, now=NOW)
+
+    assert (report["rows_scanned"], report["rows_cold"], report["rows_archived"]) == (3, 1, 1)
+    assert report["channels"] == {"C1": {"rows": 2, "cold": 1}, "C2": {"rows": 1, "cold": 0}}
+    assert [row["id"] for row in json.loads(archive.calls[0].request.content)] == [1]
+    assert delete.calls[0].request.url.params["id"] == "in.(1)"
+    assert reindex.called and report["reindexed"] is True
+    assert search.call_count == 4
+    assert report["latency_before"]["probes"] == 2 and "p50_ms" in report["latency_after"]
+
+
+@pytest.mark.asyncio
+async def test_search_includes_archived_rows_on_request(monkeypatch: pytest.MonkeyPatch, respx_mock):
+    from httpx import AsyncClient
+
+    from app.main import app
+
+    respx_mock.post(str(settings.embedding_api_url)).mock(
+        return_value=httpx.Response(200, json={"embedding": [0.1] * settings.embedding_dim})
+    )
+
+    async def live(**kwargs):
+        return [{"id": 1, "score": 0.3, "q_text": "q", "a_text": "live", "source_url": None, "ts": None}]
+
+    async def archived(**kwargs):
+        return [{"id": 9, "score": 0.1, "q_text": "q", "a_text": "archived", "source_url": None, "ts": None}]
+
+    monkeypatch.setattr("app.routers.memory.search_memory", live)
+    monkeypatch.setattr("app.routers.memory.search_archived_memories", archived)
+
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        plain = await client.post("/memory/search", json={"query": "q", "k": 2})
+        both = await client.post("/memory/search", json={"query": "q", "k": 2, "include_archive": True})
+
+    assert [match["id"] for match in plain.json()["matches"]] == [1]
+    assert [match["id"] for match in both.json()["matches"]] == [9, 1]
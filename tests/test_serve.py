@@ -0,0 +1,37 @@
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+from app import deps
+from app.config import settings, worker_scoped_path
+from app.vector_index import LocalVectorIndex
+
+
+def test_connection_budget_is_split_across_workers(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(
+        deps, "settings", settings.model_copy(update={"web_concurrency": 4, "http_connection_budget": 60})
+    )
+    limits = deps.http_limits("supabase")
+    assert (limits.max_connections, limits.max_keepalive_connections) == (7, 7)
+
+
+def test_single_writer_files_are_scoped_per_worker(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.delenv("APP_WORKER_INDEX", raising=False)
+    assert worker_scoped_path("/var/lib/agent/outbox.sqlite") == "/var/lib/agent/outbox.sqlite"
+    monkeypatch.setenv("APP_WORKER_INDEX", "2")
+    assert worker_scoped_path("/var/lib/agent/outbox.sqlite") == "/var/lib/agent/outbox.worker2.sqlite"
+
+
+def test_reserved_index_appends_without_moving_preloaded_vectors():
+    index = LocalVectorIndex(dim=4, max_staleness_seconds=60)
+    rng = np.random.default_rng(0)
+    row = lambda i: {"id": i, "channel": "C1", "q_text": "q", "a_text": "a", "embedding": rng.random(4).tolist()}
+    index.add([row(i) for i in range(1, 101)])
+    index.reserve(0.25)
+    partition = index._partitions["C1"]
+    buffer = partition._vectors.data
+
+    index.add([row(i) for i in range(101, 121)])
+    assert partition._vectors.data is buffer
+    assert index.search(channel="C1", query_embedding=buffer[110].tolist(), k=1)[0]["id"] == 111
@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import json
+
+import httpx
+from httpx import AsyncClient
+import pytest
+
+from app import sharding
+from app.config import settings
+from app.main import app
+
+_SHARDS = json.dumps(
+    [
+        {"name": "acme", "url": "https://acme.supabase.co", "search_function": "match_acme"},
+        {"name": "acme2", "table": "kb_acme2"},
+    ]
+)
+_ACME = "https://acme.supabase.co/rest/v1"
+_DEFAULT = "https://example.supabase.co/rest/v1"
+
+
+@pytest.fixture
+def sharded(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(
+        sharding,
+        "settings",
+        settings.model_copy(update={"supabase_shards": _SHARDS, "shard_routes": "T1=acme|default, C9=acme2"}),
+    )
+
+
+def _row(memory_id: int, distance: float) -> dict:
+    return {"id": memory_id, "q_text": "q", "a_text": f"a{memory_id}", "distance": distance}
+
+
+def test_routes_by_channel_then_workspace(sharded):
+    acme2 = sharding.get_shard("acme2")
+    assert (acme2.url, acme2.table) == (str(settings.supabase_url), "kb_acme2")
+    assert acme2.search_function == settings.supabase_search_function
+
+    assert sharding.route(workspace="T1", channel="C9").name == "acme2"
+    assert sharding.route(workspace="T2", channel="C1").name == "default"
+    group = {sharding.route(workspace="T1", channel=f"D{n}").name for n in range(20)}
+    assert group == {"acme", "default"}
+    assert sharding.route(workspace="T1", channel="C5") == sharding.route(workspace="T1", channel="C5")
+    assert [shard.name for shard in sharding.search_targets(workspace="T1", channel=None)] == ["acme", "default"]
+
+
+def test_unknown_shard_in_routes_is_rejected(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(sharding, "settings", settings.model_copy(update={"shard_routes": "T1=nope"}))
+
+    with pytest.raises(ValueError, match="nope"):
+        sharding.all_shards()
+
+
+@pytest.mark.asyncio
+async def test_search_without_channel_scatters_and_merges_by_distance(sharded, respx_mock):
+    respx_mock.post(str(settings.embedding_api_url)).mock(
+        return_value=httpx.Response(200, json={"embedding": [0.1] * settings.embedding_dim})
+    )
+    acme = respx_mock.post(f"{_ACME}/rpc/match_acme").mock(
+        return_value=httpx.Response(200, json=[_row(1, 0.05), _row(2, 0.4)])
+    )
+    respx_mock.post(f"{_DEFAULT}/rpc/match_memories").mock(
+        return_value=httpx.Response(200, json=[_row(1, 0.1), _row(3, 0.2)])
+    )
+
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.post("/memory/search", json={"query": "q", "k": 3, "workspace": "T1"})
+
+    matches = [(match["id"], match["shard"]) for match in response.json()["matches"]]
+    assert matches == [(1, "acme"), (1, None), (3, None)]
+    assert acme.calls[0].request.headers["apikey"] == settings.supabase_service_role_key
+
+
+@pytest.mark.asyncio
+async def test_scatter_gather_tolerates_a_failing_shard(sharded, respx_mock):
+    respx_mock.post(str(settings.embedding_api_url)).mock(
+        return_value=httpx.Response(200, json={"embedding": [0.1] * settings.embedding_dim})
+    )
+    respx_mock.post(f"{_ACME}/rpc/match_acme").mock(return_value=httpx.Response(500))
+    respx_mock.post(f"{_DEFAULT}/rpc/match_memories").mock(return_value=httpx.Response(200, json=[_row(3, 0.2)]))
+
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.post("/memory/search", json={"query": "q", "workspace": "T1"})
+
+    assert [match["id"] for match in response.json()["matches"]] == [3]
+
+
+@pytest.mark.asyncio
+async def test_upsert_writes_to_the_routed_shard(sharded, respx_mock):
+    respx_mock.post(str(settings.embedding_api_url)).mock(
+        return_value=httpx.Response(200, json={"embedding": [0.1] * settings.embedding_dim})
+    )
+    insert = respx_mock.post(f"{_DEFAULT}/kb_acme2").mock(return_value=httpx.Response(201, json=[{"id": 7}]))
+
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.post("/memory/upsert", json={"channel": "C9", "q_text": "q", "a_text": "a"})
+
+    assert response.json() == {"id": 7, "shard": "acme2"}
+    assert insert.called
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import asyncio
 import json
 
 import pytest
@@ -35,3 +36,237 @@ async def test_slack_reply(monkeypatch: pytest.MonkeyPatch, respx_mock):
     assert sent["thread_ts"] == "1729900314.123"
     assert "[Auto-Reply]" in sent["text"]
     assert "Confidence: 0.90" in sent["text"]
+
+
+@pytest.mark.asyncio
+async def test_slack_reply_async_mode_retries_after_rate_limit(respx_mock):
+    route = respx_mock.post("https://slack.com/api/chat.postMessage").mock(
+        side_effect=[
+            httpx.Response(429, headers={"Retry-After": "0"}),
+            httpx.Response(200, json={"ok": True, "ts": "1729.9"}),
+        ]
+    )
+
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        payload = {
+            "channel": "C1",
+            "thread_ts": "1729.1",
+            "answer": "Queued answer",
+            "mode": "answer",
+            "confidence": 0.9,
+        }
+        resp = await client.post("/slack/reply?async=true", json=payload)
+        assert resp.status_code == 202
+        assert resp.json()["queued"] is True
+
+        from app.slack_outbox import get_slack_outbox
+
+        outbox = get_slack_outbox()
+        for _ in range(100):
+            if outbox.counters["sent"]:
+                break
+            await asyncio.sleep(0.01)
+        await outbox.aclose()
+
+    stats = outbox.stats()
+    assert route.call_count == 2
+    assert stats["sent"] == 1 and stats["rate_limited"] == 1 and stats["depth"] == 0
+
+
+@pytest.mark.asyncio
+async def test_slack_outbox_resumes_journaled_messages(tmp_path):
+    from app.slack_outbox import SlackOutbox
+
+    path = str(tmp_path / "outbox.sqlite")
+
+    async def hang(body):
+        await asyncio.Event().wait()
+
+    first = SlackOutbox(post=hang, path=path)
+    await first.enqueue({"channel": "C1", "text": "one"})
+    await first.enqueue({"channel": "C1", "text": "two"})
+    await first.aclose()
+
+    delivered = []
+
+    async def post(body):
+        delivered.append(body["text"])
+        return httpx.Response(200, json={"ok": True})
+
+    second = SlackOutbox(post=post, path=path, channel_burst=5)
+    await second.start()
+    for _ in range(100):
+        if len(delivered) == 2:
+            break
+        await asyncio.sleep(0.01)
+    assert delivered == ["one", "two"]
+    await second.aclose()
+
+
+def _signed_headers(secret: str, body: bytes) -> dict:
+    import hashlib
+    import hmac
+    import time
+
+    timestamp = str(int(time.time()))
+    digest = hmac.new(secret.encode(), b"v0:" + timestamp.encode() + b":" + body, hashlib.sha256).hexdigest()
+    return {
+        "X-Slack-Request-Timestamp": timestamp,
+        "X-Slack-Signature": f"v0={digest}",
+        "Content-Type": "application/json",
+    }
+
+
+@pytest.mark.asyncio
+async def test_slack_events_ack_dedup_and_answer(monkeypatch: pytest.MonkeyPatch, respx_mock):
+    from app.config import settings
+    from app.routers import slack_events
+
+    monkeypatch.setattr(slack_events, "settings", settings.model_copy(update={"slack_signing_secret": "shh"}))
+    respx_mock.post(str(settings.embedding_api_url)).mock(
+        return_value=httpx.Response(200, json={"embedding": [0.1] * settings.embedding_dim})
+    )
+    post = respx_mock.post("https://slack.com/api/chat.postMessage").mock(
+        return_value=httpx.Response(200, json={"ok": True, "ts": "1729.5"})
+    )
+
+    async def fake_search(**kwargs):
+        return [{"id": 3, "score": 0.05, "q_text": "vpn?", "a_text": "Use the portal", "source_url": None, "ts": None}]
+
+    monkeypatch.setattr("app.routers.memory.search_memory", fake_search)
+
+    challenge = json.dumps({"type": "url_verification", "challenge": "abc"}).encode()
+    event = json.dumps(
+        {
+            "type": "event_callback",
+            "event_id": "Ev1",
+            "event": {"type": "message", "channel": "C1", "ts": "1729.4", "text": "how do I get vpn?"},
+        }
+    ).encode()
+
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        bad = await client.post("/slack/events", content=event, headers=_signed_headers("wrong", event))
+        assert bad.status_code == 401
+
+        resp = await client.post("/slack/events", content=challenge, headers=_signed_headers("shh", challenge))
+        assert resp.json() == {"challenge": "abc"}
+
+        for _ in range(2):
+            resp = await client.post("/slack/events", content=event, headers=_signed_headers("shh", event))
+            assert resp.status_code == 200
+
+        pool = slack_events.get_slack_event_pool()
+        await asyncio.wait_for(pool.join(), timeout=5)
+        from app.slack_outbox import get_slack_outbox
+
+        outbox = get_slack_outbox()
+        for _ in range(100):
+            if outbox.counters["sent"]:
+                break
+            await asyncio.sleep(0.01)
+        await pool.aclose()
+        await outbox.aclose()
+
+    stats = pool.stats()
+    assert stats["processed"] == 1 and stats["duplicates"] == 1
+    assert stats["queue_latency_seconds"]["count"] == 1
+    sent = json.loads(post.calls.last.request.content.decode())
+    assert sent["thread_ts"] == "1729.4" and "Use the portal" in sent["text"]
+
+
+def test_render_truncates_words_and_clips_at_grapheme_boundaries():
+    from app.slack_render import clip, truncate_words
+
+    text = "one  two\nthree four five"
+    assert truncate_words(text, 3) == ("one  two\nthree", True)
+    assert truncate_words(text, 5) == (text, False)
+
+    flag = "\U0001F1F3\U0001F1F4"  # NO
+    family = "\U0001F468\u200d\U0001F469\u200d\U0001F467"
+    assert clip("ab" + flag + flag, 5) == "ab" + flag + "…"
+    assert clip("x" + family + "yz", 5) == "x…"
+    assert clip("cafe\u0301s", 4, ellipsis="") == "caf"
+    assert clip("short", 10) == "short"
+
+
+@pytest.mark.asyncio
+async def test_slack_reply_blocks_carry_sources_feedback_and_limits(monkeypatch: pytest.MonkeyPatch, respx_mock):
+    from app.config import settings
+    from app.routers import slack
+
+    monkeypatch.setattr(slack, "settings", settings.model_copy(update={"slack_reply_format": "blocks"}))
+    route = respx_mock.post("https://slack.com/api/chat.postMessage").mock(
+        return_value=httpx.Response(200, json={"ok": True, "ts": "1729.2"})
+    )
+    payload = {
+        "channel": "C1",
+        "thread_ts": "1729.1",
+        "answer": "Use the <portal> & VPN " + "word " * 200,
+        "references": [
+            {"title": "VPN " * 30, "url": "https://example.com/vpn", "memory_id": 7, "shard": "acme"},
+            {"title": "Too long", "url": "https://example.com/" + "x" * 3000},
+        ],
+        "mode": "answer",
+        "confidence": 0.9,
+        "memory_id": 7,
+    }
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        resp = await client.post("/slack/reply", json=payload)
+    assert resp.status_code == 200
+
+    sent = json.loads(route.calls.last.request.content.decode())
+    assert sent["text"].startswith("[Auto-Reply] Use the &lt;portal&gt; &amp; VPN")
+    answer, sources, confidence, feedback = sent["blocks"]
+    assert len(answer["text"]["text"].split()) == 121  # the prefix plus MAX_ANSWER_WORDS
+    [button] = sources["elements"]
+    assert len(button["text"]["text"]) <= 75 and button["value"] == "acme:7"
+    assert confidence["elements"][0]["text"] == "Confidence: 0.90"
+    assert [(b["action_id"], b["value"]) for b in feedback["elements"]] == [
+        ("feedback_helpful", ":7"),
+        ("feedback_not_helpful", ":7"),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_slack_interactions_feed_usage_counts(monkeypatch: pytest.MonkeyPatch):
+    from urllib.parse import urlencode
+
+    from app.config import settings
+    from app.deps import get_usage_tracker
+    from app.ranking import UsageTracker
+    from app.routers import slack_events
+
+    monkeypatch.setattr(
+        slack_events,
+        "settings",
+        settings.model_copy(update={"slack_signing_secret": "shh", "usage_flush_interval_seconds": 60.0}),
+    )
+    monkeypatch.setattr("app.deps._usage_tracker", UsageTracker())
+
+    def click(user: str, action_id: str, value: str) -> bytes:
+        interaction = {
+            "type": "block_actions",
+            "user": {"id": user},
+            "container": {"message_ts": "1729.2"},
+            "actions": [{"action_id": action_id, "value": value}],
+        }
+        return urlencode({"payload": json.dumps(interaction)}).encode()
+
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        for body in (
+            click("U1", "feedback_helpful", ":7"),
+            click("U1", "feedback_helpful", ":7"),  # a second click by the same user is ignored
+            click("U2", "feedback_not_helpful", ":7"),
+            click("U2", "source:0", ":8"),
+            click("U2", "source:1", "nope:9"),  # unknown shard
+        ):
+            headers = {**_signed_headers("shh", body), "Content-Type": "application/x-www-form-urlencoded"}
+            resp = await client.post("/slack/interactions", content=body, headers=headers)
+            assert resp.status_code == 200
+        broken = b"payload=%7B"
+        bad = await client.post("/slack/interactions", content=broken, headers=_signed_headers("shh", broken))
+        assert bad.status_code == 400
+
+    tracker = get_usage_tracker()
+    assert dict(tracker.pending) == {8: 1}  # +3 and -3 cancel out
+    assert tracker.stats()["feedback"] == 3
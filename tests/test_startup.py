@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import subprocess
+import sys
+
+import httpx
+from httpx import AsyncClient
+import pytest
+
+from app import deps, main
+from app.config import settings
+from app.main import app
+
+
+def test_importing_the_app_leaves_heavy_modules_unloaded():
+    probe = "import sys, app.main; print(sorted({'numpy', 'supabase', 'sqlite3'} & set(sys.modules)))"
+    result = subprocess.run([sys.executable, "-c", probe], capture_output=True, text=True, env=os.environ, check=True)
+
+    assert result.stdout.strip() == "[]"
+
+
+@pytest.mark.asyncio
+async def test_fast_startup_gates_readiness_until_init_finishes(monkeypatch: pytest.MonkeyPatch, respx_mock):
+    monkeypatch.setattr(main, "settings", settings.model_copy(update={"fast_startup": True}))
+    monkeypatch.setattr(deps, "_dependency_status", {})
+    released = asyncio.Event()
+
+    async def slow_head(request: httpx.Request) -> httpx.Response:
+        await released.wait()
+        return httpx.Response(404)
+
+    respx_mock.head(url__regex=r"https://.*").mock(side_effect=slow_head)
+
+    async with main.lifespan(app), AsyncClient(app=app, base_url="http://test") as client:
+        assert (await client.get("/health")).json()["ok"] is True
+        early = await client.get("/health/ready")
+        released.set()
+        for _ in range(100):
+            if deps.get_startup_progress().complete:
+                break
+            await asyncio.sleep(0.01)
+        ready = await client.get("/health/ready")
+
+    assert early.status_code == 503 and early.json()["ready"] is False
+    assert ready.status_code == 200
+    steps = ready.json()["startup"]["steps_ms"]
+    assert {"http_warmup", "semantic_cache", "embedding_cache"} <= set(steps)
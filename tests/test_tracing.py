@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+import httpx
+import pytest
+from httpx import AsyncClient
+
+from app.config import settings
+from app.main import app
+
+
+@pytest.mark.asyncio
+async def test_search_trace_spans_and_admin_endpoints(monkeypatch: pytest.MonkeyPatch, respx_mock, _fresh_tracer):
+    from app.routers import debug
+
+    _fresh_tracer.sample_rate = 1.0
+    monkeypatch.setattr(debug, "settings", settings.model_copy(update={"admin_token": "secret"}))
+    embedding = respx_mock.post(str(settings.embedding_api_url)).mock(
+        return_value=httpx.Response(200, json={"embedding": [0.3] * settings.embedding_dim})
+    )
+
+    async def fake_search(**kwargs):
+        return []
+
+    monkeypatch.setattr("app.routers.memory.search_memory", fake_search)
+    parent = "00-" + "a" * 32 + "-" + "b" * 16 + "-01"
+
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        resp = await client.post(
+            "/memory/search", json={"channel": "C1", "query": "trace me", "k": 2}, headers={"traceparent": parent}
+        )
+        assert resp.status_code == 200
+
+        assert (await client.get("/debug/traces")).status_code == 401
+        admin = {"Authorization": "Bearer secret"}
+        traces = (await client.get("/debug/traces", headers=admin)).json()["traces"]
+        profile = await client.post("/debug/profile?seconds=0.05&interval_ms=1", headers=admin)
+
+    # Newest first: the 401 request was traced too.
+    spans = traces[-1]["resourceSpans"][0]["scopeSpans"][0]["spans"]
+    by_name = {span["name"]: span for span in spans}
+    root = by_name["POST /memory/search"]
+    assert root["traceId"] == "a" * 32 and root["parentSpanId"] == "b" * 16
+    assert by_name["embed"]["parentSpanId"] == root["spanId"]
+    outbound = by_name["HTTP POST embedding"]
+    assert outbound["parentSpanId"] == by_name["embed"]["spanId"]
+    assert embedding.calls.last.request.headers["traceparent"].split("-")[2] == outbound["spanId"]
+
+    assert profile.status_code == 200
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in profile.text.splitlines())
@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+import numpy as np
+import pytest
+import httpx
+
+from app.config import settings
+from app.quantization import format_vector_literal
+from app.supa import search_memory, sync_local_index
+from app.vector_index import LocalVectorIndex
+
+
+def _rows(count: int, dim: int, channel: str, seed: int = 0) -> list[dict]:
+    rng = np.random.default_rng(seed)
+    return [
+        {
+            "id": seed * 1000 + i + 1,
+            "channel": channel,
+            "q_text": f"q{i}",
+            "a_text": f"a{i}",
+            "embedding": rng.standard_normal(dim).tolist(),
+        }
+        for i in range(count)
+    ]
+
+
+def test_local_index_matches_brute_force_per_channel():
+    index = LocalVectorIndex(dim=16, max_staleness_seconds=60)
+    rows = _rows(200, 16, "C1") + _rows(50, 16, "C2", seed=1)
+    assert index.add(rows) == 250
+    assert index.add(rows[:10]) == 0
+
+    query = np.random.default_rng(7).standard_normal(16)
+    results = index.search(channel="C1", query_embedding=query.tolist(), k=5)
+
+    c1 = [row for row in rows if row["channel"] == "C1"]
+    matrix = np.asarray([row["embedding"] for row in c1])
+    distances = 1 - (matrix @ query) / (np.linalg.norm(matrix, axis=1) * np.linalg.norm(query))
+    expected = [c1[i]["id"] for i in np.argsort(distances)[:5]]
+    assert [r["id"] for r in results] == expected
+    assert results[0]["score"] == pytest.approx(distances.min(), abs=1e-5)
+
+
+@pytest.mark.asyncio
+async def test_search_memory_uses_fresh_replica(monkeypatch: pytest.MonkeyPatch, respx_mock):
+    index = LocalVectorIndex(dim=settings.embedding_dim, max_staleness_seconds=60)
+    monkeypatch.setattr("app.supa.get_local_index", lambda: index)
+    rows = _rows(3, settings.embedding_dim, "C1")
+    table_url = f"{str(settings.supabase_url).rstrip('/')}/rest/v1/{settings.supabase_table}"
+    for row in rows:
+        row["embedding"] = str(row["embedding"]).replace(" ", "")
+    respx_mock.get(table_url).mock(return_value=httpx.Response(200, json=rows))
+
+    assert await sync_local_index(index) == 3
+    assert index.is_fresh
+    assert index.sync_cursor == 3
+
+    query = [float(x) for x in rows[1]["embedding"].strip("[]").split(",")]
+    results = await search_memory(channel="C1", query_embedding=query, k=1)
+    assert results[0]["id"] == 2
+
+
+def _clustered(count: int, dim: int, seed: int = 3) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((20, dim))
+    return (centers[rng.integers(0, 20, count)] + 0.3 * rng.standard_normal((count, dim))).astype(np.float32)
+
+
+@pytest.mark.parametrize(
+    "engine, params",
+    [("ivf", {"nprobe": 8}), ("hnsw", {"m": 8, "ef_construction": 64, "ef_search": 64})],
+)
+def test_ann_engines_recall_and_snapshot(tmp_path, engine, params):
+    dim = 16
+    vectors = _clustered(1500, dim)
+    rows = [
+        {"id": i + 1, "channel": "C1", "q_text": "q", "a_text": "a", "embedding": vector.tolist()}
+        for i, vector in enumerate(vectors)
+    ]
+    exact = LocalVectorIndex(dim=dim, max_staleness_seconds=60)
+    approx = LocalVectorIndex(dim=dim, max_staleness_seconds=60, engine=engine, engine_params=params)
+    exact.add(rows[:1000])
+    approx.add(rows[:1000])
+    exact.add(rows[1000:])
+    approx.add(rows[1000:])
+
+    noise = np.random.default_rng(11).standard_normal((30, dim)).astype(np.float32)
+    queries = vectors[::50] + 0.3 * noise
+    hits = 0
+    for query in queries:
+        truth = {r["id"] for r in exact.search(channel="C1", query_embedding=query.tolist(), k=10)}
+        found = {r["id"] for r in approx.search(channel="C1", query_embedding=query.tolist(), k=10)}
+        hits += len(truth & found)
+    assert hits / (10 * len(queries)) >= 0.9
+
+    path = str(tmp_path / "index.npz")
+    approx.sync_cursor = 1500
+    approx.save(path)
+    restored = LocalVectorIndex.load(path, max_staleness_seconds=60, engine_params=params)
+    assert restored.sync_cursor == 1500
+    assert len(restored) == 1500
+    query = queries[0].tolist()
+    assert restored.search(channel="C1", query_embedding=query, k=5) == approx.search(
+        channel="C1", query_embedding=query, k=5
+    )
+
+
+@pytest.mark.parametrize("codec", ["float16", "int8", "pq"])
+def test_quantized_flat_engine_reranks_to_exact(tmp_path, codec):
+    dim = 32
+    vectors = _clustered(1200, dim)
+    rows = [
+        {"id": i + 1, "channel": "C1", "q_text": "q", "a_text": "a", "embedding": vector.tolist()}
+        for i, vector in enumerate(vectors)
+    ]
+    params = {"codec": codec, "rerank_factor": 8, "pq_subvectors": 8}
+    exact = LocalVectorIndex(dim=dim, max_staleness_seconds=60)
+    quantized = LocalVectorIndex(dim=dim, max_staleness_seconds=60, engine_params=params)
+    exact.add(rows)
+    quantized.add(rows)
+
+    query = (vectors[7] + 0.2).tolist()
+    expected = [r["id"] for r in exact.search(channel="C1", query_embedding=query, k=5)]
+    found = [r["id"] for r in quantized.search(channel="C1", query_embedding=query, k=5)]
+    assert found[0] == expected[0]
+    assert len(set(found) & set(expected)) >= 4
+
+    path = str(tmp_path / "index.npz")
+    quantized.save(path)
+    restored = LocalVectorIndex.load(path, max_staleness_seconds=60, engine_params=params)
+    assert [r["id"] for r in restored.search(channel="C1", query_embedding=query, k=5)] == found
+
+
+def test_format_vector_literal_limits_precision():
+    assert format_vector_literal([0.123456789, -1.0, 2.5e-7], 4) == "[0.1235,-1,2.5e-07]"